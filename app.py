@@ -3,11 +3,24 @@
 مقارنة شاملة بين بيانات قسطاس والديوان التشريعي
 """
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import pandas as pd
-from datetime import datetime
-import io
+import numpy as np
+from collections import deque
+from datetime import datetime, timedelta
 import os
-import json
+
+from data_loader import PATHS, Preloader, dropped_columns, read_workbook, sort_by_group_key
+from store import FILTER_COLUMNS, DecisionStore
+from export import MIME_TYPES, export_bytes, parquet_available
+from comparison import (CHANGED, DELTA_LABELS, MATCHED, NEW, QUEUE_LABELS, add_normalized_columns,
+                        build_alignment, compute_diff_matrix, content_hashes, get_mapping, review_delta,
+                        source_columns)
+from matching import build_name_index, build_search_index
+from links import CHECK_LABELS, build_link_graph
+from prefetch import PREFETCH_AHEAD, RenderCache, build_payload
+from metrics import Metrics
+from golden import AUTO_SOURCE, CUSTOM_SOURCE, DIWAN_SOURCE, QIS_SOURCE, GoldenDataset
 
 # ==================== إعدادات الصفحة ====================
 st.set_page_config(
@@ -23,90 +36,270 @@ option = st.sidebar.radio(
     ["نظام", "قانون", "تعليمات", "اتفاقيات"],
 )
 
+st.sidebar.markdown("---")
+st.sidebar.subheader("المراجع")
+reviewer = st.sidebar.text_input("اسم المراجع:", key="reviewer").strip()
+multi_review = st.sidebar.checkbox(
+    "وضع المراجعة المتعددة (توزيع السجلات)", key="multi_review", disabled=not reviewer
+) and bool(reviewer)
+
 # ==================== الثوابت ====================
 DATA_FILE = 'comparison_data.json'
 PROGRESS_FILE = 'progress_data.json'
-QisShownCols = ['LegName', 'LegNumber', 'Year','Replaced For', 'Canceled By','ActiveDate', 'EndDate', 'Replaced By', 'Status','Magazine_Date']
-DiwShownCols = ['ByLawName', 'ByLawNumber', 'Year', 'Replaced_For', 'Magazine_Date', 'Active_Date', 'Status']
+DB_FILE = 'comparison_data.db'
+ACTIVITY_SIZE = 20
+LIVE_REFRESH_SECONDS = 5
+# حقول القرار التي يضيفها build_record فوق قيم السجل
+RECORD_META_KEYS = ('تاريخ الإدخال', 'المصدر الصحيح', 'نوع التشريع', 'المراجع')
+
+# ==================== قياس الأداء ====================
+@st.cache_resource
+def get_metrics() -> Metrics:
+    """المخزن الدوار لأزمنة المراحل (مشترك بين الجلسات)"""
+    return Metrics()
+
+
+def track(stage: str, cached: bool = False):
+    """مؤقت مرحلة موسوم برقم إعادة التشغيل في الجلسة الحالية"""
+    return get_metrics().track(stage, cached, st.session_state.get('run_id'))
+
 
 # ==================== تحميل البيانات (تم تعديله بالكامل - مسارات ثابتة وصحيحة) ====================
-@st.cache_data
-def load_csv_data(kind: str):
-    """تحميل ملفات Excel من مسارات ثابتة ومحددة بدقة"""
-    
-    PATHS = {
-        'نظام': {
-            'qis': r'extData/Bylaws/Qis_ByLaws_V2.xlsx',
-            'diwan': r'extData/Bylaws/Diwan_ByLaws_V2.xlsx'
-        },
-        'قانون': {
-            'qis': r'extData/Laws/Qis_Laws_V2.xlsx',
-            'diwan': r'extData/Laws/Diwan_Laws_V2.xlsx'
-        },
-        'تعليمات': {
-            'qis': r'extData/Instructions/Qis_Instructions.xlsx',
-            'diwan': r'extData/Instructions/Diwan_Instructions.xlsx'
-        },
-        'اتفاقيات': { 
-            'qis': r'extData/Agreements/Qis_Agreements.xlsx',
-            'diwan': r'extData/Agreements/Diwan_Agreements.xlsx'
-        }
-    }
+SOURCE_NAMES = {'qis': "قسطاس", 'diwan': "الديوان"}
 
-    if kind not in PATHS:
-        st.error(f"النوع '{kind}' غير مدعوم بعد.")
-        return None, None
 
-    qis_path = PATHS[kind]['qis']
-    diwan_path = PATHS[kind]['diwan']
+@st.cache_resource
+def load_csv_data(kind: str):
+    """تحميل ملفات Excel من مسارات ثابتة ومحددة بدقة (عبر الكاش الثنائي في data_loader).
+    دون رسائل واجهة: الأخطاء تُرفع (ولا تُخزن في الكاش) ويعرضها المستدعي"""
+    get_metrics().miss('load_csv_data')
 
-    def read_excel_safely(path, source_name):
+    if kind not in PATHS:
+        raise KeyError(f"النوع '{kind}' غير مدعوم بعد.")
+    frames = []
+    for side in ('qis', 'diwan'):
+        path = PATHS[kind][side]
         if not os.path.exists(path):
-            st.error(f"غير موجود ← {path}")
-            return None
+            raise FileNotFoundError(f"غير موجود ← {path}")
         try:
-            df = pd.read_excel(path)
-            st.sidebar.success(f"{source_name} ({os.path.basename(path)})")
-            return df
+            frames.append(read_workbook(path, drop=dropped_columns(kind, side)))
         except Exception as e:
-            st.error(f"فشل تحميل {source_name}:\n{path}\n\n{str(e)}")
-            return None
+            raise RuntimeError(f"فشل تحميل {SOURCE_NAMES[side]}:\n{path}\n\n{str(e)}") from e
+    return tuple(frames)
+
+
+@st.cache_resource
+def get_preloader() -> Preloader:
+    """تحميل كل الأنواع في الخلفية مرة واحدة لكل عملية (يبدأ مع أول جلسة)"""
+    return Preloader()
+
+
+def render_live_status(pairs):
+    """تقدم النوع الحالي وآخر نشاط المراجعين من المخزن المشترك، يتحدث تلقائياً دون إعادة تحميل"""
+    @st.fragment(run_every=LIVE_REFRESH_SECONDS)
+    def status():
+        store = get_store()
+        decided = len(store.decided_pairs(option))
+        st.progress(min(decided / len(pairs), 1.0) if len(pairs) else 1.0,
+                    text=f"📌 القرارات المحفوظة لهذا النوع: {decided} من {len(pairs)}")
+        counts = store.counts(option)
+        if counts:
+            st.caption(" — ".join(f"{source}: {n}" for source, n in counts.items()))
+        others = [e for e in get_activity_feed() if e['reviewer'] != (reviewer or '')][:3]
+        for event in others:
+            at = datetime.fromtimestamp(event['at']).strftime('%H:%M:%S')
+            what = "مسح البيانات" if event['op'] == 'clear' else f"حفظ {len(event['pair_ids']) or 1} قرار في {event['kind']}"
+            st.caption(f"👤 {event['reviewer'] or '—'}: {what} ({at})")
+
+    with st.sidebar:
+        status()
+
+
+def render_performance_panel():
+    """لوحة اختيارية لأزمنة المراحل (p50/p95) وإصابات الكاش مع تصدير القياسات"""
+    if not st.sidebar.checkbox("⏱️ لوحة الأداء", key='perf_panel'):
+        return
+    metrics = get_metrics()
+    with st.sidebar:
+        summary = metrics.summary()
+        if summary.empty:
+            st.caption("لا توجد قياسات بعد")
+        else:
+            st.dataframe(summary, hide_index=True, use_container_width=True)
+        stats = get_render_cache().stats()
+        st.caption(f"🗂️ كاش العرض: {stats['size']} سجل — إصابة {stats['hits']} / فقد {stats['misses']}"
+                   f" — محضّر مسبقاً {stats['prefetched']} (معلق {stats['pending']})")
+        col1, col2, col3 = st.columns(3)
+        col1.download_button("JSON", data=metrics.to_json(), file_name="metrics.json",
+                             mime="application/json", key='perf_json')
+        col2.download_button("CSV", data=metrics.to_csv(), file_name="metrics.csv",
+                             mime="text/csv", key='perf_csv')
+        if col3.button("🗑️ مسح", key='perf_clear'):
+            metrics.clear()
+            st.rerun()
 
-    qis_df = read_excel_safely(qis_path, "قسطاس")
-    diwan_df = read_excel_safely(diwan_path, "الديوان")
 
-    if qis_df is None or diwan_df is None:
-        st.stop()
+def render_preload_status(preloader: Preloader):
+    """شريط تقدم التحميل المسبق في الشريط الجانبي، يتحدث تلقائياً حتى الانتهاء"""
+    # run_every يُثبَّت عند تعريف الـ fragment: عند انتهاء التحميل نعيد تشغيل الصفحة مرة واحدة
+    # حتى يُعرَّف من جديد دون تحديث دوري
+    polling = not preloader.finished
 
-    return qis_df, diwan_df
+    @st.fragment(run_every=1 if polling else None)
+    def status():
+        done, total = preloader.progress()
+        if preloader.finished:
+            if polling:
+                st.rerun()
+            for path, error in preloader.errors.items():
+                st.warning(f"تعذر التحميل المسبق: {os.path.basename(path)}\n{error}")
+            return
+        st.progress(done / total if total else 1.0, text=f"⏳ تحميل البيانات مسبقاً: {done} من {total}")
+
+    with st.sidebar:
+        status()
+
+
+@st.cache_resource
+def load_aligned_data(kind: str):
+    """تحميل النوع مع فهرس المطابقة (مرة واحدة لكل تحميل، مشترك بين الجلسات دون نسخ)"""
+    get_metrics().miss('load_aligned_data')
+    with track('load_csv_data', cached=True):
+        qis_df, diwan_df = load_csv_data(kind)
+
+    with track('sort_group_key'):
+        qis_df, diwan_df = sort_by_group_key(qis_df), sort_by_group_key(diwan_df)
+    with track('normalize'):
+        qis_df = add_normalized_columns(qis_df, kind, 'qis')
+        diwan_df = add_normalized_columns(diwan_df, kind, 'diwan')
+
+    with track('alignment'):
+        pairs = build_alignment(qis_df, diwan_df, kind)
+    return qis_df, diwan_df, pairs
+
+
+@st.cache_resource
+def load_diff_matrix(kind: str):
+    """مصفوفة الفروقات لكل أزواج النوع (تُحسب مرة واحدة لكل تحميل)"""
+    get_metrics().miss('load_diff_matrix')
+    qis_df, diwan_df, pairs = load_aligned_data(kind)
+    if pairs is None:
+        return None
+    return compute_diff_matrix(qis_df, diwan_df, pairs, kind)
+
+
+@st.cache_resource
+def load_name_indexes(kind: str):
+    """فهرسا أسماء قسطاس والديوان للمطابقة التقريبية (مرة واحدة لكل تحميل)"""
+    qis_df, diwan_df, _ = load_aligned_data(kind)
+    return build_name_index(qis_df, kind, 'qis'), build_name_index(diwan_df, kind, 'diwan')
+
+
+@st.cache_resource
+def load_search_index(kind: str):
+    """فهرس البحث بالاسم والرقم والسنة في الطرفين (مرة واحدة لكل تحميل)"""
+    qis_df, diwan_df, pairs = load_aligned_data(kind)
+    return build_search_index(qis_df, diwan_df, pairs, kind)
+
+
+@st.cache_resource
+def load_link_graphs(kind: str):
+    """شبكتا روابط الاستبدال والإلغاء لقسطاس والديوان مع فحوصهما (مرة واحدة لكل تحميل)"""
+    qis_df, diwan_df, _ = load_aligned_data(kind)
+    return {'qis': build_link_graph(qis_df, kind, 'qis'), 'diwan': build_link_graph(diwan_df, kind, 'diwan')}
+
+
+@st.cache_resource
+def link_issue_rows(kind: str, check: str = None) -> np.ndarray:
+    """مواضع الأزواج التي في أحد طرفيها مشكلة روابط (من نوع محدد أو أي نوع)، مرة واحدة لكل (نوع، فحص)"""
+    _, _, pairs = load_aligned_data(kind)
+    graphs = load_link_graphs(kind)
+    return np.flatnonzero(np.isin(pairs.qis_pos, graphs['qis'].positions(check))
+                          | np.isin(pairs.diwan_pos, graphs['diwan'].positions(check)))
+
+
+@st.cache_resource
+def load_pair_hashes(kind: str):
+    """بصمة محتوى كل زوج (تُحفظ مع القرار لمعرفة ما تغيّر في النسخ اللاحقة من الملفات)"""
+    diffs = load_diff_matrix(kind)
+    return None if diffs is None else content_hashes(diffs)
+
+
+@st.cache_resource
+def load_review_delta(kind: str, snapshot: int):
+    """تصنيف الأزواج مقابل القرارات حتى المعرف snapshot (لقطة ثابتة حتى لا تتحرك القائمة مع كل حفظ)"""
+    _, _, pairs = load_aligned_data(kind)
+    return review_delta(pairs, load_pair_hashes(kind), get_store().decision_hashes(kind, snapshot))
+
+
+@st.cache_resource
+def get_queue_rows(kind: str, queue: str, only_diff: bool, auto_version: tuple = None, delta_snapshot: int = None,
+                   by_severity: bool = False, field: str = None, link_check: str = None):
+    """مواضع أزواج قائمة المراجعة بعد الفلترة والترتيب (محسوبة مسبقاً حتى يبقى التقدم O(1)).
+    auto_version نسخة القرارات التلقائية في المخزن (مفتاح الكاش): الأزواج المعتمدة تلقائياً تخرج من القائمة.
+    مع delta_snapshot تبقى فقط الأزواج الجديدة أو التي تغيّرت بعد قرارها،
+    ومع field فقط الأزواج المختلفة في هذا الحقل، ومع link_check فقط الأزواج التي فيها مشكلة روابط
+    ('any' لأي فحص)، ومع by_severity ترتيب الأخطر أولاً."""
+    _, _, pairs = load_aligned_data(kind)
+    diffs = load_diff_matrix(kind)
+    rows = pairs.queues[queue]
+    if only_diff:
+        rows = diffs.differing(rows)
+    if field:
+        rows = diffs.with_field(rows, field)
+    if link_check:
+        rows = rows[np.isin(rows, link_issue_rows(kind, None if link_check == 'any' else link_check))]
+    if auto_version and auto_version[0]:
+        resolved = get_store().decided_pairs(kind, AUTO_SOURCE)
+        rows = rows[[pid not in resolved for pid in pairs.pair_ids[rows]]]
+    if delta_snapshot is not None:
+        delta = load_review_delta(kind, delta_snapshot)
+        rows = rows[np.isin(rows, np.concatenate([delta[CHANGED], delta[NEW]]))]
+    if by_severity:
+        rows = diffs.by_severity(rows)
+    return rows
 
 # ==================== باقي الكود كما هو تمامًا (لم يتم حذفه أو تغييره) ====================
 
-def save_to_file(filename: str, data) -> None:
-    try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        st.error(f"خطأ في حفظ البيانات: {str(e)}")
+@st.cache_resource
+def get_activity_feed() -> deque:
+    """آخر تغييرات المخزن من كل الجلسات (مشترك في العملية)"""
+    return deque(maxlen=ACTIVITY_SIZE)
+
+
+@st.cache_resource
+def get_store() -> DecisionStore:
+    """مخزن القرارات المشترك بين كل الجلسات: القراءة عبر كاشه والكتابة مباشرة إليه،
+    مع ترحيل ملفات JSON القديمة أول مرة. كل تغيير يصل إلى سجل النشاط المشترك."""
+    store = DecisionStore(DB_FILE, DATA_FILE, PROGRESS_FILE)
+    store.subscribe(get_activity_feed().appendleft)
+    return store
+
+def progress_key(kind: str = None) -> str:
+    """مفتاح مؤشر التقدم: مؤشر مستقل لكل نوع تشريع ولكل مراجع (دون kind: المفتاح القديم المشترك بين الأنواع)"""
+    key = f"{reviewer}:current_index" if reviewer else 'current_index'
+    return f"{kind}:{key}" if kind else key
+
+
+def load_progress() -> int:
+    """مؤشر النوع الحالي، وإن لم يُحفظ بعد فالمؤشر القديم المشترك (قبل فصل المؤشرات حسب النوع)"""
+    store = get_store()
+    index = store.get_progress(progress_key(option), None)
+    if index is None:
+        index = store.get_progress(progress_key())
+    return index or 0
 
-def load_from_file(filename: str):
-    try:
-        if os.path.exists(filename):
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception as e:
-        st.error(f"خطأ في تحميل البيانات: {str(e)}")
-    return None
 
 class SessionManager:
     @staticmethod
     def initialize():
-        if 'comparison_data' not in st.session_state:
-            saved = load_from_file(DATA_FILE)
-            st.session_state.comparison_data = saved if saved else []
-        if 'current_index' not in st.session_state:
-            saved = load_from_file(PROGRESS_FILE)
-            st.session_state.current_index = saved if saved else 0
+        if st.session_state.get('progress_key') != progress_key(option):
+            # نوع أو مراجع جديد: مؤشره المحفوظ، ومؤشرات القوائم والعرض الحالي تخص النوع السابق
+            st.session_state.current_index = load_progress()
+            st.session_state.progress_key = progress_key(option)
+            release_session_lease()
+            st.session_state.queue_cursors = {}
+            st.session_state.active_view = None
         if 'show_custom_form' not in st.session_state:
             st.session_state.show_custom_form = False
         if 'confirm_delete' not in st.session_state:
@@ -114,26 +307,12 @@ class SessionManager:
 
     @staticmethod
     def save_persistent():
+        """حفظ مؤشر التقدم فقط - القرارات تُضاف للمخزن فور اتخاذها"""
         try:
-            save_to_file(DATA_FILE, st.session_state.comparison_data)
-            save_to_file(PROGRESS_FILE, st.session_state.current_index)
-        except Exception:
-            pass
-
-def parse_status(val):
-    if val is None: return None
-    if isinstance(val, (int, float)):
-        try: return int(val)
-        except: return None
-    try:
-        v = str(val).strip()
-        if v == '': return None
-        if v == 'غير ساري': return 2
-        if v.isdigit(): return int(v)
-        f = float(v.replace(',', '.'))
-        return int(f)
-    except Exception:
-        return None
+            with track('save_persistent_data'):
+                get_store().set_progress(st.session_state.current_index, progress_key(option))
+        except Exception as e:
+            st.error(f"خطأ في حفظ البيانات: {str(e)}")
 
 def initialize_session_state():
     SessionManager.initialize()
@@ -141,26 +320,84 @@ def initialize_session_state():
 def save_persistent_data():
     SessionManager.save_persistent()
 
-def get_legislation_data(index: int, source_df: pd.DataFrame) -> dict:
-    if index >= len(source_df):
-        return {}
-    row = source_df.iloc[index]
-    return {k: ('' if pd.isna(v) else v) for k, v in row.to_dict().items()}
+@st.cache_resource
+def get_render_cache() -> RenderCache:
+    """كاش حمولات عرض الأزواج مع خيط التحضير المسبق (واحد لكل العملية)"""
+    return RenderCache()
+
+
+def render_job(qistas_df: pd.DataFrame, diwan_df: pd.DataFrame, pairs, diffs, pair_row: int):
+    """(مفتاح الكاش، دالة البناء) لزوج: المفتاح يتضمن بصمة محتوى الزوج فلا تُعرض حمولة قديمة بعد تغير البيانات"""
+    key = (option, pairs.pair_ids[pair_row], load_pair_hashes(option)[pair_row])
+    return key, lambda: build_payload(qistas_df, diwan_df, pairs, diffs, pair_row)
+
+
+def render_payload(qistas_df: pd.DataFrame, diwan_df: pd.DataFrame, pairs, diffs, pair_row: int) -> dict:
+    """حمولة عرض الزوج من كاش العرض (تُقاس كإصابة أو فقد)"""
+    key, build = render_job(qistas_df, diwan_df, pairs, diffs, pair_row)
+
+    def build_now():
+        get_metrics().miss('render_payload')
+        return build()
+
+    with track('render_payload', cached=True):
+        return get_render_cache().get(key, build_now)
+
 
-def save_comparison_record(data: dict, source: str) -> None:
-    new_record = {
+def build_record(data: dict, source: str) -> dict:
+    return {
         'تاريخ الإدخال': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         'المصدر الصحيح': source,
+        'نوع التشريع': option,
+        'المراجع': reviewer,
         **data
     }
-    st.session_state.comparison_data.append(new_record)
-    save_persistent_data()
+
+def pair_hash(pair_id: str):
+    """بصمة المحتوى الحالية للزوج (None إذا لم يكن معروفاً)"""
+    _, _, pairs = load_aligned_data(option)
+    row = pairs.row_of.get(pair_id) if pairs is not None else None
+    return None if row is None else load_pair_hashes(option)[row]
+
+def save_comparison_record(data: dict, source: str, pair_id: str = None) -> None:
+    new_record = build_record(data, source)
+    try:
+        with track('save_comparison_record'):
+            get_store().append(new_record, kind=option, reviewer=reviewer or None, pair_id=pair_id,
+                               content_hash=pair_hash(pair_id))
+    except Exception as e:
+        st.error(f"خطأ في حفظ البيانات: {str(e)}")
+
+def auto_resolve_identical(qistas_df: pd.DataFrame, pairs, pair_rows) -> int:
+    """اعتماد الأزواج المتطابقة تماماً دفعة واحدة (كتابة واحدة) بمصدر 'تطابق تلقائي'"""
+    if len(pair_rows) == 0:
+        return 0
+    qis_rows = qistas_df.iloc[pairs.qis_pos[pair_rows]][source_columns(qistas_df)]
+    hashes = load_pair_hashes(option)
+    records = [
+        (build_record({k: ('' if pd.isna(v) else v) for k, v in data.items()}, AUTO_SOURCE), pair_id, content_hash)
+        for data, pair_id, content_hash in zip(qis_rows.to_dict('records'), pairs.pair_ids[pair_rows], hashes[pair_rows])
+    ]
+    return get_store().append_many(records, kind=option, reviewer=reviewer or None, replace=False)
+
+def rerun_review() -> None:
+    """إعادة تشغيل جزء المراجعة فقط (fragment) بدل السكربت كاملاً.
+    إذا جاء الحدث ضمن تشغيل كامل للصفحة نعيد التشغيل الكامل كالمعتاد."""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
 
 def move_to_next_record(total_records: int, current_index: int) -> None:
     if current_index + 1 < total_records:
         st.session_state.current_index += 1
         save_persistent_data()
-        st.rerun()
+        rerun_review()
+    elif st.session_state.get('lease'):
+        # نهاية النطاق المحجوز: ننتقل خارجه ليُسلَّم النطاق ويُحجز التالي
+        st.session_state.current_index += 1
+        save_persistent_data()
+        rerun_review()
     else:
         st.balloons()
         st.success(f"تم الانتهاء من جميع السجلات!")
@@ -379,106 +616,85 @@ def render_wizard_steps(current_index: int, total_records: int):
 
 
 # ==================== عرض المقارنة ====================
-def render_law_comparison(qistas_df: pd.DataFrame, diwan_df: pd.DataFrame, current_index: int, total_records: int):
-    """عرض مقارنة سجل محدد كجدول (اسم الحقل | قسطاس | الديوان) - يدعم جميع أنواع التشريعات تلقائيًا"""
-    qistas_data = get_legislation_data(current_index, qistas_df)
-    diwan_data = get_legislation_data(current_index, diwan_df)
+def render_law_comparison(qistas_df: pd.DataFrame, diwan_df: pd.DataFrame, pairs, diffs, pair_row: int,
+                          current_index: int, total_records: int):
+    """عرض مقارنة زوج سجلات كجدول (اسم الحقل | قسطاس | الديوان) - يدعم جميع أنواع التشريعات تلقائيًا
+    pair_row هو موضع الزوج في فهرس المطابقة (الطرف غير الموجود يظهر فارغاً)"""
+    qis_pos, diwan_pos = pairs.pair(pair_row)
+    payload = render_payload(qistas_df, diwan_df, pairs, diffs, pair_row)
+    qistas_data, diwan_data = payload['qistas_data'], payload['diwan_data']
 
     st.markdown("<h3 style='color: #667eea !important; text-align: center;'>المقارنة التفصيلية</h3>", unsafe_allow_html=True)
+    if diffs.severity[pair_row]:
+        st.caption(f"درجة الخطورة: {diffs.severity[pair_row]}")
     st.markdown("<br>", unsafe_allow_html=True)
 
-    # === خريطة ذكية للأعمدة حسب نوع التشريع (الحل النهائي والأخير) ===
-    FIELD_MAPPING = {
-        "نظام": {
-            "name_qis": "LegName",           "name_diw": "ByLawName",
-            "num_qis":  "LegNumber",          "num_diw":  "ByLawNumber",
-        },
-        "قانون": {
-            "name_qis": "LegName",           "name_diw": "Law_Name",
-            "num_qis":  "LegNumber",         "num_diw":  "Law_Number",
-        },
-        "تعليمات": {
-            "name_qis": "LegName",   "name_diw": "Instruction_Name",
-            "num_qis":  "LegNumber", "num_diw":  "Instruction_Number",
-        },
-        "اتفاقيات": {
-            "name_qis": "LegName",     "name_diw": "Agreement_Name",
-            "num_qis":  "LegNumber",   "num_diw":  "Agreement_Number",
-        }
-    }
-
-    # نأخذ الخريطة الصحيحة حسب النوع المختار (مع fallback آمن)
-    mapping = FIELD_MAPPING.get(option, FIELD_MAPPING["نظام"])
-
-    # الأعمدة الأساسية اللي تظهر دائمًا
-    DISPLAY_FIELDS = [
-        ("اسم التشريع",       mapping["name_qis"], mapping["name_diw"]),
-        ("رقم التشريع",       mapping["num_qis"],  mapping["num_diw"]),
-        ("السنة",              "Year",             "Year"),
-        ("يحل محل",           "Replaced For",     "Replaced_For"),
-        ("تاريخ الجريدة",     "Magazine_Date",    "Magazine_Date"),
-        ("تاريخ السريان",     "ActiveDate",       "Active_Date"),
-        ("الحالة",            "Status",           "Status"),
-    ]
-
-    # الحقول اللي تظهر فقط إذا كان Status = 2 (غير ساري)
-    CONDITIONAL_FIELDS = [
-        ("ألغي بواسطة",       "Canceled By",      "Canceled_By"),
-        ("تاريخ الانتهاء",    "EndDate",          "EndDate"),
-        ("تم استبداله بواسطة", "Replaced By",      "Replaced_By"),
-    ]
-
-    # تحليل حالة قسطاس لتحديد إظهار الحقول المشروطة
-    status_q_int = parse_status(qistas_data.get('Status'))
-
-    rows = []
-
-    # === إضافة الحقول الأساسية ===
-    for label, q_key, d_key in DISPLAY_FIELDS:
-        qv = qistas_data.get(q_key, '')
-        dv = diwan_data.get(d_key, '')
-
-        q_str = '—' if pd.isna(qv) or str(qv).strip() == '' else str(qv)
-        d_str = '—' if pd.isna(dv) or str(dv).strip() == '' else str(dv)
-
-        diff_class = 'cmp-diff' if q_str != '—' and d_str != '—' and q_str != d_str else ''
-        rows.append((label, q_str, d_str, diff_class))
+    # الجدول جاهز من كاش العرض (مبني من مصفوفة الفروقات دون تحويل نصي أو مقارنة هنا)
+    if payload['table_html']:
+        st.markdown(payload['table_html'], unsafe_allow_html=True)
+    else:
+        st.info("لا توجد بيانات للمقارنة في هذا السجل.")
 
-    # === إضافة الحقول المشروطة فقط إذا كان "غير ساري" ===
-    if status_q_int == 2:
-        for label, q_key, d_key in CONDITIONAL_FIELDS:
-            qv = qistas_data.get(q_key, '')
-            dv = diwan_data.get(d_key, '') if d_key else qistas_data.get(q_key, '')
+    decision = get_store().decision(option, pairs.pair_ids[pair_row])
+    if decision:
+        by = f" — {decision['reviewer']}" if decision['reviewer'] else ""
+        st.info(f"📌 قرار محفوظ: {decision['source']}{by} ({decision['created_at']}). أي اختيار جديد يستبدله.")
 
-            q_str = '—' if pd.isna(qv) or str(qv).strip() == '' else str(qv)
-            d_str = '—' if pd.isna(dv) or str(dv).strip() == '' else str(dv)
+    render_link_issues(qis_pos, diwan_pos)
 
-            # لا نعرض السطر إذا كلاهما فارغان
-            if q_str == '—' and d_str == '—':
-                continue
-
-            diff_class = 'cmp-diff' if q_str != '—' and d_str != '—' and q_str != d_str else ''
-            rows.append((label, q_str, d_str, diff_class))
-
-    # === رسم الجدول النهائي ===
-    if rows:
-        html = ["<div class='cmp-wrapper'><table class='cmp-table'>"]
-        html.append("<thead><tr><th>اسم الحقل</th><th>قسطاس</th><th>الديوان</th></tr></thead><tbody>")
-        for label, qv, dv, cls in rows:
-            q_td = f"<td class='{cls}'>{qv}</td>"
-            d_td = f"<td class='{cls}'>{dv}</td>"
-            html.append(f"<tr><td>{label}</td>{q_td}{d_td}</tr>")
-        html.append("</tbody></table></div>")
-        st.markdown("\n".join(html), unsafe_allow_html=True)
-    else:
-        st.info("لا توجد بيانات للمقارنة في هذا السجل.")
+    if qis_pos < 0 or diwan_pos < 0:
+        render_match_candidates(qistas_df, diwan_df, pairs, qis_pos, diwan_pos)
 
     # استدعاء الأزرار التحكم (اختيار المصدر + التنقل)
-    render_selection_buttons(qistas_data, diwan_data, current_index, total_records)
+    # تعديل قرار "مصدر آخر" يبدأ من القيم المحفوظة بدل قيم المصدر
+    custom_data = None
+    if decision and decision['source'] == CUSTOM_SOURCE:
+        custom_data = {k: v for k, v in decision['record'].items() if k not in RECORD_META_KEYS}
+    render_selection_buttons(qistas_data, diwan_data, current_index, total_records, pairs.pair_ids[pair_row],
+                             custom_data)
     render_navigation_buttons(current_index, total_records)
 
 
-def render_selection_buttons(qistas_data: dict, diwan_data: dict, current_index: int, total_records: int):
+def render_link_issues(qis_pos: int, diwan_pos: int):
+    """مشكلات روابط الاستبدال والإلغاء لطرفي الزوج الحالي"""
+    graphs = load_link_graphs(option)
+    for side, pos, label in (('qis', qis_pos, "قسطاس"), ('diwan', diwan_pos, "الديوان")):
+        if pos < 0:
+            continue
+        for issue in graphs[side].for_position(pos).itertuples():
+            field = f" [{issue.column}]" if issue.column else ""
+            st.warning(f"🔗 {label}: {CHECK_LABELS[issue.check]}{field} — {issue.detail}")
+
+
+def render_match_candidates(qistas_df: pd.DataFrame, diwan_df: pd.DataFrame, pairs, qis_pos: int, diwan_pos: int):
+    """أقرب السجلات من المصدر الآخر لسجل دون مقابل (مطابقة تقريبية للأسماء)"""
+    qis_index, diwan_index = load_name_indexes(option)
+    mapping = get_mapping(option)
+    if qis_pos >= 0:
+        own_index, own_pos, other_index, other_df = qis_index, qis_pos, diwan_index, diwan_df
+        other_label, other_name, other_num, other_pos = "الديوان", mapping['name_diw'], mapping['num_diw'], pairs.diwan_pos
+    else:
+        own_index, own_pos, other_index, other_df = diwan_index, diwan_pos, qis_index, qistas_df
+        other_label, other_name, other_num, other_pos = "قسطاس", mapping['name_qis'], mapping['num_qis'], pairs.qis_pos
+
+    matches = other_index.query(own_index.names[own_pos], own_index.years[own_pos], own_index.numbers[own_pos])
+    with st.expander(f"🔎 سجلات مشابهة في {other_label} ({len(matches)})", expanded=bool(matches)):
+        if not matches:
+            st.caption("لا توجد سجلات مشابهة في نفس السنة.")
+            return
+        paired = set(int(p) for p in other_pos if p >= 0)
+        st.dataframe(pd.DataFrame([{
+            'الاسم': other_df[other_name].iloc[cand] if other_name in other_df.columns else '',
+            'الرقم': other_df[other_num].iloc[cand] if other_num in other_df.columns else '',
+            'السنة': other_df['Year'].iloc[cand] if 'Year' in other_df.columns else '',
+            'التشابه': f"{similarity:.0%}",
+            'نفس الرقم': '✔' if same_number else '',
+            'له مقابل': '✔' if cand in paired else '',
+        } for cand, _, similarity, same_number in matches]), hide_index=True, use_container_width=True)
+
+
+def render_selection_buttons(qistas_data: dict, diwan_data: dict, current_index: int, total_records: int,
+                             pair_id: str = None, custom_data: dict = None):
     """عرض أزرار اختيار المصدر"""
     st.markdown("---")
     st.markdown("<h3 style='color: white !important; text-align: center; margin-top: 2rem;'>❓ أيهما أكثر دقة؟</h3>", unsafe_allow_html=True)
@@ -487,28 +703,28 @@ def render_selection_buttons(qistas_data: dict, diwan_data: dict, current_index:
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("✅ قسطاس صحيح", use_container_width=True, key=f"qistas_{current_index}"):
-            save_comparison_record(qistas_data, 'قسطاس')
+        if st.button("✅ قسطاس صحيح", use_container_width=True, key=f"qistas_{current_index}", disabled=not qistas_data):
+            save_comparison_record(qistas_data, QIS_SOURCE, pair_id)
             st.success("✅ تم حفظ النتيجة من قسطاس!")
             move_to_next_record(total_records, current_index)
     
     with col2:
-        if st.button("✅ الديوان صحيح", use_container_width=True, key=f"diwan_{current_index}"):
-            save_comparison_record(diwan_data, 'الديوان')
+        if st.button("✅ الديوان صحيح", use_container_width=True, key=f"diwan_{current_index}", disabled=not diwan_data):
+            save_comparison_record(diwan_data, DIWAN_SOURCE, pair_id)
             st.success("✅ تم حفظ النتيجة من الديوان!")
             move_to_next_record(total_records, current_index)
     
     with col3:
         if st.button("⚠️ لا أحد منهم", use_container_width=True, key=f"none_{current_index}"):
             st.session_state.show_custom_form = True
-            st.rerun()
+            rerun_review()
     
     # نموذج الإدخال المخصص
     if st.session_state.get('show_custom_form', False):
-        render_custom_form(qistas_data, current_index, total_records)
+        render_custom_form(custom_data or qistas_data or diwan_data, current_index, total_records, pair_id)
 
 
-def render_custom_form(reference_data: dict, current_index: int, total_records: int):
+def render_custom_form(reference_data: dict, current_index: int, total_records: int, pair_id: str = None):
     """عرض نموذج الإدخال المخصص"""
     st.markdown("---")
     st.markdown("<h3 style='color: white !important; text-align: center;'>✍️ أدخل البيانات الصحيحة</h3>", unsafe_allow_html=True)
@@ -539,14 +755,14 @@ def render_custom_form(reference_data: dict, current_index: int, total_records:
             cancel_custom = st.form_submit_button("❌ إلغاء", use_container_width=True)
         
         if submit_custom:
-            save_comparison_record(custom_data, 'مصدر آخر')
+            save_comparison_record(custom_data, CUSTOM_SOURCE, pair_id)
             st.session_state.show_custom_form = False
             st.success("✅ تم حفظ البيانات المخصصة!")
             move_to_next_record(total_records, current_index)
         
         if cancel_custom:
             st.session_state.show_custom_form = False
-            st.rerun()
+            rerun_review()
 
 
 def render_navigation_buttons(current_index: int, total_records: int):
@@ -560,22 +776,225 @@ def render_navigation_buttons(current_index: int, total_records: int):
                 st.session_state.current_index -= 1
                 st.session_state.show_custom_form = False
                 save_persistent_data()
-                st.rerun()
+                rerun_review()
     
 
 
-def render_comparison_tab(qistas_df: pd.DataFrame, diwan_df: pd.DataFrame):
-    """عرض تبويب المقارنة التفصيلية"""
+def jump_to_pair(pair_row: int) -> None:
+    """callback: نقل الويزارد مباشرة إلى زوج محدد، مع اختيار قائمته وإلغاء الفلاتر التي تخفيه.
+    يعمل قبل رسم عناصر الشريط الجانبي فيجوز تعديل قيمها هنا."""
+    _, _, pairs = load_aligned_data(option)
+    queue = next(name for name, rows in pairs.queues.items() if pair_row in rows)
+    auto_version = get_store().source_version(option, AUTO_SOURCE)
+    only_diff = st.session_state.get('only_diff', False)
+    snapshot = st.session_state.get('delta_snapshot')
+    by_severity = st.session_state.get('queue_order') == 'severity'
+    field = st.session_state.get('diff_field') or None
+    link_check = st.session_state.get('link_check') or None
+    rows = get_queue_rows(option, queue, only_diff, auto_version, snapshot, by_severity, field, link_check)
+    if pair_row not in rows:
+        only_diff, snapshot, field, link_check = False, None, None, None
+        rows = get_queue_rows(option, queue, only_diff, auto_version, snapshot, by_severity, field, link_check)
+    if pair_row not in rows:
+        st.session_state.search_notice = "هذا السجل معتمد تلقائياً ولا يظهر في قوائم المراجعة."
+        return
+
+    st.session_state.queue_cursors[st.session_state.active_view] = st.session_state.current_index
+    st.session_state.queue_choice = queue
+    st.session_state.only_diff = only_diff
+    st.session_state.only_changed = snapshot is not None
+    st.session_state.delta_snapshot = snapshot
+    st.session_state.diff_field = field or ''
+    st.session_state.link_check = link_check or ''
+    st.session_state.active_view = (queue, only_diff, auto_version, snapshot, by_severity, field, link_check)
+    st.session_state.current_index = int(np.flatnonzero(rows == pair_row)[0])
+    st.session_state.show_custom_form = False
+    save_persistent_data()
+
+
+def render_search(qistas_df: pd.DataFrame, diwan_df: pd.DataFrame, pairs):
+    """بحث في الشريط الجانبي بالاسم أو الرقم أو السنة، والانتقال مباشرة إلى الزوج المختار"""
+    query = st.sidebar.text_input("🔍 بحث عن تشريع", key="search_query", placeholder="الاسم أو الرقم أو السنة")
+    notice = st.session_state.pop('search_notice', None)
+    if notice:
+        st.sidebar.warning(notice)
+    if not query.strip():
+        return
+
+    results = load_search_index(option).search(query)
+    if len(results) == 0:
+        st.sidebar.caption("لا توجد نتائج.")
+        return
+
+    mapping = get_mapping(option)
+
+    def label(pair_row):
+        qis_pos, diwan_pos = pairs.pair(pair_row)
+        if qis_pos >= 0:
+            name = qistas_df[mapping['name_qis']].iloc[qis_pos]
+        else:
+            name = diwan_df[mapping['name_diw']].iloc[diwan_pos]
+        queue = next(q for q, rows in pairs.queues.items() if pair_row in rows)
+        return f"{name} {pairs.pair_ids[pair_row]} — {QUEUE_LABELS[queue]}"
+
+    choice = st.sidebar.selectbox(f"النتائج ({len(results)})", [int(r) for r in results], format_func=label,
+                                  key="search_choice")
+    st.sidebar.button("↩️ الانتقال إلى السجل", on_click=jump_to_pair, args=(choice,), use_container_width=True,
+                      key="search_jump", disabled=multi_review,
+                      help="غير متاح في وضع المراجعة المتعددة (النطاق محجوز)" if multi_review else None)
+
+
+def render_queue_selector(qistas_df: pd.DataFrame, pairs, diffs):
+    """اختيار قائمة المراجعة (مطابقة / قسطاس فقط / الديوان فقط) وفلتر الفروقات مع حفظ موضع كل عرض"""
+    counts = pairs.counts()
+    queue = st.sidebar.radio(
+        "قائمة المراجعة:",
+        list(QUEUE_LABELS),
+        format_func=lambda q: f"{QUEUE_LABELS[q]} ({counts[q]})",
+        key="queue_choice",
+    )
+    only_diff = st.sidebar.checkbox("السجلات المختلفة فقط", key="only_diff")
+    by_severity = st.sidebar.radio(
+        "ترتيب المراجعة:",
+        ['file', 'severity'],
+        format_func={'file': "ترتيب الملف", 'severity': "الأخطر أولاً"}.get,
+        key="queue_order",
+        horizontal=True,
+        help="الأخطر أولاً: حسب مجموع أوزان الحقول المختلفة (الحالة والرقم والسنة أعلاها)",
+    ) == 'severity'
+    field = st.sidebar.selectbox(
+        "المختلفة في الحقل:",
+        [''] + list(diffs.labels),
+        format_func=lambda label: label or "كل الحقول",
+        key="diff_field",
+    ) or None
+    link_counts = {check: len(link_issue_rows(option, check)) for check in CHECK_LABELS}
+    link_check = st.sidebar.selectbox(
+        "فحص روابط الاستبدال والإلغاء:",
+        ['', 'any'] + list(CHECK_LABELS),
+        format_func=lambda c: {'': "دون فلترة", 'any': "أي مشكلة"}.get(c) or f"{CHECK_LABELS[c]} ({link_counts[c]})",
+        key="link_check",
+    ) or None
+
+    with st.sidebar.expander("📊 الفروقات حسب الحقل"):
+        field_counts = diffs.field_counts(pairs.queues[MATCHED])
+        st.dataframe(field_counts.rename("عدد الفروقات"), use_container_width=True)
+
+    # الاعتماد التلقائي: الأزواج المتطابقة تماماً تُحفظ دفعة واحدة وتخرج من قائمة المراجعة
+    # الأزواج التي لها أي قرار (يدوي أو تلقائي) لا تُعتمد تلقائياً حتى لا يُستبدل قرار المراجع
+    decided = get_store().decided_pairs(option)
+    identical = diffs.identical_rows(pairs.queues[MATCHED])
+    pending = identical[[pid not in decided for pid in pairs.pair_ids[identical]]]
+    if st.sidebar.button(f"⚡ اعتماد المتطابقة تلقائياً ({len(pending)})", disabled=len(pending) == 0,
+                         use_container_width=True, key="auto_resolve"):
+        saved = auto_resolve_identical(qistas_df, pairs, pending)
+        st.toast(f"✅ تم اعتماد {saved} سجل متطابق")
+        st.rerun()
+
+    # المراجعة التزايدية: الأزواج التي لم تتغير منذ قرارها تُرحّل ولا تعود للقائمة
+    only_changed = st.sidebar.checkbox("الجديدة أو المتغيرة فقط", key="only_changed",
+                                       help="تخطي الأزواج التي لها قرار سابق ولم يتغير محتواها منذ ذلك القرار")
+    if not only_changed:
+        st.session_state.delta_snapshot = None
+    elif st.session_state.get('delta_snapshot') is None:
+        st.session_state.delta_snapshot = get_store().version()[1]
+    if only_changed:
+        delta = load_review_delta(option, st.session_state.delta_snapshot)
+        st.sidebar.caption(" — ".join(f"{label}: {len(delta[name])}" for name, label in DELTA_LABELS.items()))
+
+    auto_version = get_store().source_version(option, AUTO_SOURCE)
+    view = (queue, only_diff, auto_version, st.session_state.delta_snapshot, by_severity, field, link_check)
+    previous = st.session_state.active_view
+    if previous is None or view[:2] + view[3:] == previous[:2] + previous[3:]:
+        # أول عرض بعد تحميل المؤشر المحفوظ لهذا النوع، أو تغيّر القرارات التلقائية فقط: يبقى المؤشر كما هو
+        st.session_state.active_view = view
+    elif view != previous:
+        st.session_state.queue_cursors[previous] = st.session_state.current_index
+        st.session_state.current_index = st.session_state.queue_cursors.get(view, 0)
+        st.session_state.active_view = view
+        st.session_state.show_custom_form = False
+    return view
+
+
+def lease_queue(view) -> str:
+    """اسم قائمة الحجز: القائمة وحدها. النطاقات مواضع في ترتيبها الأساسي (ترتيب الملف) المشترك بين كل
+    المراجعين، أما الفلاتر والترتيب حسب الخطورة فتُطبق داخل النطاق المحجوز فقط، فلا يتداخل مراجعان
+    مهما اختلفت فلاترهما، ولا تتغير الحجوزات مع الاعتماد التلقائي أو لقطة "الجديدة أو المتغيرة"."""
+    return view[0]
+
+
+def lease_progress_key(view) -> str:
+    """مفتاح معرف الحجز الذي يخصه مؤشر التقدم المحفوظ (لكل نوع ومراجع وقائمة)"""
+    return f"{progress_key(option)}:lease:{lease_queue(view)}"
+
+
+def resolve_lease(view, queue_rows: np.ndarray):
+    """حجز نطاق المراجع الحالي (أو تجديده)، وتسليمه فقط حين يكون لكل أزواجه قرار محفوظ ثم حجز التالي.
+    الأزواج التي تخفيها فلاتر الجلسة تبقى في النطاق حتى يُتخذ فيها قرار، فلا تضيع على الجميع.
+    يعيد (الحجز مع عدد أزواجه دون قرار في 'pending'، أزواج عرض الجلسة داخل النطاق بترتيب العرض)."""
+    store = get_store()
+    _, _, pairs = load_aligned_data(option)
+    canonical = pairs.queues[view[0]]
+    decided = store.decided_pairs(option)
+    lease = store.acquire_lease(option, lease_queue(view), len(canonical), reviewer)
+    while lease is not None:
+        in_range = pairs.pair_ids[canonical[lease['start']:lease['end']]]
+        lease['pending'] = sum(pid not in decided for pid in in_range)
+        if lease['pending']:
+            break
+        store.complete_lease(lease['id'])
+        lease = store.acquire_lease(option, lease_queue(view), len(canonical), reviewer)
+    st.session_state.lease = lease
+    if lease is None:
+        return None, queue_rows[:0]
+
+    # المؤشر المحفوظ يخص نطاقاً آخر (نطاق جديد): البدء من أوله. إعادة تحميل الصفحة تُبقي المؤشر
+    if store.get_progress(lease_progress_key(view), None) != lease['id']:
+        st.session_state.current_index = 0
+        st.session_state.show_custom_form = False
+        save_persistent_data()
+        store.set_progress(lease['id'], lease_progress_key(view))
+    return lease, queue_rows[np.isin(queue_rows, canonical[lease['start']:lease['end']])]
+
+
+def release_session_lease() -> None:
+    """إرجاع نطاق الجلسة (إيقاف المراجعة المتعددة أو تغيير المراجع) ليتسلمه غيره فوراً"""
+    lease = st.session_state.get('lease')
+    if lease:
+        get_store().release_lease(lease['id'])
+    st.session_state.lease = None
+
+
+@st.fragment
+def render_comparison_tab(qistas_df: pd.DataFrame, diwan_df: pd.DataFrame, pairs, diffs, view):
+    """عرض تبويب المقارنة التفصيلية لقائمة المراجعة المختارة.
+    يعمل كـ fragment: أزرار الاختيار والتنقل تعيد تشغيل هذا الجزء فقط،
+    دون التنسيقات والعنوان والشريط الجانبي وتبويب البيانات المحفوظة."""
     st.markdown("<div class='comparison-card'>", unsafe_allow_html=True)
     
-    total_records = min(len(qistas_df), len(diwan_df))
+    queue = view[0]
+    queue_rows = get_queue_rows(option, *view)
+    total_records = len(queue_rows)
+
+    if multi_review:
+        lease, queue_rows = resolve_lease(view, queue_rows)
+        if lease is None:
+            st.success("🎉 تم توزيع جميع سجلات هذه القائمة - لا توجد نطاقات متاحة حالياً")
+            st.markdown("</div>", unsafe_allow_html=True)
+            return
+        summary = get_store().lease_summary(option, lease_queue(view))
+        st.info(f"👤 {reviewer}: النطاق المحجوز {lease['start'] + 1} - {lease['end']} ({len(queue_rows)} سجل في هذا العرض) "
+                f"(النطاقات المنجزة: {summary['done']} — قيد المراجعة: {summary['active']})")
+        total_records = len(queue_rows)
+    else:
+        release_session_lease()
     current_index = st.session_state.current_index
     
     # شريط التقدم
     progress_percentage = int(((current_index + 1) / total_records) * 100) if total_records > 0 else 0
     st.markdown(f"""
         <div class='wizard-container'>
-            <h3 style='color: #667eea; text-align: center; margin-bottom: 0.5rem;'>مقارنة التشريعات</h3>
+            <h3 style='color: #667eea; text-align: center; margin-bottom: 0.5rem;'>مقارنة التشريعات - {QUEUE_LABELS[queue]}</h3>
             <p style='color: #718096; text-align: center; font-size: 1.1em; margin-bottom: 2rem;'>
                 {current_index + 1} من {total_records} ({progress_percentage}%)
             </p>
@@ -597,41 +1016,191 @@ def render_comparison_tab(qistas_df: pd.DataFrame, diwan_df: pd.DataFrame):
     
     
     if current_index < total_records:
-        render_law_comparison(qistas_df, diwan_df, current_index, total_records)
+        with track('render_law_comparison'):
+            render_law_comparison(qistas_df, diwan_df, pairs, diffs, int(queue_rows[current_index]),
+                                  current_index, total_records)
+        # تحضير السجلات التالية في الخلفية حتى يكون "التالي" قراءة من الكاش
+        upcoming = queue_rows[current_index + 1:min(current_index + 1 + PREFETCH_AHEAD, total_records)]
+        get_render_cache().prefetch(render_job(qistas_df, diwan_df, pairs, diffs, int(row)) for row in upcoming)
+    elif multi_review:
+        # النطاق لا يُسلَّم إلا بعد قرار لكل أزواجه، بما فيها المخفية بالفلاتر أو التي تم تخطيها
+        st.warning(f"انتهت سجلات هذا العرض في النطاق المحجوز، وبقي {lease['pending']} سجل دون قرار "
+                   f"(قد تخفيها الفلاتر الحالية). يُسلَّم النطاق بعد حفظ قرار لكل سجلاته.")
+        if st.button("🔄 العودة إلى أول النطاق", use_container_width=True):
+            st.session_state.current_index = 0
+            st.session_state.show_custom_form = False
+            save_persistent_data()
+            rerun_review()
     else:
         st.success(f"🎉 تم الانتهاء من مراجعة جميع السجلات!")
         if st.button("🔄 البدء من جديد", use_container_width=True):
             st.session_state.current_index = 0
             st.session_state.show_custom_form = False
             save_persistent_data()
-            st.rerun()
+            rerun_review()
     
     st.markdown("</div>", unsafe_allow_html=True)
 
 
+@st.cache_data(max_entries=6, show_spinner=False)
+def build_saved_export(fmt: str, version: tuple) -> bytes:
+    """ملف التصدير للقرارات المحفوظة (version مفتاح الكاش: يُعاد البناء فقط عند تغير المخزن)"""
+    get_metrics().miss(f'saved_export_{fmt}')
+    df = pd.DataFrame(get_store().records())
+    return export_bytes(df, fmt, sheet_name='مقارنة التشريعات')
+
+
+def timed_saved_export(fmt: str, version: tuple) -> bytes:
+    with track(f'saved_export_{fmt}', cached=True):
+        return build_saved_export(fmt, version)
+
+
+@st.cache_resource
+def load_golden(kind: str) -> GoldenDataset:
+    """البيانات المعتمدة للنوع (مشتركة بين الجلسات، تُحدَّث تزايدياً مع كل قرار جديد)"""
+    qis_df, diwan_df, pairs = load_aligned_data(kind)
+    return GoldenDataset(qis_df, diwan_df, pairs, kind)
+
+
+@st.cache_data(max_entries=6, show_spinner=False)
+def build_golden_export(kind: str, fmt: str, include_pending: bool, version: tuple) -> bytes:
+    """ملف البيانات المعتمدة للنوع (version مفتاح الكاش كما في build_saved_export)"""
+    get_metrics().miss(f'golden_export_{fmt}')
+    golden = load_golden(kind)
+    golden.refresh(get_store())
+    return export_bytes(golden.frame(include_pending), fmt, sheet_name='البيانات المعتمدة')
+
+
+def timed_golden_export(kind: str, fmt: str, include_pending: bool, version: tuple) -> bytes:
+    with track(f'golden_export_{fmt}', cached=True):
+        return build_golden_export(kind, fmt, include_pending, version)
+
+
+def render_golden_section(version: tuple, formats: list, stamp: str):
+    """تنزيل البيانات المعتمدة للنوع الحالي: قيم المصدر المختار لكل زوج مع القيم المدخلة يدوياً"""
+    st.markdown("---")
+    st.markdown(f"<h4 style='color: #667eea !important;'>🏅 البيانات المعتمدة ({option})</h4>", unsafe_allow_html=True)
+    golden = load_golden(option)
+    with track('golden_refresh'):
+        golden.refresh(get_store())
+    st.caption(" — ".join(f"{source}: {n}" for source, n in golden.summary().itertuples(index=False)))
+    include_pending = st.checkbox("تضمين الأزواج دون قرار (بقيم قسطاس)", key="golden_pending")
+    cols = st.columns(len(formats))
+    for col, (fmt, label) in zip(cols, formats):
+        col.download_button(
+            label=label,
+            data=lambda fmt=fmt: timed_golden_export(option, fmt, include_pending, version),
+            file_name=f"تشريعات_معتمدة_{option}_{stamp}.{fmt}",
+            mime=MIME_TYPES[fmt],
+            on_click="ignore",
+            key=f"golden_{fmt}",
+            use_container_width=True
+        )
+
+
+SAVED_SORT_LABELS = {
+    'id': 'ترتيب الإدخال',
+    'created_at': 'تاريخ الإدخال',
+    'source': 'المصدر الصحيح',
+    'kind': 'نوع التشريع',
+    'reviewer': 'المراجع',
+}
+ALL_LABEL = 'الكل'
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def saved_filter_options(version: tuple) -> dict:
+    return {col: get_store().distinct(col) for col in FILTER_COLUMNS}
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def saved_filtered_count(filters: tuple, version: tuple) -> int:
+    return get_store().count_where(dict(filters))
+
+
+def render_saved_page(version: tuple):
+    """عرض القرارات المحفوظة صفحة صفحة من المخزن (تصفية وترتيب عبر الفهارس)"""
+    options = saved_filter_options(version)
+    c1, c2, c3, c4 = st.columns(4)
+    source = c1.selectbox("المصدر الصحيح", [ALL_LABEL] + options['source'], key="saved_source")
+    kind = c2.selectbox("نوع التشريع", [ALL_LABEL] + options['kind'], key="saved_kind",
+                        format_func=lambda v: v or '—')
+    reviewer_filter = c3.selectbox("المراجع", [ALL_LABEL] + options['reviewer'], key="saved_reviewer",
+                                   format_func=lambda v: v or '—')
+    dates = c4.date_input("تاريخ الإدخال (من - إلى)", value=(), key="saved_dates")
+
+    c5, c6, c7 = st.columns(3)
+    sort = c5.selectbox("الترتيب حسب", list(SAVED_SORT_LABELS), format_func=SAVED_SORT_LABELS.get,
+                        key="saved_sort")
+    descending = c6.checkbox("تنازلي", value=True, key="saved_desc")
+    page_size = c7.selectbox("عدد السجلات في الصفحة", [25, 50, 100, 200], index=1, key="saved_page_size")
+
+    filters = {
+        'source': None if source == ALL_LABEL else source,
+        'kind': None if kind == ALL_LABEL else kind,
+        'reviewer': None if reviewer_filter == ALL_LABEL else reviewer_filter,
+    }
+    if dates:
+        filters['date_from'] = dates[0].isoformat()
+        filters['date_to'] = (dates[-1] + timedelta(days=1)).isoformat()
+    filters = {k: v for k, v in filters.items() if v is not None}
+
+    # مؤشرات بداية الصفحات التي زارها المراجع (keyset)، تُصفّر عند تغيير التصفية أو الترتيب
+    signature = (tuple(sorted(filters.items())), sort, descending, page_size)
+    if st.session_state.get('saved_signature') != signature:
+        st.session_state.saved_signature = signature
+        st.session_state.saved_cursors = [None]
+    cursors = st.session_state.saved_cursors
+
+    records, next_cursor = get_store().page(filters, sort, descending, page_size, cursors[-1])
+    total = saved_filtered_count(signature[0], version)
+    pages = max(1, -(-total // page_size))
+
+    # أعمدة السجل الأصلية تخلط النص الفارغ بالأرقام، فتُعرض كنص
+    st.dataframe(pd.DataFrame(records).astype(str).replace({'nan': '', 'None': ''}),
+                 use_container_width=True, hide_index=True)
+
+    n1, n2, n3 = st.columns([1, 2, 1])
+    with n1:
+        st.button("⏮️ الصفحة السابقة", key="saved_prev", disabled=len(cursors) == 1,
+                  on_click=cursors.pop, use_container_width=True)
+    with n2:
+        st.markdown(f"<p style='text-align: center;'>صفحة {len(cursors)} من {pages} ({total} سجل)</p>",
+                    unsafe_allow_html=True)
+    with n3:
+        st.button("الصفحة التالية ⏭️", key="saved_next", disabled=next_cursor is None,
+                  on_click=cursors.append, args=(next_cursor,), use_container_width=True)
+
+
 def render_saved_data_tab():
     """عرض تبويب البيانات المحفوظة"""
     st.markdown("<div class='comparison-card'>", unsafe_allow_html=True)
     st.markdown("<h3 style='color: #667eea !important;'>📁 البيانات المحفوظة</h3>", unsafe_allow_html=True)
+    # قرارات الويزارد تعيد تشغيل جزء المراجعة فقط، فهذا الزر يعرض آخر ما حُفظ
+    st.button("🔄 تحديث", key="refresh_saved")
     
-    if st.session_state.comparison_data:
-        df = pd.DataFrame(st.session_state.comparison_data)
-        st.dataframe(df, use_container_width=True, hide_index=True)
+    version = get_store().version()
+    if version[0] > 0:
+        render_saved_page(version)
         
-        # تحميل البيانات كملف Excel
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='مقارنة التشريعات', index=False)
+        # ملفات التحميل تُبنى عند النقر فقط، ومخزنة حسب نسخة المخزن
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        formats = [('xlsx', "📥 تحميل البيانات (Excel)"), ('csv', "📄 CSV")]
+        if parquet_available():
+            formats.append(('parquet', "🗜️ Parquet"))
         
         col1, col2 = st.columns(2)
         with col1:
-            st.download_button(
-                label="📥 تحميل البيانات (Excel)",
-                data=buffer.getvalue(),
-                file_name=f"مقارنة_تشريعات_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
-            )
+            for fmt, label in formats:
+                st.download_button(
+                    label=label,
+                    data=lambda fmt=fmt: timed_saved_export(fmt, version),
+                    file_name=f"مقارنة_تشريعات_{stamp}.{fmt}",
+                    mime=MIME_TYPES[fmt],
+                    on_click="ignore",
+                    key=f"download_{fmt}",
+                    use_container_width=True
+                )
         
         with col2:
             # المرحلة الأولى: تفعيل وضع التأكيد (زر واحد)
@@ -646,21 +1215,16 @@ def render_saved_data_tab():
                 with c1:
                     if st.button("⚠️ تأكيد المسح (حذف نهائي)", use_container_width=True, key="confirm_delete_yes"):
                         # تنفيذ الحذف الدائم
-                        st.session_state.comparison_data = []
                         st.session_state.current_index = 0
                         try:
+                            get_store().clear()
+                            # حذف ملفات JSON القديمة أيضاً لضمان عدم استرجاع البيانات
                             if os.path.exists(DATA_FILE):
                                 os.remove(DATA_FILE)
                             if os.path.exists(PROGRESS_FILE):
                                 os.remove(PROGRESS_FILE)
                         except Exception:
                             pass
-                        # حفظ ملفات فارغة لضمان عدم استرجاع البيانات
-                        try:
-                            save_to_file(DATA_FILE, [])
-                            save_to_file(PROGRESS_FILE, 0)
-                        except Exception:
-                            pass
                         st.session_state.confirm_delete = False
                         st.success("✅ تم حذف جميع البيانات نهائياً")
                         st.rerun()   # changed from experimental_rerun -> rerun
@@ -668,6 +1232,8 @@ def render_saved_data_tab():
                     if st.button("❌ إلغاء", use_container_width=True, key="confirm_delete_no"):
                         st.session_state.confirm_delete = False
                         st.rerun()   # changed from experimental_rerun -> rerun
+
+        render_golden_section(version, formats, stamp)
     else:
         st.info("📭 لا توجد بيانات محفوظة حتى الآن")
     
@@ -750,34 +1316,43 @@ def main():
     
     # تهيئة البيانات
     initialize_session_state()
+    render_preload_status(get_preloader())
     
-    # تحميل البيانات من CSV بحسب اختيار المستخدم
-    qistas_df, diwan_df = load_csv_data(option)
-    
-    if isinstance(qistas_df, pd.DataFrame) and 'GroupKey' in qistas_df.columns:
-        qistas_df = qistas_df.sort_values(by='GroupKey').reset_index(drop=True)
-    if isinstance(diwan_df, pd.DataFrame) and 'GroupKey' in diwan_df.columns:
-        diwan_df = diwan_df.sort_values(by='GroupKey').reset_index(drop=True)
+    # تحميل البيانات بحسب اختيار المستخدم مع فهرس المطابقة (الترتيب حسب GroupKey يتم مرة واحدة داخل الكاش)
+    try:
+        with track('load_aligned_data', cached=True):
+            qistas_df, diwan_df, pairs = load_aligned_data(option)
+    except (KeyError, FileNotFoundError, RuntimeError) as e:
+        st.error(e.args[0] if e.args else str(e))
+        qistas_df = diwan_df = None
     
     if qistas_df is None or diwan_df is None:
         st.error("⚠️ فشل تحميل ملفات CSV للنوع المحدد. تأكد من وجود الملفات أو تعديل مرشحات المسارات في الكود.")
         # عرض أمثلة المسارات الممكنة للمساعدة
         st.info("مسارات محتملة:\n- extData/Bylaws/... (النظام)\n- extData/Laws/... (القوانين)\n- extData/Instructions/... (التعليمات)")
         return
-    
+    for side in ('qis', 'diwan'):
+        st.sidebar.success(f"{SOURCE_NAMES[side]} ({os.path.basename(PATHS[option][side])})")
 
     st.sidebar.markdown("---")
+    with track('load_diff_matrix', cached=True):
+        diffs = load_diff_matrix(option)
+    render_live_status(pairs)
+    render_search(qistas_df, diwan_df, pairs)
+    view = render_queue_selector(qistas_df, pairs, diffs)
     
     # التبويبات
     tab1, tab2 = st.tabs(["🔍 مقارنة تفصيلية", "📁 البيانات المحفوظة"])
     
     # ========== التبويب الأول: المقارنة التفصيلية ==========
     with tab1:
-        render_comparison_tab(qistas_df, diwan_df)
+        render_comparison_tab(qistas_df, diwan_df, pairs, diffs, view)
     
     # ========== التبويب الثاني: البيانات المحفوظة ==========
     with tab2:
         render_saved_data_tab()
+
+    render_performance_panel()
     
     # التذييل
     st.markdown("---")
@@ -790,8 +1365,9 @@ def main():
 
 # ==================== تشغيل البرنامج ====================
 if __name__ == "__main__":
-
-    main()
+    st.session_state.run_id = st.session_state.get('run_id', 0) + 1
+    with track('rerun'):
+        main()
 
 
 
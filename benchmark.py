@@ -0,0 +1,388 @@
+"""
+قياس أداء النظام على بيانات تشريعات اصطناعية بأحجام متزايدة
+مولّد لملفي قسطاس والديوان بنفس أعمدة الملفات الحقيقية (10 آلاف حتى مليون سجل)،
+وقياس مراحل التحميل والمطابقة وعرض السجل وحفظ القرار وتصدير المحفوظ لكل حجم،
+ومقارنة النتائج بخط أساس JSON لاكتشاف التراجع قبل النشر.
+خط الأساس خاص بكل جهاز (لا يُحفظ في المستودع)، والأزمنة تُقارن بعد معايرتها بحمل ثابت
+يُقاس مع كل تشغيل، فلا يظهر اختلاف سرعة الجهاز أو حِمله كتراجع
+"""
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from comparison import (add_normalized_columns, build_alignment, comparison_table_html, compute_diff_matrix,
+                        content_hashes, get_field_definitions, get_mapping, record_values, source_columns)
+from data_loader import EXTRA_COLUMNS, compact_frame, dropped_columns, read_workbook, sort_by_group_key
+from export import export_bytes, write_table
+from store import DecisionStore
+
+SIZES = (10_000, 100_000, 1_000_000)
+BASELINE_FILE = 'benchmark_baseline.json'
+
+# قراءة وكتابة Excel (openpyxl) بطيئة جداً مع الأحجام الكبيرة: فوق هذا الحد تُقاس المراحل الأخرى فقط
+EXCEL_LIMIT = 100_000
+# عدد السجلات التي يُقاس عرضها وحفظها فرادى (كما يحدث مع كل نقرة في الواجهة)
+RENDER_SAMPLES = 500
+SAVE_SAMPLES = 500
+
+# التراجع: الزمن الحالي أكبر من خط الأساس بهذه النسبة، وبفارق يتجاوز ضجيج القياس
+TOLERANCE = 1.5
+NOISE_SECONDS = 0.05
+# حمل المعايرة: عدد السجلات وعدد التكرارات (يؤخذ أسرعها)
+CALIBRATION_ROWS = 200_000
+CALIBRATION_REPEATS = 3
+
+STAGES = ('load_excel', 'load', 'align', 'diff', 'render', 'save', 'save_bulk', 'export_csv', 'export_xlsx')
+STAGE_LABELS = {
+    'load_excel': 'قراءة Excel للمصدرين (دون كاش)',
+    'load': 'التحميل من الكاش (إسقاط وترتيب وتوحيد)',
+    'align': 'المطابقة',
+    'diff': 'مصفوفة الفروقات',
+    'render': f'عرض {RENDER_SAMPLES} سجل',
+    'save': f'حفظ {SAVE_SAMPLES} قرار فرادى',
+    'save_bulk': 'حفظ كل الأزواج المتطابقة دفعة واحدة',
+    'export_csv': 'تصدير المحفوظ CSV',
+    'export_xlsx': 'تصدير المحفوظ Excel',
+}
+
+# ==================== توليد البيانات ====================
+FIRST_YEAR, LAST_YEAR = 1920, 2025
+# نسبة سجلات قسطاس الموجودة في الديوان، ونسبة سجلات الديوان الإضافية
+OVERLAP = 0.9
+DIWAN_EXTRA = 0.05
+# احتمال اختلاف الحقل بين الطرفين في الأزواج المتطابقة
+DIFF_RATE = 0.1
+# نسبة أسماء الديوان المختصرة (الباقي بنفس صيغة قسطاس)
+SHORT_NAME_RATE = 0.6
+
+_WORDS = np.array([
+    'تنظيم', 'المكاتب', 'الخاصة', 'العاملة', 'الهاتف', 'المعهد', 'التعاوني', 'الخدمة', 'المدنية', 'الرسوم',
+    'الجامعات', 'الرسمية', 'الصحة', 'العامة', 'البلديات', 'المياه', 'الزراعة', 'النقل', 'البري', 'الطيران',
+    'المدني', 'الضريبة', 'الدخل', 'المبيعات', 'الجمارك', 'العمل', 'الضمان', 'الاجتماعي', 'التقاعد', 'المالي',
+    'اللوازم', 'الأشغال', 'الحكومية', 'السياحة', 'الآثار', 'البيئة', 'الطاقة', 'المعادن', 'الاستثمار', 'التجارة',
+], dtype=object)
+_STATUS = np.array(['ساري', 'غير ساري'], dtype=object)
+
+
+def _names(rng: np.random.Generator, rows: int, kind: str) -> pd.Series:
+    """اسم موضوع من ثلاث كلمات لكل سجل"""
+    picks = rng.integers(0, len(_WORDS), size=(rows, 3))
+    words = pd.DataFrame(_WORDS[picks])
+    return kind + ' ' + words[0] + ' ' + words[1] + ' ' + words[2]
+
+
+def _reference(kind: str, numbers: pd.Series, years: pd.Series, subjects: pd.Series) -> pd.Series:
+    """نص مرجع كما في قسطاس: "<النوع> رقم N لسنة YYYY (الاسم) وتعديلاته" """
+    return (kind + ' رقم ' + numbers.astype(str) + ' لسنة ' + years.astype(str)
+            + ' (' + subjects + ' لسنة ' + years.astype(str) + ') وتعديلاته')
+
+
+def _qis_dates(days: np.ndarray, missing: np.ndarray) -> pd.Series:
+    dates = pd.Series(pd.to_datetime(days, unit='D')).dt.strftime('%d-%m-%Y').astype(object)
+    return dates.where(~missing, None)
+
+
+def _diwan_dates(days: np.ndarray, missing: np.ndarray) -> pd.Series:
+    """صيغة الديوان: شهر/يوم/سنة دون أصفار بادئة (1/16/1968)"""
+    dates = pd.Series(pd.to_datetime(days, unit='D'))
+    text = (dates.dt.month.astype(str) + '/' + dates.dt.day.astype(str) + '/' + dates.dt.year.astype(str)).astype(object)
+    return text.where(~missing, None)
+
+
+def _side_columns(kind: str, side: str) -> dict:
+    """عمود الملف ← دوره (name, number, year...) حسب تعريف الحقول وأعمدة العرض"""
+    mapping = get_mapping(kind)
+    suffix = 'qis' if side == 'qis' else 'diw'
+    display_fields, conditional_fields = get_field_definitions(kind)
+    idx = 1 if side == 'qis' else 2
+    roles = ['name', 'number', 'year', 'replaced_for', 'magazine', 'active', 'status',
+             'canceled_by', 'end', 'replaced_by']
+    columns = {field[idx]: role for field, role in zip(display_fields + conditional_fields, roles)}
+    for col in EXTRA_COLUMNS[side]:
+        if col in columns:
+            continue
+        if col == 'GroupKey':
+            columns[col] = 'group_key'
+        elif 'Name' in col:
+            columns[col] = 'name'
+        elif 'Number' in col:
+            columns[col] = 'number'
+    columns[mapping[f"name_{suffix}"]] = 'name'
+    columns[mapping[f"num_{suffix}"]] = 'number'
+    return columns
+
+
+def synthetic_frames(rows: int, kind: str = 'نظام', seed: int = 0):
+    """(قسطاس، الديوان) اصطناعيان بأعمدة ملفات النوع kind: rows سجل في قسطاس،
+    وفي الديوان نسبة OVERLAP منها (مع فروقات بنسبة DIFF_RATE) وسجلات إضافية بنسبة DIWAN_EXTRA.
+    مفتاح المطابقة (الرقم، السنة) فريد داخل كل سنة كما في الملفات الحقيقية.
+    """
+    rng = np.random.default_rng(seed)
+    total = rows + int(rows * DIWAN_EXTRA)
+
+    years = np.sort(rng.integers(FIRST_YEAR, LAST_YEAR + 1, size=total))
+    first_of_year = np.searchsorted(years, years, side='left')
+    numbers = np.arange(total) - first_of_year + 1
+    order = rng.permutation(total)
+    years, numbers = years[order], numbers[order]
+
+    base = pd.DataFrame({'year': years, 'number': numbers})
+    subject = _names(rng, total, kind)
+    base['subject'] = subject
+    base['active'] = rng.random(total) < 0.45
+    start = (pd.to_datetime(base['year'].astype(str) + '-01-01') - pd.Timestamp('1970-01-01')).dt.days.to_numpy()
+    base['magazine_day'] = start + rng.integers(0, 365, size=total)
+    base['active_day'] = base['magazine_day'] + np.where(rng.random(total) < 0.7, 0, 30)
+    base['end_day'] = base['active_day'] + rng.integers(365, 20 * 365, size=total)
+
+    # "يحل محل": سجل سابق عشوائي لنحو 15% من السجلات، و"ألغي بواسطة" لنحو ثلث غير الساري
+    has_replaced = rng.random(total) < 0.15
+    target = rng.integers(0, total, size=total)
+    replaced_for = _reference(kind, base['number'].iloc[target].reset_index(drop=True),
+                              base['year'].iloc[target].reset_index(drop=True), subject.iloc[target].reset_index(drop=True))
+    base['replaced_for'] = replaced_for.where(has_replaced, None)
+    canceled = ~base['active'] & (rng.random(total) < 0.33)
+    base['canceled_by'] = ('المادة ' + pd.Series(rng.integers(2, 80, size=total)).astype(str) + ' من '
+                           + replaced_for).where(canceled, None)
+    replaced_by = ~base['active'] & ~canceled & (rng.random(total) < 0.2)
+    base['replaced_by'] = replaced_for.where(replaced_by, None)
+    base['group_key'] = '(' + base['number'].astype(str) + ', ' + base['year'].astype(str) + ')'
+
+    qis_rows = np.arange(rows)
+    in_diwan = rng.random(rows) < OVERLAP
+    diwan_rows = np.concatenate([qis_rows[in_diwan], np.arange(rows, total)])
+
+    def build(side: str, positions: np.ndarray) -> pd.DataFrame:
+        part = base.iloc[positions].reset_index(drop=True)
+        size = len(part)
+        dates = _qis_dates if side == 'qis' else _diwan_dates
+
+        def differs():
+            # الفروقات تُزرع في الديوان فقط؛ قسطاس هو المرجع
+            if side == 'qis':
+                return np.zeros(size, dtype=bool)
+            return rng.random(size) < DIFF_RATE
+
+        active = part['active'].to_numpy() ^ differs()
+        name = _reference(kind, part['number'], part['year'], part['subject'])
+        if side == 'diwan':
+            # أغلب أسماء الديوان مختصرة ("<الاسم> لسنة YYYY") فتختلف عن اسم قسطاس الكامل
+            short = rng.random(size) < SHORT_NAME_RATE
+            name = name.where(~short, part['subject'] + ' لسنة ' + part['year'].astype(str))
+        values = {
+            'name': name,
+            'number': part['number'].to_numpy(),
+            'year': part['year'].to_numpy(),
+            'replaced_for': part['replaced_for'],
+            'magazine': dates(part['magazine_day'].to_numpy() + differs(), np.zeros(size, dtype=bool)),
+            'active': dates(part['active_day'].to_numpy(), rng.random(size) < (0.1 if side == 'qis' else 0.6)),
+            'status': pd.Series(_STATUS[(~active).astype(int)]),
+            'canceled_by': part['canceled_by'],
+            'end': dates(part['end_day'].to_numpy(), part['active'].to_numpy()),
+            'replaced_by': part['replaced_by'],
+            'group_key': part['group_key'],
+        }
+        return pd.DataFrame({col: values[role] for col, role in _side_columns(kind, side).items()})
+
+    return build('qis', qis_rows), build('diwan', diwan_rows)
+
+
+def write_workbooks(rows: int, directory: str, kind: str = 'نظام', seed: int = 0, fmt: str = 'xlsx') -> dict:
+    """كتابة ملفي المصدرين الاصطناعيين: {'qis': المسار، 'diwan': المسار}"""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for side, df in zip(('qis', 'diwan'), synthetic_frames(rows, kind, seed)):
+        path = os.path.join(directory, f"{'Qis' if side == 'qis' else 'Diwan'}_Synthetic_{rows}.{fmt}")
+        write_table(df, path, fmt)
+        paths[side] = path
+    return paths
+
+
+# ==================== القياس ====================
+class _Timer:
+    def __init__(self, results: dict, stage: str):
+        self.results, self.stage = results, stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.results[self.stage] = round(time.perf_counter() - self.started, 4)
+
+
+def _decision(data: dict, source: str, kind: str) -> dict:
+    """نفس شكل القرار الذي يحفظه التطبيق (build_record)"""
+    return {
+        'تاريخ الإدخال': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'المصدر الصحيح': source,
+        'نوع التشريع': kind,
+        'المراجع': 'benchmark',
+        **data,
+    }
+
+
+def run_size(rows: int, kind: str = 'نظام', seed: int = 0, workdir: str = None, log=print) -> dict:
+    """قياس كل المراحل لحجم واحد: {المرحلة: ثوانٍ} (المراحل المتخطاة غير موجودة)"""
+    results = {}
+    qis_raw, diwan_raw = synthetic_frames(rows, kind, seed)
+    workdir = workdir or tempfile.mkdtemp(prefix='leg-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        # التحميل: قراءة Excel باردة (للأحجام الصغيرة)، ثم المسار الدافئ الذي يمر به كل تشغيل:
+        # كاش القرص ← إسقاط الأعمدة وضغطها ← الترتيب ← الأعمدة القياسية
+        if len(qis_raw) <= EXCEL_LIMIT:
+            workbooks = {}
+            for side, df in (('qis', qis_raw), ('diwan', diwan_raw)):
+                workbooks[side] = os.path.join(workdir, f"{side}.xlsx")
+                write_table(df, workbooks[side])
+            with _Timer(results, 'load_excel'):
+                for side, path in workbooks.items():
+                    read_workbook(path, use_cache=False, drop=dropped_columns(kind, side))
+        pickles = {}
+        for side, df in (('qis', qis_raw), ('diwan', diwan_raw)):
+            pickles[side] = os.path.join(workdir, f"{side}.pkl")
+            df.to_pickle(pickles[side])
+        # الإطاران الخامان لا يلزمان بعد الآن، ومع مليون سجل يشغلان وحدهما عدة جيجابايت
+        del qis_raw, diwan_raw, df
+        with _Timer(results, 'load'):
+            frames = {
+                side: add_normalized_columns(
+                    sort_by_group_key(compact_frame(pd.read_pickle(path), dropped_columns(kind, side))), kind, side)
+                for side, path in pickles.items()
+            }
+        qis_df, diwan_df = frames['qis'], frames['diwan']
+
+        with _Timer(results, 'align'):
+            pairs = build_alignment(qis_df, diwan_df, kind)
+        with _Timer(results, 'diff'):
+            diffs = compute_diff_matrix(qis_df, diwan_df, pairs, kind)
+        hashes = content_hashes(diffs)
+
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(len(pairs), size=min(RENDER_SAMPLES, len(pairs)), replace=False)
+        with _Timer(results, 'render'):
+            for pair_row in sample:
+                qis_pos, diwan_pos = pairs.pair(pair_row)
+                record_values(qis_df, qis_pos)
+                record_values(diwan_df, diwan_pos)
+                comparison_table_html(diffs.row(pair_row))
+
+        store = DecisionStore(os.path.join(workdir, 'decisions.db'),
+                              os.path.join(workdir, 'none.json'), os.path.join(workdir, 'none_progress.json'))
+        sample = sample[:SAVE_SAMPLES]
+        decisions = [(record_values(qis_df, pairs.pair(row)[0]) or record_values(diwan_df, pairs.pair(row)[1]), row)
+                     for row in sample]
+        with _Timer(results, 'save'):
+            for data, pair_row in decisions:
+                store.append(_decision(data, 'قسطاس', kind), kind=kind, reviewer='benchmark',
+                             pair_id=pairs.pair_ids[pair_row], content_hash=hashes[pair_row])
+
+        identical = np.flatnonzero(diffs.identical)
+        qis_rows = qis_df.iloc[pairs.qis_pos[identical]][source_columns(qis_df)]
+        with _Timer(results, 'save_bulk'):
+            store.append_many([
+                (_decision({k: ('' if pd.isna(v) else v) for k, v in data.items()}, 'تطابق تلقائي', kind),
+                 pair_id, content_hash)
+                for data, pair_id, content_hash in zip(qis_rows.to_dict('records'), pairs.pair_ids[identical],
+                                                       hashes[identical])
+            ], kind=kind, reviewer='benchmark')
+
+        saved = store.count()
+        with _Timer(results, 'export_csv'):
+            export_bytes(pd.DataFrame(store.records()), 'csv', sheet_name='مقارنة التشريعات')
+        if saved <= EXCEL_LIMIT:
+            with _Timer(results, 'export_xlsx'):
+                export_bytes(pd.DataFrame(store.records()), 'xlsx', sheet_name='مقارنة التشريعات')
+
+        log(f"{rows}: {len(pairs)} زوج، {len(identical)} متطابق، {saved} قرار محفوظ")
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def calibrate() -> float:
+    """زمن حمل ثابت (توليد وترتيب وتجميع pandas مع حلقة Python) بالثواني: مقياس سرعة الجهاز الحالية"""
+    best = None
+    for _ in range(CALIBRATION_REPEATS):
+        started = time.perf_counter()
+        rng = np.random.default_rng(0)
+        frame = pd.DataFrame({'key': rng.integers(0, 1000, CALIBRATION_ROWS),
+                              'text': _WORDS[rng.integers(0, len(_WORDS), CALIBRATION_ROWS)]})
+        frame.sort_values(['key', 'text']).groupby('key')['text'].nunique()
+        json.dumps([{'key': int(k), 'text': t} for k, t in frame.head(20_000).itertuples(index=False)],
+                   ensure_ascii=False)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 4)
+
+
+def run_benchmark(sizes=SIZES, kind: str = 'نظام', seed: int = 0, log=print) -> dict:
+    """قياس كل الأحجام مع وصف البيئة وزمن المعايرة (الصيغة المحفوظة في خط الأساس)"""
+    calibration = calibrate()
+    log(f"المعايرة: {calibration:.3f} ث")
+    results = {}
+    for rows in sizes:
+        results[str(rows)] = run_size(rows, kind, seed, log=log)
+        log('  ' + '، '.join(f"{stage}: {seconds:.3f} ث" for stage, seconds in results[str(rows)].items()))
+    return {
+        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'kind': kind,
+        'seed': seed,
+        'calibration': calibration,
+        'render_samples': RENDER_SAMPLES,
+        'save_samples': SAVE_SAMPLES,
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+# ==================== خط الأساس ====================
+def load_baseline(path: str = BASELINE_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(run: dict, path: str = BASELINE_FILE) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(run, f, ensure_ascii=False, indent=2)
+
+
+def speed_ratio(run: dict, baseline: dict) -> float:
+    """نسبة زمن المعايرة الحالي إلى زمنها في خط الأساس (1 إذا غابت عن أحدهما)"""
+    current, before = run.get('calibration'), baseline.get('calibration')
+    return current / before if current and before else 1.0
+
+
+def find_regressions(run: dict, baseline: dict, tolerance: float = TOLERANCE) -> pd.DataFrame:
+    """المراحل التي تجاوز زمنها خط الأساس المعاير × tolerance (بفارق أكبر من NOISE_SECONDS) لكل حجم مشترك.
+    خط الأساس يُضرب في speed_ratio، فجهاز أبطأ بمرتين يُقارن بضعف أزمنة خط الأساس"""
+    ratio = speed_ratio(run, baseline)
+    rows = []
+    for size, stages in run['results'].items():
+        base = baseline.get('results', {}).get(size, {})
+        for stage, seconds in stages.items():
+            before = base.get(stage)
+            if before is None:
+                continue
+            before = round(before * ratio, 4)
+            if seconds > before * tolerance and seconds - before > NOISE_SECONDS:
+                rows.append((int(size), stage, STAGE_LABELS.get(stage, stage), before, seconds,
+                             round(seconds / before, 2) if before else float('inf')))
+    return pd.DataFrame(rows, columns=['الحجم', 'stage', 'المرحلة', 'خط الأساس', 'الحالي', 'النسبة'])
@@ -0,0 +1,282 @@
+"""
+أوامر سطر الأوامر لنظام مقارنة التشريعات
+الاستخدام: python cli.py <الأمر> [الخيارات]
+"""
+import argparse
+import os
+import sys
+import time
+
+import benchmark
+from comparison import (DELTA_LABELS, UNCHANGED, build_alignment, build_report, compute_diff_matrix,
+                        content_hashes, review_delta)
+from data_loader import PATHS, load_kind, read_workbook, sheet_name, warm_cache
+from dedup import LEVEL_LABELS, LEVELS, NEAR, deduplicate, duplicate_groups, unique_path
+from store import DB_FILE, DecisionStore
+from export import FORMATS, write_table
+from golden import GoldenDataset
+from links import build_link_graph, link_report
+from matching import TOP_K, suggest_candidates
+
+
+def cmd_warm_cache(args) -> int:
+    results = warm_cache(args.kind or None)
+    if args.dedup:
+        for kind in (args.kind or PATHS):
+            for side, path in PATHS[kind].items():
+                if results.get(path) == 'missing':
+                    continue
+                groups = duplicate_groups(read_workbook(path), kind, side)
+                counts = [f"{LEVEL_LABELS[level]}: {int((groups[level] != groups.index).sum())}" for level in LEVELS]
+                print(f"  تكرار {kind}/{side} ← {' — '.join(counts)}")
+    return 1 if 'missing' in results.values() and args.strict else 0
+
+
+def _side_path(path: str, side: str, sides: list) -> str:
+    """عند معالجة المصدرين معاً يُضاف اسم المصدر إلى مسار الناتج"""
+    if len(sides) == 1:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_{side}{ext}"
+
+
+def cmd_dedup(args) -> int:
+    """كتابة نسخة دون تكرار من ملف مصدر (ملف _Unique) مع تقرير المجموعات المكررة"""
+    sides = [args.side] if args.side else list(PATHS[args.kind])
+    if args.input and len(sides) != 1:
+        raise ValueError("مع --input يجب تحديد --side")
+    for side in sides:
+        started = time.perf_counter()
+        path = args.input or PATHS[args.kind][side]
+        df = read_workbook(path, use_cache=not args.no_cache)
+        unique, report = deduplicate(df, args.kind, side, args.level)
+
+        # ملف _Unique بديل للملف المصدر فيحمل اسم ورقته
+        written = write_table(unique, _side_path(args.output, side, sides) if args.output else unique_path(path),
+                              sheet_name=sheet_name(path))
+        if args.report:
+            written += write_table(report, _side_path(args.report, side, sides))
+        for target in written:
+            print(f"← {target}")
+        print(f"{args.kind}/{side}: {len(df)} ← {len(unique)} سجل ({LEVEL_LABELS[args.level]}) "
+              f"خلال {time.perf_counter() - started:.2f} ث")
+    return 0
+
+
+def cmd_compare(args) -> int:
+    """مطابقة ومقارنة نوع كامل دون واجهة، وكتابة تقرير الفروقات مع الملخص"""
+    started = time.perf_counter()
+    qis_df, diwan_df = load_kind(args.kind, use_cache=not args.no_cache)
+    pairs = build_alignment(qis_df, diwan_df, args.kind)
+    diffs = compute_diff_matrix(qis_df, diwan_df, pairs, args.kind)
+    report, summary = build_report(pairs, diffs)
+    if args.only_diff:
+        report = report[report['عدد الفروقات'] > 0]
+
+    output = args.output or f"تقرير_{args.kind}.{args.format or 'xlsx'}"
+    written = write_table(report, output, args.format, {'الملخص': summary})
+
+    print(summary.to_string(index=False))
+    for path in written:
+        print(f"← {path}")
+    print(f"{len(report)} سجل خلال {time.perf_counter() - started:.2f} ث")
+    return 0
+
+
+def cmd_links(args) -> int:
+    """فحص شبكة روابط الاستبدال والإلغاء للنوع كاملاً وكتابة تقرير المشكلات"""
+    started = time.perf_counter()
+    qis_df, diwan_df = load_kind(args.kind, use_cache=not args.no_cache)
+    graphs = {'qis': build_link_graph(qis_df, args.kind, 'qis'), 'diwan': build_link_graph(diwan_df, args.kind, 'diwan')}
+    report, summary = link_report(qis_df, diwan_df, graphs, args.kind)
+
+    output = args.output or f"روابط_{args.kind}.{args.format or 'xlsx'}"
+    written = write_table(report, output, args.format, {'الملخص': summary})
+    print(summary.to_string(index=False))
+    for path in written:
+        print(f"← {path}")
+    print(f"{len(report)} مشكلة خلال {time.perf_counter() - started:.2f} ث")
+    return 0
+
+
+def cmd_match(args) -> int:
+    """اقتراح أقرب المرشحين من المصدر الآخر لكل سجل دون مقابل"""
+    started = time.perf_counter()
+    qis_df, diwan_df = load_kind(args.kind, use_cache=not args.no_cache)
+    pairs = build_alignment(qis_df, diwan_df, args.kind)
+    candidates = suggest_candidates(qis_df, diwan_df, pairs, args.kind, k=args.top)
+    if args.min_similarity:
+        candidates = candidates[candidates['similarity'] >= args.min_similarity]
+
+    output = args.output or f"مرشحون_{args.kind}.{args.format or 'xlsx'}"
+    for path in write_table(candidates, output, args.format):
+        print(f"← {path}")
+    print(f"{candidates['pair_id'].nunique()} سجل دون مقابل، {len(candidates)} مرشح "
+          f"خلال {time.perf_counter() - started:.2f} ث")
+    return 0
+
+
+def cmd_delta(args) -> int:
+    """مقارنة النسخة الحالية من الملفات بما رُوجع سابقاً: ما يُرحّل قراره وما يحتاج مراجعة"""
+    store = DecisionStore(args.db, None, None, readonly=True)
+    qis_df, diwan_df = load_kind(args.kind, use_cache=not args.no_cache)
+    pairs = build_alignment(qis_df, diwan_df, args.kind)
+    hashes = content_hashes(compute_diff_matrix(qis_df, diwan_df, pairs, args.kind))
+    delta = review_delta(pairs, hashes, store.decision_hashes(args.kind))
+
+    for name, label in DELTA_LABELS.items():
+        print(f"{label}: {len(delta[name])}")
+    print(f"قرارات لأزواج لم تعد موجودة: {len(delta['removed'])}")
+
+    if args.output:
+        status = {row: name for name, rows in delta.items() if name != 'removed' for row in rows}
+        pending = [row for row in range(len(pairs)) if status[row] != UNCHANGED]
+        report = pairs.to_frame().iloc[pending][['pair_id', 'key']]
+        report['الحالة'] = [DELTA_LABELS[status[row]] for row in pending]
+        for path in write_table(report, args.output, args.format):
+            print(f"← {path}")
+    return 0
+
+
+def cmd_golden(args) -> int:
+    """بناء البيانات المعتمدة للنوع من قرارات المراجعة وكتابتها مع ملخص المصادر"""
+    started = time.perf_counter()
+    store = DecisionStore(args.db, None, None, readonly=True)
+    qis_df, diwan_df = load_kind(args.kind, use_cache=not args.no_cache)
+    pairs = build_alignment(qis_df, diwan_df, args.kind)
+    golden = GoldenDataset(qis_df, diwan_df, pairs, args.kind)
+    applied = golden.refresh(store)
+    frame, summary = golden.frame(args.all), golden.summary()
+
+    output = args.output or f"معتمد_{args.kind}.{args.format or 'xlsx'}"
+    written = write_table(frame, output, args.format, {'الملخص': summary})
+    print(summary.to_string(index=False))
+    for path in written:
+        print(f"← {path}")
+    print(f"{len(frame)} سجل ({applied} قرار) خلال {time.perf_counter() - started:.2f} ث")
+    return 0
+
+
+def cmd_bench(args) -> int:
+    """قياس المراحل على بيانات اصطناعية ومقارنتها بخط الأساس (خطأ 1 عند التراجع)"""
+    run = benchmark.run_benchmark(args.sizes, args.kind, args.seed)
+    baseline = None if args.update else benchmark.load_baseline(args.baseline)
+    if baseline is None:
+        benchmark.save_baseline(run, args.baseline)
+        print(f"← {args.baseline} (خط أساس جديد)")
+        return 0
+
+    regressions = benchmark.find_regressions(run, baseline, args.tolerance)
+    print(f"نسبة سرعة الجهاز إلى خط الأساس (المعايرة): ×{benchmark.speed_ratio(run, baseline):.2f}")
+    if regressions.empty:
+        print(f"لا تراجع مقارنة بخط الأساس ({baseline.get('created_at', '')})")
+        return 0
+    print(regressions.drop(columns='stage').to_string(index=False))
+    print(f"تراجع في {len(regressions)} مرحلة (الحد: ×{args.tolerance})", file=sys.stderr)
+    return 1
+
+
+def cmd_synth(args) -> int:
+    """كتابة ملفي قسطاس والديوان الاصطناعيين بحجم محدد"""
+    started = time.perf_counter()
+    paths = benchmark.write_workbooks(args.rows, args.output, args.kind, args.seed, args.format)
+    for path in paths.values():
+        print(f"← {path}")
+    print(f"{args.rows} سجل خلال {time.perf_counter() - started:.2f} ث")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="أدوات نظام مقارنة التشريعات")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('warm-cache', help="بناء كاش ملفات Excel مسبقاً لكل الأنواع")
+    p.add_argument('--kind', action='append', choices=list(PATHS), help="نوع محدد (يمكن تكراره)")
+    p.add_argument('--strict', action='store_true', help="إنهاء بخطأ إذا كان أي ملف مفقوداً")
+    p.add_argument('--dedup', action='store_true', help="طباعة عدد السجلات المكررة في كل ملف")
+    p.set_defaults(func=cmd_warm_cache)
+
+    p = sub.add_parser('compare', help="مقارنة نوع كامل وكتابة تقرير الفروقات")
+    p.add_argument('--kind', required=True, choices=list(PATHS))
+    p.add_argument('--output', '-o', help="مسار التقرير (الصيغة من الامتداد إن لم تُحدد)")
+    p.add_argument('--format', '-f', choices=FORMATS)
+    p.add_argument('--only-diff', action='store_true', help="الأزواج التي فيها فرق فقط")
+    p.add_argument('--no-cache', action='store_true', help="قراءة ملفات Excel مباشرة دون الكاش")
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser('dedup', help="إزالة التكرار وكتابة ملف _Unique مع تقرير المجموعات")
+    p.add_argument('--kind', required=True, choices=list(PATHS))
+    p.add_argument('--side', choices=['qis', 'diwan'], help="مصدر واحد فقط (الافتراضي: الاثنان)")
+    p.add_argument('--input', '-i', help="ملف مصدر بدل مسار النوع في PATHS")
+    p.add_argument('--output', '-o', help="ملف الناتج (الافتراضي: <الملف>_Unique)")
+    p.add_argument('--level', choices=LEVELS, default=NEAR,
+                   help="exact: سجل متطابق كلياً، near: نفس الرقم والسنة والاسم الموحد، key: نفس GroupKey")
+    p.add_argument('--report', help="ملف تقرير المجموعات المكررة")
+    p.add_argument('--no-cache', action='store_true', help="قراءة ملفات Excel مباشرة دون الكاش")
+    p.set_defaults(func=cmd_dedup)
+
+    p = sub.add_parser('links', help="فحص روابط الاستبدال والإلغاء (مكسورة، حلقات، غير متبادلة، ساري رغم استبداله)")
+    p.add_argument('--kind', required=True, choices=list(PATHS))
+    p.add_argument('--output', '-o', help="مسار التقرير (الصيغة من الامتداد إن لم تُحدد)")
+    p.add_argument('--format', '-f', choices=FORMATS)
+    p.add_argument('--no-cache', action='store_true', help="قراءة ملفات Excel مباشرة دون الكاش")
+    p.set_defaults(func=cmd_links)
+
+    p = sub.add_parser('match', help="مطابقة تقريبية للأسماء للسجلات دون مقابل")
+    p.add_argument('--kind', required=True, choices=list(PATHS))
+    p.add_argument('--output', '-o', help="مسار الملف (الصيغة من الامتداد إن لم تُحدد)")
+    p.add_argument('--format', '-f', choices=FORMATS)
+    p.add_argument('--top', '-k', type=int, default=TOP_K, help="عدد المرشحين لكل سجل")
+    p.add_argument('--min-similarity', type=float, default=0.0, help="أدنى تشابه نصي (0 - 1)")
+    p.add_argument('--no-cache', action='store_true', help="قراءة ملفات Excel مباشرة دون الكاش")
+    p.set_defaults(func=cmd_match)
+
+    p = sub.add_parser('delta', help="ما تغيّر منذ المراجعة السابقة (القرارات المرحّلة والمطلوب مراجعته)")
+    p.add_argument('--kind', required=True, choices=list(PATHS))
+    p.add_argument('--db', default=DB_FILE, help="قاعدة القرارات")
+    p.add_argument('--output', '-o', help="كتابة قائمة الأزواج الجديدة والمتغيرة")
+    p.add_argument('--format', '-f', choices=FORMATS)
+    p.add_argument('--no-cache', action='store_true', help="قراءة ملفات Excel مباشرة دون الكاش")
+    p.set_defaults(func=cmd_delta)
+
+    p = sub.add_parser('golden', help="بناء البيانات المعتمدة من القرارات (المصدر المختار لكل زوج)")
+    p.add_argument('--kind', required=True, choices=list(PATHS))
+    p.add_argument('--db', default=DB_FILE, help="قاعدة القرارات")
+    p.add_argument('--output', '-o', help="مسار الملف (الصيغة من الامتداد إن لم تُحدد)")
+    p.add_argument('--format', '-f', choices=FORMATS)
+    p.add_argument('--all', action='store_true', help="تضمين الأزواج دون قرار بقيم قسطاس")
+    p.add_argument('--no-cache', action='store_true', help="قراءة ملفات Excel مباشرة دون الكاش")
+    p.set_defaults(func=cmd_golden)
+
+    p = sub.add_parser('bench', help="قياس الأداء على بيانات اصطناعية ومقارنته بخط الأساس")
+    p.add_argument('--sizes', type=int, nargs='+', default=list(benchmark.SIZES), help="أحجام قسطاس المقيسة")
+    p.add_argument('--kind', default='نظام', choices=list(PATHS), help="النوع الذي تُولّد أعمدته")
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--baseline', default=benchmark.BASELINE_FILE, help="ملف خط الأساس JSON (خاص بالجهاز، خارج المستودع)")
+    p.add_argument('--update', action='store_true', help="استبدال خط الأساس بنتائج هذا القياس")
+    p.add_argument('--tolerance', type=float, default=benchmark.TOLERANCE,
+                   help="نسبة الزيادة المسموحة على زمن خط الأساس")
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser('synth', help="توليد ملفي قسطاس والديوان الاصطناعيين")
+    p.add_argument('--rows', type=int, required=True, help="عدد سجلات قسطاس")
+    p.add_argument('--output', '-o', required=True, help="مجلد الملفات")
+    p.add_argument('--kind', default='نظام', choices=list(PATHS))
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--format', '-f', choices=FORMATS, default='xlsx')
+    p.set_defaults(func=cmd_synth)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (KeyError, FileNotFoundError, ValueError, RuntimeError) as e:
+        print(f"خطأ: {e.args[0] if e.args else e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
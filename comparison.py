@@ -0,0 +1,572 @@
+"""
+منطق المقارنة المشترك بين الواجهة وسطر الأوامر
+خرائط الأعمدة لكل نوع تشريع، وفهرس مطابقة السجلات بين قسطاس والديوان
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+from dateutil import parser as date_parser
+
+# ==================== خرائط الأعمدة ====================
+FIELD_MAPPING = {
+    "نظام": {
+        "name_qis": "LegName",           "name_diw": "ByLawName",
+        "num_qis":  "LegNumber",          "num_diw":  "ByLawNumber",
+    },
+    "قانون": {
+        "name_qis": "LegName",           "name_diw": "Law_Name",
+        "num_qis":  "LegNumber",         "num_diw":  "Law_Number",
+    },
+    "تعليمات": {
+        "name_qis": "LegName",   "name_diw": "Instruction_Name",
+        "num_qis":  "LegNumber", "num_diw":  "Instruction_Number",
+    },
+    "اتفاقيات": {
+        "name_qis": "LegName",     "name_diw": "Agreement_Name",
+        "num_qis":  "LegNumber",   "num_diw":  "Agreement_Number",
+    }
+}
+
+
+def get_mapping(kind: str) -> dict:
+    """الخريطة الصحيحة حسب النوع المختار (مع fallback آمن)"""
+    return FIELD_MAPPING.get(kind, FIELD_MAPPING["نظام"])
+
+
+def parse_status(val):
+    if val is None: return None
+    if isinstance(val, (int, float)):
+        try: return int(val)
+        except: return None
+    try:
+        v = str(val).strip()
+        if v == '': return None
+        if v == 'غير ساري': return 2
+        if v == 'ساري': return 1
+        if v.isdigit(): return int(v)
+        f = float(v.replace(',', '.'))
+        return int(f)
+    except Exception:
+        return None
+
+
+# ==================== التوحيد المسبق ====================
+# أعمدة قياسية تُحسب مرة واحدة بعد التحميل: العمود X يقابله X__norm
+# (الحالة رقمياً، التواريخ datetime، الأرقام أعداداً صحيحة) وتُستخدم في المقارنة والتقارير
+NORM_SUFFIX = '__norm'
+STATUS_LABELS = {1: 'ساري', 2: 'غير ساري'}
+DATE_COLUMNS = ('Magazine_Date', 'ActiveDate', 'Active_Date', 'EndDate')
+# صيغة التاريخ الغالبة في كل مصدر (مسار سريع)، وما عداها يُحلَّل بـ dateutil
+DATE_FORMATS = {'qis': '%d-%m-%Y', 'diwan': '%m/%d/%Y'}
+DATE_DAYFIRST = {'qis': True, 'diwan': False}
+
+
+def norm_column(col: str) -> str:
+    return col + NORM_SUFFIX
+
+
+def source_columns(df: pd.DataFrame) -> list:
+    """أعمدة الملف الأصلية دون الأعمدة القياسية المضافة"""
+    return [col for col in df.columns if not str(col).endswith(NORM_SUFFIX)]
+
+
+def map_unique(series: pd.Series, func) -> pd.Series:
+    """تطبيق func مرة واحدة لكل قيمة مميزة (القيم تتكرر كثيراً في هذه الملفات)"""
+    values = series.astype(object)
+    uniques = values.dropna().unique()
+    return values.map(dict(zip(uniques, map(func, uniques))))
+
+
+def normalize_status(series: pd.Series) -> pd.Series:
+    return map_unique(series, parse_status).astype('Int8')
+
+
+def normalize_numbers(series: pd.Series) -> pd.Series:
+    """12 و 12.0 و ' 12 ' ← 12، وما ليس عدداً صحيحاً يصبح فارغاً"""
+    nums = pd.to_numeric(series.astype(object).map(lambda v: v.strip() if isinstance(v, str) else v), errors='coerce')
+    return nums.where(nums % 1 == 0).astype('Int64')
+
+
+def _parse_date(value, dayfirst: bool):
+    try:
+        return date_parser.parse(str(value).strip(), dayfirst=dayfirst)
+    except (ValueError, OverflowError):
+        return None
+
+
+def normalize_dates(series: pd.Series, side: str) -> pd.Series:
+    """تحويل التواريخ إلى datetime (اليوم فقط): الصيغة الغالبة دفعة واحدة ثم dateutil لما تبقى"""
+    values = series.astype(object)
+    parsed = pd.to_datetime(values, format=DATE_FORMATS[side], errors='coerce')
+    rest = parsed.isna() & values.notna() & (values.astype(str).str.strip() != '')
+    if rest.any():
+        dayfirst = DATE_DAYFIRST[side]
+        parsed[rest] = pd.to_datetime(map_unique(values[rest], lambda v: _parse_date(v, dayfirst)), errors='coerce')
+    return parsed.dt.normalize()
+
+
+def add_normalized_columns(df: pd.DataFrame, kind: str, side: str) -> pd.DataFrame:
+    """إطار جديد فيه الأعمدة القياسية لكل حقول المقارنة الموجودة (الإطار الأصلي لا يُعدّل)"""
+    display_fields, conditional_fields = get_field_definitions(kind)
+    mapping = get_mapping(kind)
+    idx = 1 if side == 'qis' else 2
+    number_columns = {mapping['num_qis' if side == 'qis' else 'num_diw'], 'Year'}
+
+    extra = {}
+    for field in display_fields + conditional_fields:
+        col = field[idx]
+        if col not in df.columns:
+            continue
+        if col == 'Status':
+            extra[norm_column(col)] = normalize_status(df[col])
+        elif col in number_columns:
+            extra[norm_column(col)] = normalize_numbers(df[col])
+        elif col in DATE_COLUMNS:
+            extra[norm_column(col)] = normalize_dates(df[col], side)
+    if not extra:
+        return df
+    return pd.concat([df, pd.DataFrame(extra, index=df.index)], axis=1)
+
+
+# ==================== فهرس المطابقة ====================
+MATCHED = 'matched'
+QIS_ONLY = 'qis_only'
+DIWAN_ONLY = 'diwan_only'
+
+QUEUE_LABELS = {
+    MATCHED: 'مطابقة',
+    QIS_ONLY: 'قسطاس فقط',
+    DIWAN_ONLY: 'الديوان فقط',
+}
+
+
+def _normalize_number(series: pd.Series) -> pd.Series:
+    """توحيد الأرقام: 12 و 12.0 و ' 12 ' كلها تصبح '12'"""
+    nums = pd.to_numeric(series, errors='coerce')
+    whole = nums.notna() & (nums % 1 == 0)
+    out = series.astype('object').where(series.notna(), None)
+    out = out.map(lambda v: None if v is None or str(v).strip() == '' else str(v).strip())
+    out[whole] = nums[whole].astype('int64').astype(str)
+    return out
+
+
+def _key_part(text: str) -> str:
+    """جزء من GroupKey: العدد الصحيح دون كسور ('12.0' ← '12')، وإلا النص كما هو"""
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    return str(int(number)) if number.is_integer() else text
+
+
+def _format_group_key(value) -> str:
+    """'(12.0, 2001)' ← '(12,2001)'؛ القيمة الفارغة ← None"""
+    text = str(value).strip()
+    if not text:
+        return None
+    parts = [part.strip() for part in text.strip('()').split(',')]
+    return '(' + ','.join(_key_part(part) for part in parts) + ')'
+
+
+def alignment_keys(df: pd.DataFrame, num_col: str, use_group_key: bool = True) -> pd.Series:
+    """مفتاح المطابقة لكل سجل: GroupKey إن وُجد، وإلا (الرقم، السنة) بعد التوحيد"""
+    if use_group_key and 'GroupKey' in df.columns:
+        keys = map_unique(df['GroupKey'], _format_group_key)
+        return keys.astype('object').where(keys.notna(), None)
+    if num_col not in df.columns or 'Year' not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype='object')
+    num = _normalize_number(df[num_col])
+    year = _normalize_number(df['Year'])
+    keys = '(' + num.astype(str) + ',' + year.astype(str) + ')'
+    return keys.where(num.notna() & year.notna(), None)
+
+
+class PairIndex:
+    """فهرس أزواج السجلات بعد المطابقة.
+    كل زوج له موضع في قسطاس وموضع في الديوان (-1 إذا لم يوجد مقابل)،
+    والقوائم الثلاث (مطابقة / قسطاس فقط / الديوان فقط) مصفوفات لمواضع الأزواج
+    بحيث يكون الانتقال لأي خطوة في الويزارد O(1).
+    """
+
+    def __init__(self, pair_ids, keys, qis_pos, diwan_pos):
+        self.pair_ids = np.asarray(pair_ids, dtype=object)
+        self.keys = np.asarray(keys, dtype=object)
+        self.qis_pos = np.asarray(qis_pos, dtype=np.int64)
+        self.diwan_pos = np.asarray(diwan_pos, dtype=np.int64)
+        has_q = self.qis_pos >= 0
+        has_d = self.diwan_pos >= 0
+        self.queues = {
+            MATCHED: np.flatnonzero(has_q & has_d),
+            QIS_ONLY: np.flatnonzero(has_q & ~has_d),
+            DIWAN_ONLY: np.flatnonzero(~has_q & has_d),
+        }
+        self.row_of = {pid: i for i, pid in enumerate(self.pair_ids)}
+
+    def __len__(self):
+        return len(self.pair_ids)
+
+    def pair(self, row: int):
+        """(موضع قسطاس، موضع الديوان) للزوج رقم row"""
+        return int(self.qis_pos[row]), int(self.diwan_pos[row])
+
+    def counts(self) -> dict:
+        return {name: len(rows) for name, rows in self.queues.items()}
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'pair_id': self.pair_ids,
+            'key': self.keys,
+            'qis_pos': self.qis_pos,
+            'diwan_pos': self.diwan_pos,
+        })
+
+
+def _record_text(df: pd.DataFrame, columns, positions: np.ndarray) -> np.ndarray:
+    """نص محتوى السجل عند كل موضع (قيم columns بمسافات موحدة، و'' للموضع -1) لاشتقاق المعرفات"""
+    parts = []
+    for col in columns:
+        out = np.full(len(positions), '', dtype=object)
+        if col in df.columns:
+            values = df[col].astype(object)
+            values = values.where(values.notna(), '').map(lambda v: ' '.join(str(v).split())).to_numpy()
+            valid = positions >= 0
+            out[valid] = values[positions[valid]]
+        parts.append(out)
+    return np.array(['|'.join(row) for row in zip(*parts)], dtype=object)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:10]
+
+
+def pair_ids_for(keys, qis_text, diwan_text) -> list:
+    """معرفات الأزواج من المحتوى لا من المواضع، فلا تتغير بإضافة سجلات أو إعادة ترتيب الملف:
+    - مفتاح غير مكرر: المفتاح نفسه
+    - مفتاح مكرر: المفتاح#بصمة نص الطرفين (تغيّر المقابل يعني زوجاً آخر ومعرفاً آخر)
+    - دون مفتاح: Q:بصمة أو D:بصمة نص السجل
+    السجلات المتطابقة في النص تماماً تُميَّز بلاحقة ~n بترتيب ظهورها (لا يمكن تمييزها بالمحتوى).
+    مفتاح كان فريداً وصار مكرراً في نسخة لاحقة يتغير معرفه (وقراره يعود للمراجعة).
+    """
+    counts = pd.Series(keys).value_counts()
+    ids = []
+    for key, q_text, d_text in zip(keys, qis_text, diwan_text):
+        if key is None:
+            ids.append(f"Q:{_digest(q_text)}" if q_text else f"D:{_digest(d_text)}")
+        elif counts[key] > 1:
+            ids.append(f"{key}#{_digest(q_text + '/' + d_text)}")
+        else:
+            ids.append(key)
+    seen = pd.Series(ids).groupby(ids, sort=False).cumcount().to_numpy()
+    return [pid if n == 0 else f"{pid}~{n}" for pid, n in zip(ids, seen)]
+
+
+def build_alignment(qis_df: pd.DataFrame, diwan_df: pd.DataFrame, kind: str) -> PairIndex:
+    """مطابقة السجلات بربط hash على المفتاح الموحد (مرة واحدة لكل تحميل).
+    المفاتيح المكررة تُطابق بترتيب ظهورها (أول مكرر مع أول مكرر وهكذا)، ومعرفات الأزواج
+    مشتقة من المحتوى (pair_ids_for).
+    """
+    mapping = get_mapping(kind)
+    use_group_key = 'GroupKey' in qis_df.columns and 'GroupKey' in diwan_df.columns
+    qk = alignment_keys(qis_df, mapping["num_qis"], use_group_key)
+    dk = alignment_keys(diwan_df, mapping["num_diw"], use_group_key)
+
+    def side(keys, pos_name):
+        frame = pd.DataFrame({'key': keys.to_numpy(), pos_name: np.arange(len(keys))})
+        frame = frame[frame['key'].notna()]
+        frame['dup'] = frame.groupby('key', sort=False).cumcount()
+        return frame
+
+    q = side(qk, 'qis_pos')
+    d = side(dk, 'diwan_pos')
+    merged = q.merge(d, on=['key', 'dup'], how='outer', sort=False)
+
+    # السجلات بلا مفتاح لا تطابق شيئاً وتظهر في قائمتها المنفردة
+    q_missing = np.flatnonzero(qk.isna().to_numpy())
+    d_missing = np.flatnonzero(dk.isna().to_numpy())
+    extra = pd.DataFrame({
+        'key': [None] * (len(q_missing) + len(d_missing)),
+        'dup': 0,
+        'qis_pos': np.concatenate([q_missing, np.full(len(d_missing), -1)]),
+        'diwan_pos': np.concatenate([np.full(len(q_missing), -1), d_missing]),
+    })
+    merged = pd.concat([merged, extra], ignore_index=True)
+    merged['qis_pos'] = merged['qis_pos'].fillna(-1).astype('int64')
+    merged['diwan_pos'] = merged['diwan_pos'].fillna(-1).astype('int64')
+
+    # ترتيب ثابت: ترتيب ملف قسطاس أولاً ثم سجلات الديوان المنفردة بترتيبها
+    order_q = np.where(merged['qis_pos'] >= 0, merged['qis_pos'], len(qis_df) + merged['diwan_pos'])
+    merged = merged.iloc[np.argsort(order_q, kind='stable')].reset_index(drop=True)
+
+    keys = merged['key'].astype('object').where(merged['key'].notna(), None).to_numpy()
+    qis_pos, diwan_pos = merged['qis_pos'].to_numpy(), merged['diwan_pos'].to_numpy()
+    # نص المحتوى يلزم فقط للمفاتيح المكررة والسجلات دون مفتاح
+    needs_text = pd.isna(keys) | pd.Series(keys).duplicated(keep=False).to_numpy()
+    qis_text = np.full(len(keys), '', dtype=object)
+    diwan_text = np.full(len(keys), '', dtype=object)
+    qis_text[needs_text] = _record_text(qis_df, [mapping['name_qis'], mapping['num_qis'], 'Year'],
+                                        qis_pos[needs_text])
+    diwan_text[needs_text] = _record_text(diwan_df, [mapping['name_diw'], mapping['num_diw'], 'Year'],
+                                          diwan_pos[needs_text])
+    pair_ids = pair_ids_for(keys, qis_text, diwan_text)
+    return PairIndex(pair_ids, keys, qis_pos, diwan_pos)
+
+
+# ==================== تعريف الحقول المعروضة ====================
+def get_field_definitions(kind: str):
+    """(DISPLAY_FIELDS, CONDITIONAL_FIELDS) للنوع: كل حقل (العنوان، عمود قسطاس، عمود الديوان)"""
+    mapping = get_mapping(kind)
+
+    # الأعمدة الأساسية اللي تظهر دائمًا
+    display_fields = [
+        ("اسم التشريع",       mapping["name_qis"], mapping["name_diw"]),
+        ("رقم التشريع",       mapping["num_qis"],  mapping["num_diw"]),
+        ("السنة",              "Year",             "Year"),
+        ("يحل محل",           "Replaced For",     "Replaced_For"),
+        ("تاريخ الجريدة",     "Magazine_Date",    "Magazine_Date"),
+        ("تاريخ السريان",     "ActiveDate",       "Active_Date"),
+        ("الحالة",            "Status",           "Status"),
+    ]
+
+    # الحقول اللي تظهر فقط إذا كان Status = 2 (غير ساري)
+    conditional_fields = [
+        ("ألغي بواسطة",       "Canceled By",      "Canceled_By"),
+        ("تاريخ الانتهاء",    "EndDate",          "EndDate"),
+        ("تم استبداله بواسطة", "Replaced By",      "Replaced_By"),
+    ]
+    return display_fields, conditional_fields
+
+
+# ==================== محرك الفروقات ====================
+EMPTY_TEXT = '—'
+
+# وزن الفرق في كل حقل لترتيب المراجعة حسب الخطورة (الحقول غير المذكورة وزنها 1)
+FIELD_WEIGHTS = {
+    "الحالة": 10,
+    "رقم التشريع": 8,
+    "السنة": 8,
+    "تاريخ السريان": 4,
+    "تاريخ الانتهاء": 4,
+    "ألغي بواسطة": 3,
+    "تم استبداله بواسطة": 3,
+    "تاريخ الجريدة": 3,
+    "يحل محل": 2,
+    "اسم التشريع": 1,
+}
+
+
+def _take(df: pd.DataFrame, col: str, positions: np.ndarray) -> pd.Series:
+    """قيم العمود col عند المواضع المحددة (None للمواضع -1 أو العمود غير الموجود)"""
+    out = np.full(len(positions), None, dtype=object)
+    if col in df.columns:
+        valid = positions >= 0
+        out[valid] = df[col].astype(object).to_numpy()[positions[valid]]
+    return pd.Series(out, dtype=object)
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    """نفس منطق العرض: القيمة كنص، أو '—' إذا كانت فارغة"""
+    text = values.astype(str)
+    empty = values.isna() | (text.str.strip() == '')
+    return text.where(~empty, EMPTY_TEXT)
+
+
+def _field_text(df: pd.DataFrame, col: str, positions: np.ndarray) -> pd.Series:
+    """نص الحقل للمقارنة والعرض: الصيغة القياسية إن أمكن تحليل القيمة، وإلا النص الأصلي"""
+    text = _as_text(_take(df, col, positions))
+    if norm_column(col) not in df.columns:
+        return text
+    norm = df[norm_column(col)]
+    values = _take(df, norm_column(col), positions)
+    parsed = values.notna()
+    if pd.api.types.is_datetime64_any_dtype(norm.dtype):
+        canonical = values[parsed].map(lambda v: v.strftime('%Y-%m-%d'))
+    elif col == 'Status':
+        canonical = values[parsed].map(lambda v: STATUS_LABELS.get(int(v), str(int(v))))
+    else:
+        canonical = values[parsed].map(lambda v: str(int(v)))
+    text[parsed] = canonical
+    return text
+
+
+class DiffMatrix:
+    """مصفوفة الفروقات لكل الأزواج × الحقول محسوبة دفعة واحدة.
+    - diff: هل يختلف الحقل (كلا الطرفين غير فارغ والقيمتان مختلفتان)
+    - visible: هل يظهر الحقل (الحقول المشروطة فقط عند Status = 2 وعدم فراغ الطرفين)
+    - q_text / d_text: القيم النصية الجاهزة للعرض
+    - identical: أزواج مطابقة تماماً في كل الحقول الأساسية ودون أي فرق في الحقول المشروطة
+    - severity: مجموع أوزان الحقول المختلفة لكل زوج (FIELD_WEIGHTS)
+    """
+
+    def __init__(self, labels, conditional_labels, q_text, d_text, diff, visible, identical):
+        self.labels = labels
+        self.conditional_labels = conditional_labels
+        self.q_text = q_text
+        self.d_text = d_text
+        self.diff = diff
+        self.visible = visible
+        self._q = q_text.to_numpy()
+        self._d = d_text.to_numpy()
+        self._diff = diff.to_numpy()
+        self._visible = visible.to_numpy()
+        self.any_diff = self._diff.any(axis=1)
+        self.identical = np.asarray(identical, dtype=bool)
+        self.severity = self._diff @ np.array([FIELD_WEIGHTS.get(label, 1) for label in labels])
+
+    def row(self, pair_row: int) -> list:
+        """صفوف جدول المقارنة لزوج واحد: (العنوان، قسطاس، الديوان، كلاس الفرق)"""
+        q, d, diff, vis = self._q[pair_row], self._d[pair_row], self._diff[pair_row], self._visible[pair_row]
+        return [
+            (label, q[j], d[j], 'cmp-diff' if diff[j] else '')
+            for j, label in enumerate(self.labels) if vis[j]
+        ]
+
+    def field_counts(self, rows=None) -> pd.Series:
+        """عدد الأزواج المختلفة في كل حقل (لكل الأزواج أو لمجموعة مواضع محددة)"""
+        diff = self._diff if rows is None else self._diff[rows]
+        return pd.Series(diff.sum(axis=0), index=self.labels)
+
+    def differing(self, rows: np.ndarray) -> np.ndarray:
+        """المواضع من rows التي فيها فرق واحد على الأقل"""
+        return rows[self.any_diff[rows]]
+
+    def with_field(self, rows: np.ndarray, label: str) -> np.ndarray:
+        """المواضع من rows التي يختلف فيها الحقل label"""
+        return rows[self._diff[rows, self.labels.index(label)]]
+
+    def by_severity(self, rows: np.ndarray) -> np.ndarray:
+        """rows مرتبة حسب مجموع أوزان الحقول المختلفة تنازلياً (مع الحفاظ على الترتيب الأصلي عند التساوي)"""
+        return rows[np.argsort(-self.severity[rows], kind='stable')]
+
+    def identical_rows(self, rows: np.ndarray) -> np.ndarray:
+        """المواضع من rows المتطابقة تماماً (صالحة للاعتماد التلقائي)"""
+        return rows[self.identical[rows]]
+
+
+def compute_diff_matrix(qis_df: pd.DataFrame, diwan_df: pd.DataFrame, pairs: PairIndex, kind: str) -> DiffMatrix:
+    """حساب الفروقات لكل الأزواج وكل الحقول في تمريرة واحدة"""
+    display_fields, conditional_fields = get_field_definitions(kind)
+    labels = [label for label, _, _ in display_fields + conditional_fields]
+    conditional_labels = [label for label, _, _ in conditional_fields]
+
+    status_col = norm_column('Status') if norm_column('Status') in qis_df.columns else 'Status'
+    status_q = _take(qis_df, status_col, pairs.qis_pos)
+    if status_col == 'Status':
+        status_q = status_q.map(parse_status)
+    inactive = (status_q == 2).to_numpy()
+
+    q_cols, d_cols, diff_cols, vis_cols = {}, {}, {}, {}
+    identical = (pairs.qis_pos >= 0) & (pairs.diwan_pos >= 0)
+    for label, q_key, d_key in display_fields + conditional_fields:
+        q_text = _field_text(qis_df, q_key, pairs.qis_pos)
+        d_text = _field_text(diwan_df, d_key, pairs.diwan_pos)
+        q_has = (q_text != EMPTY_TEXT).to_numpy()
+        d_has = (d_text != EMPTY_TEXT).to_numpy()
+        diff = q_has & d_has & (q_text != d_text).to_numpy()
+        if label in conditional_labels:
+            # لا نعرض السطر إذا كلاهما فارغان، ولا يظهر إلا إذا كان "غير ساري"
+            visible = inactive & (q_has | d_has)
+            diff = diff & visible
+        else:
+            visible = np.ones(len(pairs), dtype=bool)
+            # التطابق التام: نفس النص في الطرفين (بما في ذلك الفراغ في الطرفين)
+            identical &= (q_text == d_text).to_numpy()
+        q_cols[label], d_cols[label] = q_text, d_text
+        diff_cols[label], vis_cols[label] = diff, visible
+
+    return DiffMatrix(
+        labels,
+        conditional_labels,
+        pd.DataFrame(q_cols),
+        pd.DataFrame(d_cols),
+        pd.DataFrame(diff_cols),
+        pd.DataFrame(vis_cols),
+        identical & ~np.column_stack(list(diff_cols.values())).any(axis=1),
+    )
+
+
+# ==================== عرض سجل واحد ====================
+def record_values(df: pd.DataFrame, pos: int) -> dict:
+    """قيم الأعمدة الأصلية لسجل واحد (القيم الفارغة نص فارغ، وموضع غير موجود قاموس فارغ)"""
+    if pos < 0 or pos >= len(df):
+        return {}
+    row = df.iloc[pos][source_columns(df)]
+    return {k: ('' if pd.isna(v) else v) for k, v in row.to_dict().items()}
+
+
+def comparison_table_html(rows: list) -> str:
+    """جدول المقارنة (اسم الحقل | قسطاس | الديوان) من صفوف DiffMatrix.row"""
+    html = ["<div class='cmp-wrapper'><table class='cmp-table'>"]
+    html.append("<thead><tr><th>اسم الحقل</th><th>قسطاس</th><th>الديوان</th></tr></thead><tbody>")
+    for label, qv, dv, cls in rows:
+        q_td = f"<td class='{cls}'>{qv}</td>"
+        d_td = f"<td class='{cls}'>{dv}</td>"
+        html.append(f"<tr><td>{label}</td>{q_td}{d_td}</tr>")
+    html.append("</tbody></table></div>")
+    return "\n".join(html)
+
+
+# ==================== المراجعة التزايدية ====================
+UNCHANGED = 'unchanged'
+CHANGED = 'changed'
+NEW = 'new'
+
+DELTA_LABELS = {
+    UNCHANGED: 'دون تغيير (قرار مُرحّل)',
+    CHANGED: 'تغيّر بعد القرار',
+    NEW: 'دون قرار سابق',
+}
+
+
+def content_hashes(diffs: DiffMatrix) -> np.ndarray:
+    """بصمة محتوى كل زوج: قيم الحقول القياسية في الطرفين كما تُعرض للمراجع"""
+    frame = pd.concat([diffs.q_text.add_prefix('q:'), diffs.d_text.add_prefix('d:')], axis=1)
+    hashed = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return np.array([f"{h:016x}" for h in hashed], dtype=object)
+
+
+def review_delta(pairs: PairIndex, hashes: np.ndarray, decided: dict) -> dict:
+    """تصنيف الأزواج مقابل القرارات السابقة {pair_id: بصمة وقت القرار}:
+    دون تغيير (يُرحّل قراره)، تغيّر (أو قرار قديم بلا بصمة)، جديد دون قرار.
+    يعيد مواضع الأزواج لكل فئة، و'removed' لمعرفات القرارات التي لم يعد زوجها موجوداً.
+    """
+    previous = np.array([decided.get(pid) for pid in pairs.pair_ids], dtype=object)
+    has_decision = np.array([pid in decided for pid in pairs.pair_ids], dtype=bool)
+    same = has_decision & (previous == hashes)
+    return {
+        UNCHANGED: np.flatnonzero(same),
+        CHANGED: np.flatnonzero(has_decision & ~same),
+        NEW: np.flatnonzero(~has_decision),
+        'removed': sorted(set(decided) - set(pairs.row_of)),
+    }
+
+
+# ==================== تقرير الفروقات الكامل ====================
+def build_report(pairs: PairIndex, diffs: DiffMatrix):
+    """(تقرير لكل زوج، ملخص) من فهرس المطابقة ومصفوفة الفروقات دون المرور على الصفوف.
+    أعمدة التقرير لكل حقل: قيمة قسطاس، قيمة الديوان، وعلم الاختلاف.
+    """
+    queue_of = np.empty(len(pairs), dtype=object)
+    for name, rows in pairs.queues.items():
+        queue_of[rows] = QUEUE_LABELS[name]
+
+    columns = {
+        'معرف الزوج': pairs.pair_ids,
+        'القائمة': queue_of,
+    }
+    for label in diffs.labels:
+        columns[f"{label} - قسطاس"] = diffs.q_text[label].to_numpy()
+        columns[f"{label} - الديوان"] = diffs.d_text[label].to_numpy()
+        columns[f"{label} - مختلف"] = diffs.diff[label].to_numpy()
+    columns['عدد الفروقات'] = diffs.diff.to_numpy().sum(axis=1)
+    columns['درجة الخطورة'] = diffs.severity
+    columns['متطابق تماماً'] = diffs.identical
+    report = pd.DataFrame(columns)
+
+    matched = pairs.queues[MATCHED]
+    summary_rows = [(f"عدد السجلات - {QUEUE_LABELS[name]}", len(rows)) for name, rows in pairs.queues.items()]
+    summary_rows.append(("أزواج فيها فرق واحد على الأقل", int(diffs.any_diff[matched].sum())))
+    summary_rows.append(("أزواج متطابقة تماماً", int(diffs.identical[matched].sum())))
+    summary_rows += [(f"فروقات: {label}", int(n)) for label, n in diffs.field_counts(matched).items()]
+    summary = pd.DataFrame(summary_rows, columns=['البند', 'العدد'])
+    return report, summary
@@ -0,0 +1,328 @@
+"""
+تحميل ملفات التشريعات مع كاش ثنائي على القرص
+يُقرأ ملف Excel مرة واحدة فقط، ثم يُحفظ كـ pickle ويُعاد استخدامه
+حتى يتغير الملف المصدر (المسار، الحجم، وقت التعديل، بصمة المحتوى)
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from comparison import add_normalized_columns, get_field_definitions
+
+# ==================== المسارات ====================
+PATHS = {
+    'نظام': {
+        'qis': r'extData/Bylaws/Qis_ByLaws_V2.xlsx',
+        'diwan': r'extData/Bylaws/Diwan_ByLaws_V2.xlsx'
+    },
+    'قانون': {
+        'qis': r'extData/Laws/Qis_Laws_V2.xlsx',
+        'diwan': r'extData/Laws/Diwan_Laws_V2.xlsx'
+    },
+    'تعليمات': {
+        'qis': r'extData/Instructions/Qis_Instructions.xlsx',
+        'diwan': r'extData/Instructions/Diwan_Instructions.xlsx'
+    },
+    'اتفاقيات': {
+        'qis': r'extData/Agreements/Qis_Agreements.xlsx',
+        'diwan': r'extData/Agreements/Diwan_Agreements.xlsx'
+    }
+}
+
+CACHE_DIR = os.environ.get('LEG_CACHE_DIR', '.cache/workbooks')
+HASH_CHUNK = 1 << 20
+
+# ==================== الأعمدة المحمّلة ====================
+# أعمدة العرض في بطاقات كل مصدر: مع أعمدة حقول المقارنة لا تُسقط أبداً
+QisShownCols = ['LegName', 'LegNumber', 'Year','Replaced For', 'Canceled By','ActiveDate', 'EndDate', 'Replaced By', 'Status','Magazine_Date']
+DiwShownCols = ['ByLawName', 'ByLawNumber', 'Year', 'Replaced_For', 'Magazine_Date', 'Active_Date', 'Status']
+EXTRA_COLUMNS = {
+    'qis': QisShownCols + ['GroupKey'],
+    'diwan': DiwShownCols + ['GroupKey'],
+}
+# الإسقاط بالاستبعاد: تُحمَّل كل أعمدة الملف ما عدا المذكورة هنا، فأي عمود جديد في الملفات يصل إلى
+# نص القرار ونموذج الإدخال المخصص دون تعديل. أعمدة المقارنة والعرض لا تُسقط حتى لو ذُكرت
+DROP_COLUMNS = {
+    'qis': [],
+    'diwan': [],
+}
+# LEG_ALL_COLUMNS=1 يعيد تحميل كل أعمدة الملفات دون إسقاط
+ALL_COLUMNS = os.environ.get('LEG_ALL_COLUMNS') == '1'
+# العمود النصي يتحول إلى category إذا كانت نسبة قيمه المميزة أقل من هذه النسبة
+CATEGORY_RATIO = 0.5
+
+# كاش الذاكرة المشترك في العملية: (المسار الكامل، الأعمدة المسقطة) ← (الحجم، وقت التعديل، DataFrame)
+# مع "طيران واحد": إذا كان الملف قيد التحميل في خيط آخر ننتظره بدل قراءته مرتين
+_memory = {}
+_inflight = {}
+_memory_lock = threading.Lock()
+
+
+# ==================== بصمة الملف ====================
+def _content_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache_paths(path: str):
+    """مسار ملف الكاش وملف الوصف الخاص بمصدر معيّن (مفتاحه المسار الكامل)"""
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    stem = f"{os.path.splitext(os.path.basename(path))[0]}-{key}"
+    return os.path.join(CACHE_DIR, stem + '.pkl'), os.path.join(CACHE_DIR, stem + '.json')
+
+
+def _read_meta(meta_path: str):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path: str, writer) -> None:
+    """الكتابة في ملف مؤقت ثم استبداله حتى لا يبقى كاش نصف مكتوب"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        writer(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# ==================== الإسقاط والأنواع المضغوطة ====================
+def dropped_columns(kind: str, side: str) -> tuple:
+    """الأعمدة التي تُسقط من ملف المصدر side للنوع kind (() = كل الأعمدة)"""
+    if ALL_COLUMNS:
+        return ()
+    display_fields, conditional_fields = get_field_definitions(kind)
+    idx = 1 if side == 'qis' else 2
+    required = {field[idx] for field in display_fields + conditional_fields} | set(EXTRA_COLUMNS[side])
+    return tuple(col for col in DROP_COLUMNS[side] if col not in required)
+
+
+def _compact_series(series: pd.Series) -> pd.Series:
+    """أصغر نوع يحفظ القيم كما هي: أعداد صحيحة مصغّرة، category للنصوص المتكررة،
+    وتوحيد (intern) النصوص المتكررة في أعمدة object المتبقية
+    """
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_string_dtype(series.dtype):
+        values = series.dropna()
+        if not values.map(lambda v: isinstance(v, str)).all():
+            return series
+        if series.nunique() < CATEGORY_RATIO * len(series):
+            return series.astype('category')
+        if series.dtype == object:
+            return series.map(lambda v: sys.intern(v) if isinstance(v, str) else v)
+    return series
+
+
+def compact_frame(df: pd.DataFrame, drop=()) -> pd.DataFrame:
+    """إسقاط الأعمدة drop (مع الحفاظ على ترتيب الباقي) وضغط أنواع الباقي"""
+    if drop:
+        df = df.drop(columns=[col for col in drop if col in df.columns])
+    return pd.DataFrame({col: _compact_series(df[col]) for col in df.columns}, index=df.index)
+
+
+# ==================== القراءة ====================
+def read_workbook(path: str, use_cache: bool = True, drop=()) -> pd.DataFrame:
+    """قراءة ملف Excel عبر الكاش (الذاكرة أولاً ثم القرص ثم Excel).
+    تُسقط الأعمدة drop وتُضغط أنواع الباقي قبل حفظ الإطار في الذاكرة،
+    بينما يبقى كاش القرص بكامل الأعمدة حتى لا يلزم تغيير الإسقاط إعادة قراءة Excel.
+    الإطار المعاد مشترك بين المستدعين فلا يجوز تعديله في مكانه.
+    """
+    if not use_cache:
+        return compact_frame(pd.read_excel(path), drop)
+
+    key = (os.path.abspath(path), tuple(drop))
+    while True:
+        st_info = os.stat(path)
+        with _memory_lock:
+            hit = _memory.get(key)
+            if hit and hit[0] == st_info.st_size and hit[1] == st_info.st_mtime_ns:
+                return hit[2]
+            event = _inflight.get(key)
+            owner = event is None
+            if owner:
+                event = _inflight[key] = threading.Event()
+        if owner:
+            break
+        event.wait()
+
+    try:
+        df = compact_frame(_read_workbook_disk(path, st_info), drop)
+        with _memory_lock:
+            _memory[key] = (st_info.st_size, st_info.st_mtime_ns, df)
+        return df
+    finally:
+        with _memory_lock:
+            _inflight.pop(key).set()
+
+
+def _read_workbook_disk(path: str, st_info) -> pd.DataFrame:
+    """كاش القرص: إذا تطابق الحجم ووقت التعديل مع الوصف المحفوظ لا نحسب البصمة أصلاً،
+    وإذا اختلفا نحسب البصمة ونعيد البناء فقط إذا تغير المحتوى فعلاً.
+    """
+    cache_file, meta_file = _cache_paths(path)
+    meta = _read_meta(meta_file)
+
+    if meta and os.path.exists(cache_file):
+        same_stat = meta.get('size') == st_info.st_size and meta.get('mtime_ns') == st_info.st_mtime_ns
+        digest = meta.get('sha256') if same_stat else _content_hash(path)
+        if digest == meta.get('sha256'):
+            try:
+                df = pd.read_pickle(cache_file)
+            except Exception:
+                df = None
+            if df is not None:
+                if not same_stat:
+                    meta.update(size=st_info.st_size, mtime_ns=st_info.st_mtime_ns)
+                    _write_atomic(meta_file, lambda p: _dump_json(p, meta))
+                return df
+    else:
+        digest = _content_hash(path)
+
+    df = pd.read_excel(path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _write_atomic(cache_file, df.to_pickle)
+    meta = {
+        'path': os.path.abspath(path),
+        'size': st_info.st_size,
+        'mtime_ns': st_info.st_mtime_ns,
+        'sha256': digest,
+    }
+    _write_atomic(meta_file, lambda p: _dump_json(p, meta))
+    return df
+
+
+def sheet_name(path: str) -> str:
+    """اسم الورقة الأولى في الملف (الورقة التي تُقرأ منها البيانات)"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        return wb.sheetnames[0]
+    finally:
+        wb.close()
+
+
+def _dump_json(path: str, data) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def is_cached(path: str) -> bool:
+    """هل الكاش صالح للملف دون الحاجة لإعادة قراءة Excel؟"""
+    cache_file, meta_file = _cache_paths(path)
+    meta = _read_meta(meta_file)
+    if not meta or not os.path.exists(cache_file) or not os.path.exists(path):
+        return False
+    st_info = os.stat(path)
+    if meta.get('size') == st_info.st_size and meta.get('mtime_ns') == st_info.st_mtime_ns:
+        return True
+    return _content_hash(path) == meta.get('sha256')
+
+
+def warm_cache(kinds=None, log=print) -> dict:
+    """تسخين الكاش لكل المسارات في PATHS (أو للأنواع المحددة فقط)"""
+    results = {}
+    for kind in (kinds or PATHS):
+        for side, path in PATHS[kind].items():
+            if not os.path.exists(path):
+                log(f"غير موجود ← {path}")
+                results[path] = 'missing'
+                continue
+            status = 'hit' if is_cached(path) else 'built'
+            read_workbook(path, drop=dropped_columns(kind, side))
+            results[path] = status
+            log(f"{kind}/{side}: {status} ← {path}")
+    return results
+
+
+# ==================== التحميل المسبق في الخلفية ====================
+class Preloader:
+    """تحميل كل الأنواع في الخلفية عند بدء التشغيل.
+    ملفا قسطاس والديوان لكل نوع يُقرآن بالتوازي في مجمّع خيوط، وكل ملف يُنشر
+    في كاش الذاكرة فور انتهائه، فيجده read_workbook جاهزاً عند أول تبديل للنوع.
+    """
+
+    def __init__(self, kinds=None, max_workers: int = 4):
+        self.jobs = [
+            (kind, side, path)
+            for kind in (kinds or PATHS)
+            for side, path in PATHS[kind].items()
+            if os.path.exists(path)
+        ]
+        self.done = set()
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(max_workers,), name='preloader', daemon=True)
+        self._thread.start()
+
+    def _run(self, max_workers: int) -> None:
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='preload') as pool:
+                futures = {
+                    pool.submit(read_workbook, path, drop=dropped_columns(kind, side)): path
+                    for kind, side, path in self.jobs
+                }
+                for future in as_completed(futures):
+                    path = futures[future]
+                    with self._lock:
+                        if future.exception() is None:
+                            self.done.add(path)
+                        else:
+                            self.errors[path] = str(future.exception())
+        finally:
+            self._finished.set()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def progress(self):
+        """(عدد الملفات المنتهية، العدد الكلي)"""
+        with self._lock:
+            return len(self.done) + len(self.errors), len(self.jobs)
+
+    def ready_kinds(self) -> list:
+        with self._lock:
+            return [kind for kind in PATHS
+                    if all(path in self.done for k, _, path in self.jobs if k == kind)
+                    and any(k == kind for k, _, _ in self.jobs)]
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._finished.wait(timeout)
+
+
+# ==================== تحميل نوع كامل (بدون واجهة) ====================
+def sort_by_group_key(df: pd.DataFrame) -> pd.DataFrame:
+    """الترتيب حسب GroupKey إن وُجد (نفس ترتيب الويزارد)"""
+    if 'GroupKey' in df.columns:
+        return df.sort_values(by='GroupKey', kind='stable').reset_index(drop=True)
+    return df
+
+
+def load_kind(kind: str, use_cache: bool = True):
+    """تحميل ملفي قسطاس والديوان لنوع محدد مرتبين ومع أعمدتهما القياسية،
+    مع رفع خطأ واضح عند غياب ملف"""
+    if kind not in PATHS:
+        raise KeyError(f"النوع '{kind}' غير مدعوم بعد.")
+    frames = []
+    for side in ('qis', 'diwan'):
+        path = PATHS[kind][side]
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"غير موجود ← {path}")
+        df = sort_by_group_key(read_workbook(path, use_cache, dropped_columns(kind, side)))
+        frames.append(add_normalized_columns(df, kind, side))
+    return tuple(frames)
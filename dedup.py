@@ -0,0 +1,111 @@
+"""
+إزالة التكرار من ملفات التشريعات (إنتاج ملفات _Unique)
+كل سجل يُختصر إلى بصمات لحقوله الموحّدة، فتُكتشف المجموعات المكررة في تمريرة واحدة دون مقارنة السجلات مثنى مثنى
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from comparison import alignment_keys, get_mapping, map_unique, source_columns
+from matching import normalize_arabic
+
+# مستويات التكرار من الأضيق إلى الأوسع:
+# - exact: السجل كله متطابق بعد توحيد النصوص
+# - near: نفس الرقم والسنة، ونفس كلمات الاسم بعد توحيدها وحذف الكلمات العامة (بأي ترتيب)
+# - key: نفس مفتاح المطابقة GroupKey (سلوك ملفات _Unique الحالية: أول سجل لكل مفتاح)
+EXACT = 'exact'
+NEAR = 'near'
+KEY = 'key'
+LEVELS = (EXACT, NEAR, KEY)
+
+LEVEL_LABELS = {
+    EXACT: 'تطابق تام',
+    NEAR: 'شبه مكرر',
+    KEY: 'نفس المفتاح',
+}
+
+# كلمات لا تميّز تشريعاً عن آخر داخل نفس الرقم والسنة
+FILLER_TOKENS = {'رقم', 'لسنه', 'سنه', 'وتعديلاته', 'المعدل', 'معدل', 'الصادر', 'صادر', 'بمقتضى'}
+
+
+def name_signature(name) -> str:
+    """كلمات الاسم الموحّدة المميِّزة مرتبة (الأرقام والكلمات العامة محذوفة)"""
+    tokens = normalize_arabic(name).split()
+    return ' '.join(sorted({t for t in tokens if t not in FILLER_TOKENS and not t.isdigit()}))
+
+
+def _normalized_text(series: pd.Series) -> pd.Series:
+    return map_unique(series, lambda v: normalize_arabic(v) if isinstance(v, str) else v)
+
+
+def _hash_rows(frame: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(frame.astype(object), index=False).to_numpy()
+
+
+def _first_of_group(hashes: np.ndarray, valid: np.ndarray = None) -> np.ndarray:
+    """موضع أول سجل في مجموعة كل سجل (السجلات غير الصالحة مجموعة لنفسها)"""
+    positions = np.arange(len(hashes))
+    first = pd.Series(positions).groupby(hashes).transform('min').to_numpy()
+    if valid is not None:
+        first = np.where(valid, first, positions)
+    return first
+
+
+def duplicate_groups(df: pd.DataFrame, kind: str, side: str) -> pd.DataFrame:
+    """لكل سجل: موضع أول سجل في مجموعته عند كل مستوى (يساوي موضعه إذا لم يكن مكرراً)"""
+    mapping = get_mapping(kind)
+    suffix = 'qis' if side == 'qis' else 'diw'
+    name_col, num_col = mapping[f"name_{suffix}"], mapping[f"num_{suffix}"]
+    columns = source_columns(df)
+
+    exact = _hash_rows(pd.DataFrame({col: _normalized_text(df[col]) for col in columns}))
+
+    keys = alignment_keys(df, num_col).to_numpy(dtype=object)
+    has_key = pd.notna(keys)
+    names = df[name_col] if name_col in df.columns else pd.Series([None] * len(df), index=df.index)
+    signatures = map_unique(names, name_signature).fillna('').to_numpy(dtype=object)
+    near = _hash_rows(pd.DataFrame({'key': keys, 'name': signatures}))
+    key = _hash_rows(pd.DataFrame({'key': keys}))
+
+    return pd.DataFrame({
+        EXACT: _first_of_group(exact),
+        NEAR: _first_of_group(near, has_key & (signatures != '')),
+        KEY: _first_of_group(key, has_key),
+    })
+
+
+def deduplicate(df: pd.DataFrame, kind: str, side: str, level: str = NEAR):
+    """(الإطار دون تكرار بترتيبه الأصلي، تقرير المجموعات المكررة لكل المستويات).
+    يُحتفظ بأول سجل من كل مجموعة عند المستوى المختار.
+    """
+    if level not in LEVELS:
+        raise ValueError(f"مستوى غير مدعوم: {level}")
+    groups = duplicate_groups(df, kind, side)
+    positions = np.arange(len(df))
+    unique = df.iloc[groups[level].to_numpy() == positions][source_columns(df)].reset_index(drop=True)
+
+    mapping = get_mapping(kind)
+    name_col = mapping['name_qis' if side == 'qis' else 'name_diw']
+    names = df[name_col].to_numpy(dtype=object) if name_col in df.columns else np.full(len(df), None)
+    parts = []
+    for name in LEVELS:
+        first = groups[name].to_numpy()
+        sizes = np.bincount(first, minlength=len(df))[first]
+        rows = np.flatnonzero(sizes > 1)
+        parts.append(pd.DataFrame({
+            'المستوى': LEVEL_LABELS[name],
+            'المجموعة': first[rows] + 1,
+            'السجل': rows + 1,
+            'عدد السجلات': sizes[rows],
+            'الاسم': names[rows],
+            'مُبقى': first[rows] == rows,
+        }))
+    report = pd.concat(parts, ignore_index=True)
+    return unique, report
+
+
+def unique_path(path: str) -> str:
+    """مسار ملف _Unique المقابل (Diwan_Bylaws.xlsx ← Diwan_Bylaws_Unique.xlsx)"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_Unique{ext}"
@@ -0,0 +1,103 @@
+"""
+كتابة الجداول إلى Excel / CSV / Parquet
+Excel يُكتب بوضع openpyxl write-only (صفاً صفاً) حتى لا يُبنى المصنف كاملاً في الذاكرة
+"""
+import io
+import os
+
+import pandas as pd
+
+FORMATS = ('xlsx', 'csv', 'parquet')
+CSV_CHUNK = 50_000
+
+
+def _cell(value):
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def write_xlsx(target, sheets: dict) -> None:
+    """كتابة عدة أوراق {الاسم: DataFrame} إلى مسار أو BytesIO بوضع write-only"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for name, df in sheets.items():
+        ws = wb.create_sheet(title=str(name)[:31])
+        ws.append([str(c) for c in df.columns])
+        for row in df.itertuples(index=False, name=None):
+            ws.append([_cell(v) for v in row])
+    wb.save(target)
+
+
+def write_csv(target, df: pd.DataFrame) -> None:
+    # utf-8-sig حتى يفتح Excel النصوص العربية بشكل صحيح
+    df.to_csv(target, index=False, encoding='utf-8-sig', chunksize=CSV_CHUNK)
+
+
+def write_parquet(target, df: pd.DataFrame) -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("التصدير إلى Parquet يتطلب تثبيت pyarrow") from e
+    # الأعمدة المختلطة (نص/رقم/تاريخ) تُحفظ كنص حتى يقبلها Arrow
+    mixed = [c for c in df.columns if df[c].dtype == object]
+    df.astype({c: 'string' for c in mixed}).to_parquet(target, index=False)
+
+
+def write_table(df: pd.DataFrame, path: str, fmt: str = None, extra_sheets: dict = None,
+                sheet_name: str = 'التقرير') -> list:
+    """كتابة جدول بالصيغة المطلوبة (أو حسب امتداد الملف).
+    sheet_name اسم ورقة الجدول في Excel.
+    extra_sheets تُضاف كأوراق في Excel، وكملفات مجاورة <الاسم>_<الورقة> في الصيغ الأخرى.
+    يعيد قائمة الملفات المكتوبة.
+    """
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"صيغة غير مدعومة: {fmt} (المتاح: {', '.join(FORMATS)})")
+    extra_sheets = extra_sheets or {}
+
+    if fmt == 'xlsx':
+        write_xlsx(path, {sheet_name: df, **extra_sheets})
+        return [path]
+
+    writer = write_csv if fmt == 'csv' else write_parquet
+    stem = os.path.splitext(path)[0]
+    written = [path]
+    writer(path, df)
+    for name, extra in extra_sheets.items():
+        extra_path = f"{stem}_{name}.{fmt}"
+        writer(extra_path, extra)
+        written.append(extra_path)
+    return written
+
+
+MIME_TYPES = {
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    'csv': "text/csv",
+    'parquet': "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_bytes(df: pd.DataFrame, fmt: str, sheet_name: str = 'Sheet1') -> bytes:
+    """محتوى الملف بالصيغة المطلوبة في الذاكرة (لأزرار التحميل)"""
+    buffer = io.BytesIO()
+    if fmt == 'xlsx':
+        write_xlsx(buffer, {sheet_name: df})
+    elif fmt == 'csv':
+        write_csv(buffer, df)
+    elif fmt == 'parquet':
+        write_parquet(buffer, df)
+    else:
+        raise ValueError(f"صيغة غير مدعومة: {fmt} (المتاح: {', '.join(FORMATS)})")
+    return buffer.getvalue()
@@ -0,0 +1,139 @@
+"""
+بناء البيانات المعتمدة (الذهبية) من قرارات المراجعة
+لكل زوج له قرار تؤخذ قيم المصدر المختار (قسطاس / الديوان / تطابق تلقائي) مباشرة من الإطارين
+المرتبين دفعة واحدة، وتُركّب فوقها القيم المدخلة يدوياً (مصدر آخر) من نص القرار.
+البناء تزايدي: refresh يطبّق فقط القرارات الأحدث من آخر بناء، ويبدأ من الصفر فقط إذا حُذفت قرارات
+"""
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from comparison import PairIndex, get_field_definitions
+
+QIS_SOURCE = 'قسطاس'
+DIWAN_SOURCE = 'الديوان'
+AUTO_SOURCE = 'تطابق تلقائي'
+CUSTOM_SOURCE = 'مصدر آخر'
+PENDING_SOURCE = 'دون قرار'
+
+# الأعمدة المأخوذة من كل طرف حسب المصدر (التطابق التلقائي يُحفظ بقيم قسطاس)
+SIDE_OF_SOURCE = {QIS_SOURCE: 'qis', AUTO_SOURCE: 'qis', DIWAN_SOURCE: 'diwan'}
+
+PAIR_COLUMN = 'معرف الزوج'
+SOURCE_COLUMN = 'المصدر المعتمد'
+REVIEWER_COLUMN = 'المراجع'
+DATE_COLUMN = 'تاريخ القرار'
+
+
+def _side_values(df: pd.DataFrame, col: str, positions: np.ndarray) -> np.ndarray:
+    """قيم العمود col الأصلية عند المواضع (None للموضع -1 أو العمود غير الموجود أو القيمة الفارغة)"""
+    out = np.full(len(positions), None, dtype=object)
+    if col in df.columns:
+        values = df[col].astype(object)
+        values = values.where(values.notna(), None).to_numpy()
+        valid = positions >= 0
+        out[valid] = values[positions[valid]]
+    return out
+
+
+class GoldenDataset:
+    """البيانات المعتمدة لنوع واحد: عمود لكل حقل معروض (بعنوانه الموحد) وصف لكل زوج.
+    الحالة في مصفوفات بطول الأزواج تُحدَّث في مكانها، فإضافة قرارات جديدة لا تعيد بناء الكل.
+    مشترك بين الجلسات: refresh و frame محميان بقفل.
+    """
+
+    def __init__(self, qis_df: pd.DataFrame, diwan_df: pd.DataFrame, pairs: PairIndex, kind: str):
+        display_fields, conditional_fields = get_field_definitions(kind)
+        self.kind = kind
+        self.pairs = pairs
+        self.fields = display_fields + conditional_fields
+        self.labels = [label for label, _, _ in self.fields]
+        self._sides = {
+            'qis': {label: _side_values(qis_df, q_key, pairs.qis_pos) for label, q_key, _ in self.fields},
+            'diwan': {label: _side_values(diwan_df, d_key, pairs.diwan_pos) for label, _, d_key in self.fields},
+        }
+        self._lock = threading.Lock()
+        self._deletions = None
+        self._reset()
+
+    def _reset(self) -> None:
+        n = len(self.pairs)
+        self._values = {label: np.full(n, None, dtype=object) for label in self.labels}
+        self._source = np.full(n, None, dtype=object)
+        self._reviewer = np.full(n, None, dtype=object)
+        self._decided_at = np.full(n, None, dtype=object)
+        self.last_id = 0
+
+    def refresh(self, store) -> int:
+        """تطبيق القرارات الأحدث من آخر بناء، ويعيد عدد القرارات المطبقة.
+        إذا تغيّر عداد الحذف في المخزن (مسح) يُعاد البناء كاملاً؛ الاستبدال لا يغيّره
+        لأن القرار البديل يأخذ معرفاً أحدث فيُطبّق تزايدياً.
+        """
+        with self._lock:
+            deletions = store.deletions
+            if deletions != self._deletions:
+                self._reset()
+                self._deletions = deletions
+            return self._apply(store.decisions_after(self.kind, self.last_id))
+
+    def _apply(self, rows: list) -> int:
+        """القرارات بترتيب الإدخال: القرار الأحدث لنفس الزوج يغطي السابق"""
+        if not rows:
+            return 0
+        frame = pd.DataFrame(rows, columns=['id', 'pair_id', 'source', 'reviewer', 'created_at', 'payload'])
+        self.last_id = int(frame['id'].iloc[-1])
+        frame['row'] = frame['pair_id'].map(self.pairs.row_of)
+        # قرارات لأزواج لم تعد في الملفات الحالية لا مكان لها في البيانات المعتمدة
+        frame = frame[frame['row'].notna()].drop_duplicates('row', keep='last')
+        rows_at = frame['row'].to_numpy(dtype=np.int64)
+        source = frame['source'].to_numpy(dtype=object)
+
+        self._source[rows_at] = source
+        self._reviewer[rows_at] = frame['reviewer'].to_numpy(dtype=object)
+        self._decided_at[rows_at] = frame['created_at'].to_numpy(dtype=object)
+
+        overlay = np.ones(len(frame), dtype=bool)
+        for source_name, side in SIDE_OF_SOURCE.items():
+            chosen = source == source_name
+            overlay &= ~chosen
+            targets = rows_at[chosen]
+            for label in self.labels:
+                self._values[label][targets] = self._sides[side][label][targets]
+
+        # مصدر آخر (وأي مصدر غير معروف): القيم كما أدخلها المراجع بأسماء أعمدة السجل المرجعي
+        for row, payload in zip(rows_at[overlay], frame['payload'].to_numpy()[overlay]):
+            record = json.loads(payload)
+            for label, q_key, d_key in self.fields:
+                value = record.get(q_key, record.get(d_key))
+                self._values[label][row] = value if value != '' else None
+        return len(frame)
+
+    def frame(self, include_pending: bool = False) -> pd.DataFrame:
+        """الجدول المعتمد بترتيب الأزواج. include_pending يضيف الأزواج دون قرار بقيم قسطاس
+        (أو الديوان إن لم يوجد سجل في قسطاس) ومصدر 'دون قرار'."""
+        with self._lock:
+            decided = self._source != None  # noqa: E711
+            rows = np.arange(len(self.pairs)) if include_pending else np.flatnonzero(decided)
+            columns = {
+                PAIR_COLUMN: self.pairs.pair_ids[rows],
+                SOURCE_COLUMN: np.where(decided[rows], self._source[rows], PENDING_SOURCE),
+                REVIEWER_COLUMN: self._reviewer[rows],
+                DATE_COLUMN: self._decided_at[rows],
+            }
+            pending = ~decided[rows]
+            fallback = self.pairs.qis_pos[rows] >= 0
+            for label in self.labels:
+                values = self._values[label][rows]
+                if include_pending:
+                    values[pending] = np.where(fallback, self._sides['qis'][label][rows],
+                                               self._sides['diwan'][label][rows])[pending]
+                columns[label] = values
+        return pd.DataFrame(columns)
+
+    def summary(self) -> pd.DataFrame:
+        """عدد الأزواج لكل مصدر معتمد (مع الأزواج دون قرار)"""
+        with self._lock:
+            counts = pd.Series(self._source).fillna(PENDING_SOURCE).value_counts()
+        return counts.rename_axis('المصدر').reset_index(name='العدد')
@@ -0,0 +1,236 @@
+"""
+شبكة روابط الاستبدال والإلغاء بين التشريعات
+تُستخرج المراجع (النوع، الرقم، السنة) من نصوص "يحل محل" و"تم استبداله بواسطة" و"ألغي بواسطة"
+دفعة واحدة، وتُربط بسجلات نفس المصدر، ثم تُفحص الشبكة: روابط مكسورة، حلقات، روابط غير متبادلة،
+وتشريعات ساري رغم استبدالها أو إلغائها
+"""
+import numpy as np
+import pandas as pd
+
+from comparison import get_mapping, norm_column
+
+# ==================== أنواع الروابط ====================
+REPLACED_FOR = 'replaced_for'
+REPLACED_BY = 'replaced_by'
+CANCELED_BY = 'canceled_by'
+
+LINK_COLUMNS = {
+    'qis': {'Replaced For': REPLACED_FOR, 'Replaced By': REPLACED_BY, 'Canceled By': CANCELED_BY},
+    'diwan': {'Replaced_For': REPLACED_FOR, 'Replaced_By': REPLACED_BY, 'Canceled_By': CANCELED_BY},
+}
+
+# نصوص تعني عدم وجود رابط
+EMPTY_LINKS = {'', 'غير معروف'}
+
+# ==================== الفحوص ====================
+BROKEN = 'broken'
+CYCLE = 'cycle'
+ASYMMETRIC = 'asymmetric'
+ACTIVE_REPLACED = 'active_replaced'
+
+CHECK_LABELS = {
+    BROKEN: 'رابط مكسور',
+    CYCLE: 'حلقة استبدال',
+    ASYMMETRIC: 'رابط غير متبادل',
+    ACTIVE_REPLACED: 'ساري رغم استبداله أو إلغائه',
+}
+
+# المرجع: "<نوع> ... رقم (N) لسنة YYYY"، أو بلا نوع، أو "N/YYYY" (النوع عندها نفس نوع السجل)
+_NUM_YEAR = r'رقم\s*\(?\s*(?P<num>\d+)\s*\)?\s*ل?\s*سنة\s*\(?\s*(?P<year>\d{4})'
+_REF_WITH_KIND = r'(?P<kind>نظام|قانون|تعليمات)[^\d()]{0,120}?' + _NUM_YEAR
+_REF_SLASH = r'(?P<num>\d+)\s*/\s*(?P<year>\d{4})'
+
+
+def extract_references(series: pd.Series) -> pd.DataFrame:
+    """(kind, num, year, text) لكل قيمة: أول مرجع في النص (بحث متجه على العمود كله)"""
+    text = series.astype(object).where(series.notna(), '').astype(str).str.strip()
+    text = text.where(~text.isin(EMPTY_LINKS), '')
+    with_kind = text.str.extract(_REF_WITH_KIND)
+    bare = text.str.extract(_NUM_YEAR)
+    slash = text.str.extract(_REF_SLASH)
+    num = with_kind['num'].fillna(bare['num']).fillna(slash['num'])
+    year = with_kind['year'].fillna(bare['year']).fillna(slash['year'])
+    return pd.DataFrame({
+        'kind': with_kind['kind'],
+        'num': pd.to_numeric(num, errors='coerce').astype('Int64'),
+        'year': pd.to_numeric(year, errors='coerce').astype('Int64'),
+        'text': text,
+    })
+
+
+def _strongly_connected(adjacency: list) -> list:
+    """مكوّنات الترابط القوي (Tarjan تكرارياً دون عودية)"""
+    index, low, on_stack = {}, {}, set()
+    stack, components = [], []
+    counter = 0
+    for root in range(len(adjacency)):
+        if root in index:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, i = work.pop()
+            if i == 0:
+                index[node] = low[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack.add(node)
+            recurse = False
+            for j in range(i, len(adjacency[node])):
+                nxt = adjacency[node][j]
+                if nxt not in index:
+                    work.append((node, j + 1))
+                    work.append((nxt, 0))
+                    recurse = True
+                    break
+                if nxt in on_stack:
+                    low[node] = min(low[node], index[nxt])
+            if recurse:
+                continue
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+    return components
+
+
+class LinkGraph:
+    """شبكة روابط مصدر واحد.
+    - edges: (من، إلى) بمعنى "من" حلّ محله أو ألغاه "إلى"
+    - issues: إطار المشكلات (pos، check، column، reference، detail)
+    """
+
+    def __init__(self, size: int, edges: list, issues: pd.DataFrame):
+        self.size = size
+        self.edges = edges
+        self.issues = issues
+        self._positions = {check: np.unique(group['pos'].to_numpy(dtype=np.int64))
+                           for check, group in issues.groupby('check')}
+        self._all = np.unique(issues['pos'].to_numpy(dtype=np.int64))
+
+    def positions(self, check: str = None) -> np.ndarray:
+        """مواضع السجلات التي فيها مشكلة (من نوع محدد أو أي نوع)"""
+        if check is None:
+            return self._all
+        return self._positions.get(check, np.empty(0, dtype=np.int64))
+
+    def for_position(self, pos: int) -> pd.DataFrame:
+        return self.issues[self.issues['pos'] == pos]
+
+    def counts(self) -> dict:
+        return {check: len(self.positions(check)) for check in CHECK_LABELS}
+
+
+def build_link_graph(df: pd.DataFrame, kind: str, side: str) -> LinkGraph:
+    """بناء الشبكة وفحصها لمصدر واحد (side: 'qis' أو 'diwan')"""
+    mapping = get_mapping(kind)
+    num_col = mapping['num_qis' if side == 'qis' else 'num_diw']
+    columns = {col: link for col, link in LINK_COLUMNS[side].items() if col in df.columns}
+
+    def values(col):
+        name = norm_column(col) if norm_column(col) in df.columns else col
+        if name not in df.columns:
+            return pd.Series([pd.NA] * len(df), dtype='Int64')
+        return pd.to_numeric(df[name], errors='coerce').astype('Int64').reset_index(drop=True)
+
+    own_num, own_year = values(num_col), values('Year')
+    own_key = list(zip(own_num.astype(object), own_year.astype(object)))
+    by_key = {}
+    for pos, key in enumerate(own_key):
+        if not any(pd.isna(v) for v in key):
+            by_key.setdefault(key, []).append(pos)
+
+    issues = []
+    targets = {}   # (pos, link) ← مواضع السجلات المشار إليها
+    for col, link in columns.items():
+        refs = extract_references(df[col].reset_index(drop=True))
+        local = refs['num'].notna() & refs['year'].notna() & (refs['kind'].isna() | (refs['kind'] == kind))
+        for pos in np.flatnonzero(local.to_numpy()):
+            key = (refs['num'].iat[pos], refs['year'].iat[pos])
+            found = by_key.get(key)
+            if found:
+                targets[(pos, link)] = found
+            else:
+                issues.append((pos, BROKEN, col, refs['text'].iat[pos], f"لا يوجد سجل ({key[0]}, {key[1]})"))
+
+    # الحواف: "من" حلّ محله/ألغاه "إلى"، فقط حين يشير المرجع إلى سجل واحد بعينه
+    # (المفتاح المشترك بين عدة سجلات لا يحدد أيها المقصود فيصنع حلقات وهمية)
+    edges = []
+    for (pos, link), found in targets.items():
+        if len(found) == 1:
+            edges.append((found[0], pos) if link == REPLACED_FOR else (pos, found[0]))
+
+    # الروابط غير المتبادلة: أ "تم استبداله بواسطة" ب يقابله ب "يحل محل" أ، والعكس
+    back = {REPLACED_BY: REPLACED_FOR, REPLACED_FOR: REPLACED_BY}
+    column_of = {link: col for col, link in columns.items()}
+    for (pos, link), found in targets.items():
+        if link not in back or back[link] not in column_of:
+            continue
+        if not any(pos in targets.get((target, back[link]), ()) for target in found):
+            issues.append((pos, ASYMMETRIC, column_of[link], '',
+                           f"السجل ({own_key[found[0]][0]}, {own_key[found[0]][1]}) لا يشير إليه في "
+                           f"'{column_of[back[link]]}'"))
+
+    # الحلقات
+    adjacency = [[] for _ in range(len(df))]
+    for source, target in set(edges):
+        adjacency[source].append(target)
+    for component in _strongly_connected(adjacency):
+        if len(component) > 1 or component[0] in adjacency[component[0]]:
+            members = ' ← '.join(f"({own_key[p][0]}, {own_key[p][1]})" for p in sorted(component))
+            issues.extend((pos, CYCLE, '', '', members) for pos in component)
+
+    # ساري رغم استبداله أو إلغائه
+    status_col = norm_column('Status')
+    if status_col in df.columns:
+        active = (df[status_col].reset_index(drop=True) == 1).fillna(False).to_numpy(dtype=bool)
+        superseded = np.zeros(len(df), dtype=bool)
+        for source, _ in edges:
+            superseded[source] = True
+        if 'Canceled By' in columns or 'Canceled_By' in columns:
+            col = 'Canceled By' if 'Canceled By' in columns else 'Canceled_By'
+            superseded |= (extract_references(df[col])['text'] != '').to_numpy()
+        if norm_column('EndDate') in df.columns:
+            superseded |= df[norm_column('EndDate')].notna().to_numpy()
+        for pos in np.flatnonzero(active & superseded):
+            issues.append((int(pos), ACTIVE_REPLACED, '', '', "الحالة ساري مع وجود استبدال أو إلغاء أو تاريخ انتهاء"))
+
+    frame = pd.DataFrame(issues, columns=['pos', 'check', 'column', 'reference', 'detail'])
+    frame['pos'] = frame['pos'].astype(np.int64)
+    return LinkGraph(len(df), edges, frame.sort_values(['pos', 'check'], kind='stable').reset_index(drop=True))
+
+
+# ==================== التقرير ====================
+def link_report(qis_df: pd.DataFrame, diwan_df: pd.DataFrame, graphs: dict, kind: str):
+    """(تقرير المشكلات لكل سجل، ملخص) للمصدرين معاً. graphs: {'qis': LinkGraph، 'diwan': LinkGraph}"""
+    mapping = get_mapping(kind)
+    frames = {'qis': qis_df, 'diwan': diwan_df}
+    labels = {'qis': 'قسطاس', 'diwan': 'الديوان'}
+    parts, summary = [], []
+    for side, graph in graphs.items():
+        df = frames[side]
+        name_col = mapping['name_qis' if side == 'qis' else 'name_diw']
+        issues = graph.issues
+        names = df[name_col].to_numpy(dtype=object) if name_col in df.columns else np.full(len(df), None)
+        group_keys = df['GroupKey'].to_numpy(dtype=object) if 'GroupKey' in df.columns else np.full(len(df), None)
+        parts.append(pd.DataFrame({
+            'المصدر': labels[side],
+            'السجل': issues['pos'].to_numpy() + 1,
+            'GroupKey': group_keys[issues['pos'].to_numpy()],
+            'الاسم': names[issues['pos'].to_numpy()],
+            'الفحص': issues['check'].map(CHECK_LABELS).to_numpy(),
+            'الحقل': issues['column'].to_numpy(),
+            'المرجع': issues['reference'].to_numpy(),
+            'التفاصيل': issues['detail'].to_numpy(),
+        }))
+        summary += [(f"{labels[side]} - {CHECK_LABELS[check]}", n) for check, n in graph.counts().items()]
+        summary.append((f"{labels[side]} - عدد الروابط المحلولة", len(graph.edges)))
+    report = pd.concat(parts, ignore_index=True)
+    return report, pd.DataFrame(summary, columns=['البند', 'العدد'])
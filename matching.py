@@ -0,0 +1,253 @@
+"""
+المطابقة التقريبية لأسماء التشريعات والبحث فيها
+توحيد الكتابة العربية ثم فهرسة الأسماء بمقاطع الحروف (n-grams) مع تقسيم حسب السنة والرقم،
+لاقتراح أقرب السجلات من المصدر الآخر للسجلات التي بقيت دون مقابل،
+وفهرس كلمات للبحث السريع عن أي زوج بالاسم أو الرقم أو السنة
+"""
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from comparison import DIWAN_ONLY, QIS_ONLY, PairIndex, get_mapping, norm_column
+
+NGRAM_SIZE = 3
+TOP_K = 5
+# وزن تطابق رقم التشريع يضاف إلى التشابه النصي
+NUMBER_WEIGHT = 0.25
+# المقاطع الشائعة جداً (مثل "نظام") لا تفيد في البحث خارج كتلة السنة
+MAX_DF_RATIO = 0.2
+
+# ==================== توحيد الكتابة العربية ====================
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_NON_WORD = re.compile(r'[^\w\s]|_')
+_SPACES = re.compile(r'\s+')
+_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه', 'ى': 'ي', 'ؤ': 'و', 'ئ': 'ي',
+    **{chr(0x0660 + d): str(d) for d in range(10)},
+    **{chr(0x06f0 + d): str(d) for d in range(10)},
+})
+
+
+def normalize_arabic(text) -> str:
+    """إزالة التشكيل والتطويل، توحيد الهمزات والتاء المربوطة والألف المقصورة والأرقام، وضغط الفراغات"""
+    if text is None or (not isinstance(text, str) and pd.isna(text)):
+        return ''
+    text = _DIACRITICS.sub('', str(text)).translate(_LETTERS)
+    text = _NON_WORD.sub(' ', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> set:
+    """مقاطع الحروف للنص الموحّد (مع فراغ في الطرفين حتى تُحسب بدايات ونهايات الكلمات)"""
+    if not text:
+        return set()
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def _as_key(value):
+    """قيمة السنة/الرقم كمفتاح كتلة (None إذا كانت فارغة)"""
+    if value is None or pd.isna(value):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return str(value).strip() or None
+
+
+# ==================== الفهرس ====================
+class NameIndex:
+    """فهرس مقلوب لمقاطع الأسماء: المقطع ← مواضع السجلات التي تحتويه.
+    البحث يمر على قوائم مقاطع الاسم المطلوب داخل كتلة سنته فقط (وعلى كتلة السنة والرقم)،
+    فتكلفة الاستعلام تتبع حجم الكتلة لا حجم الملف.
+    """
+
+    def __init__(self, names, years=None, numbers=None, n: int = NGRAM_SIZE):
+        self.n = n
+        self.names = [normalize_arabic(name) for name in names]
+        size = len(self.names)
+        self.years = [_as_key(v) for v in (years if years is not None else [None] * size)]
+        self.numbers = np.array([_as_key(v) for v in (numbers if numbers is not None else [None] * size)],
+                                dtype=object)
+
+        postings = defaultdict(list)
+        block_postings = defaultdict(list)
+        number_blocks = defaultdict(list)
+        sizes = np.zeros(size, dtype=np.int32)
+        for i, (name, year, number) in enumerate(zip(self.names, self.years, self.numbers)):
+            grams = char_ngrams(name, n)
+            sizes[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+                if year is not None:
+                    block_postings[(year, gram)].append(i)
+            if year is not None and number is not None:
+                number_blocks[(year, number)].append(i)
+
+        self.sizes = sizes
+        self._postings = {g: np.array(v, dtype=np.int32) for g, v in postings.items()}
+        self._block_postings = {g: np.array(v, dtype=np.int32) for g, v in block_postings.items()}
+        self._number_blocks = {g: np.array(v, dtype=np.int32) for g, v in number_blocks.items()}
+        self._years = set(y for y in self.years if y is not None)
+        self._max_df = max(1, int(size * MAX_DF_RATIO))
+
+    def __len__(self):
+        return len(self.names)
+
+    def query(self, name, year=None, number=None, k: int = TOP_K) -> list:
+        """أفضل k مرشحين: قائمة (الموضع، الدرجة، التشابه النصي، تطابق الرقم) مرتبة تنازلياً.
+        التشابه النصي هو معامل Dice على مقاطع الحروف (0 - 1).
+        """
+        grams = char_ngrams(normalize_arabic(name), self.n)
+        year, number = _as_key(year), _as_key(number)
+
+        if year in self._years:
+            lists = [self._block_postings.get((year, g)) for g in grams]
+        else:
+            lists = [p for p in (self._postings.get(g) for g in grams) if p is not None and len(p) <= self._max_df]
+        lists = [p for p in lists if p is not None]
+
+        hits = np.concatenate(lists) if lists else np.empty(0, dtype=np.int32)
+        docs, common = np.unique(hits, return_counts=True)
+        same_block = self._number_blocks.get((year, number))
+        if same_block is not None:
+            extra = np.setdiff1d(same_block, docs)
+            docs = np.concatenate([docs, extra])
+            common = np.concatenate([common, np.zeros(len(extra), dtype=common.dtype)])
+        if len(docs) == 0:
+            return []
+
+        similarity = 2.0 * common / np.maximum(len(grams) + self.sizes[docs], 1)
+        same_number = self.numbers[docs] == number if number is not None else np.zeros(len(docs), dtype=bool)
+        score = similarity + NUMBER_WEIGHT * same_number
+        top = np.argsort(-score, kind='stable')[:k]
+        return [(int(docs[i]), float(score[i]), float(similarity[i]), bool(same_number[i])) for i in top]
+
+
+def _column(df: pd.DataFrame, col: str):
+    """القيم القياسية للعمود إن وُجدت، وإلا الأصلية (أو None إذا لم يوجد العمود)"""
+    for name in (norm_column(col), col):
+        if name in df.columns:
+            return df[name].to_numpy(dtype=object)
+    return None
+
+
+def _raw_names(df: pd.DataFrame, col: str):
+    if col in df.columns:
+        return df[col].to_numpy(dtype=object)
+    return np.full(len(df), None, dtype=object)
+
+
+def build_name_index(df: pd.DataFrame, kind: str, side: str) -> NameIndex:
+    """فهرس أسماء مصدر كامل (side: 'qis' أو 'diwan') مع كتل السنة والرقم"""
+    mapping = get_mapping(kind)
+    suffix = 'qis' if side == 'qis' else 'diw'
+    return NameIndex(
+        _raw_names(df, mapping[f"name_{suffix}"]),
+        _column(df, 'Year'),
+        _column(df, mapping[f"num_{suffix}"]),
+    )
+
+
+# ==================== اقتراح المقابل للسجلات المنفردة ====================
+def suggest_candidates(qis_df: pd.DataFrame, diwan_df: pd.DataFrame, pairs: PairIndex, kind: str,
+                       k: int = TOP_K, indexes=None) -> pd.DataFrame:
+    """أفضل k مرشحين من المصدر الآخر لكل سجل دون مقابل (قسطاس فقط / الديوان فقط).
+    indexes: (فهرس قسطاس، فهرس الديوان) جاهزان إن وُجدا.
+    """
+    qis_index, diwan_index = indexes or (build_name_index(qis_df, kind, 'qis'),
+                                         build_name_index(diwan_df, kind, 'diwan'))
+    mapping = get_mapping(kind)
+    qis_names = _raw_names(qis_df, mapping['name_qis'])
+    diwan_names = _raw_names(diwan_df, mapping['name_diw'])
+    pair_of_qis = {int(p): row for row, p in enumerate(pairs.qis_pos) if p >= 0}
+    pair_of_diwan = {int(p): row for row, p in enumerate(pairs.diwan_pos) if p >= 0}
+
+    jobs = (
+        (QIS_ONLY, pairs.qis_pos, qis_index, qis_names, diwan_index, diwan_names, pair_of_diwan),
+        (DIWAN_ONLY, pairs.diwan_pos, diwan_index, diwan_names, qis_index, qis_names, pair_of_qis),
+    )
+    rows = []
+    for queue, own_pos, own_index, own_names, other_index, other_names, pair_of_other in jobs:
+        for pair_row in pairs.queues[queue]:
+            pos = int(own_pos[pair_row])
+            matches = other_index.query(own_index.names[pos], own_index.years[pos], own_index.numbers[pos], k)
+            for rank, (cand, score, similarity, same_number) in enumerate(matches, 1):
+                cand_row = pair_of_other[cand]
+                rows.append({
+                    'pair_id': pairs.pair_ids[pair_row],
+                    'queue': queue,
+                    'name': own_names[pos],
+                    'rank': rank,
+                    'candidate_pair_id': pairs.pair_ids[cand_row],
+                    'candidate_unpaired': bool(pairs.qis_pos[cand_row] < 0 or pairs.diwan_pos[cand_row] < 0),
+                    'candidate_pos': cand,
+                    'candidate_name': other_names[cand],
+                    'score': round(score, 4),
+                    'similarity': round(similarity, 4),
+                    'same_number': same_number,
+                })
+    columns = ['pair_id', 'queue', 'name', 'rank', 'candidate_pair_id', 'candidate_unpaired',
+               'candidate_pos', 'candidate_name', 'score', 'similarity', 'same_number']
+    return pd.DataFrame(rows, columns=columns)
+
+
+# ==================== البحث النصي ====================
+SEARCH_LIMIT = 20
+
+
+class SearchIndex:
+    """فهرس مقلوب لكلمات الأسماء الموحّدة والأرقام والسنوات في الطرفين: الكلمة ← مواضع الأزواج.
+    كل كلمة في الاستعلام تطابق الكلمات التي تبدأ بها (والأرقام تطابق تماماً)،
+    والنتيجة تقاطع نتائج الكلمات بترتيب الأزواج.
+    """
+
+    def __init__(self, documents):
+        postings = defaultdict(set)
+        for row, text in enumerate(documents):
+            for token in normalize_arabic(text).split():
+                postings[token].add(row)
+        self.vocab = sorted(postings)
+        self._postings = [np.fromiter(sorted(postings[token]), dtype=np.int64) for token in self.vocab]
+
+    def _matches(self, token: str) -> np.ndarray:
+        if token.isdigit() or len(token) < 2:
+            i = bisect_left(self.vocab, token)
+            found = i < len(self.vocab) and self.vocab[i] == token
+            return self._postings[i] if found else np.empty(0, dtype=np.int64)
+        lo = bisect_left(self.vocab, token)
+        hi = bisect_left(self.vocab, token + '\uffff')
+        if lo == hi:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(self._postings[lo:hi]))
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> np.ndarray:
+        """مواضع الأزواج التي تحتوي كل كلمات الاستعلام (أول limit منها)"""
+        tokens = normalize_arabic(query).split()
+        result = None
+        for token in tokens:
+            rows = self._matches(token)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if len(result) == 0:
+                break
+        return np.empty(0, dtype=np.int64) if result is None else result[:limit]
+
+
+def build_search_index(qis_df: pd.DataFrame, diwan_df: pd.DataFrame, pairs: PairIndex, kind: str) -> SearchIndex:
+    """فهرس البحث لكل أزواج النوع: اسما الطرفين مع الرقم والسنة"""
+    mapping = get_mapping(kind)
+    parts = []
+    for df, positions, side in ((qis_df, pairs.qis_pos, 'qis'), (diwan_df, pairs.diwan_pos, 'diw')):
+        valid = positions >= 0
+        for col in (_raw_names(df, mapping[f"name_{side}"]), _column(df, mapping[f"num_{side}"]), _column(df, 'Year')):
+            values = np.full(len(positions), '', dtype=object)
+            if col is not None:
+                values[valid] = [('' if v is None or pd.isna(v) else str(v)) for v in col[positions[valid]]]
+            parts.append(values)
+    return SearchIndex(' '.join(words) for words in zip(*parts))
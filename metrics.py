@@ -0,0 +1,94 @@
+"""
+قياس أزمنة مراحل التطبيق
+كل مرحلة تُقاس بمؤقت خفيف وتُحفظ في مخزن دوار في الذاكرة (آخر BUFFER_SIZE قياس)،
+مع تمييز إصابة الكاش من فقده للمراحل المخزنة، وملخص p50/p95 لكل مرحلة
+"""
+import io
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+BUFFER_SIZE = 5000
+
+HIT = 'hit'
+MISS = 'miss'
+
+SAMPLE_COLUMNS = ['at', 'stage', 'ms', 'cache', 'run']
+SUMMARY_COLUMNS = ['المرحلة', 'العدد', 'p50 (ms)', 'p95 (ms)', 'الأقصى (ms)', 'إصابة الكاش', 'فقد الكاش']
+
+
+class Metrics:
+    """مخزن دوار لقياسات المراحل مشترك بين الخيوط.
+    track(stage, cached=True) يسجل القياس "إصابة" ما لم تُستدعَ miss(stage) أثناءه
+    (تُستدعى من داخل جسم الدالة المخزنة، فلا تعمل إلا عند الحساب الفعلي).
+    """
+
+    def __init__(self, size: int = BUFFER_SIZE):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _missed(self) -> set:
+        missed = getattr(self._local, 'missed', None)
+        if missed is None:
+            missed = self._local.missed = set()
+        return missed
+
+    @contextmanager
+    def track(self, stage: str, cached: bool = False, run: int = None):
+        """قياس زمن الكتلة وتسجيله للمرحلة stage"""
+        missed = self._missed()
+        missed.discard(stage)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            cache = (MISS if stage in missed else HIT) if cached else None
+            missed.discard(stage)
+            self.record(stage, seconds, cache, run)
+
+    def miss(self, stage: str) -> None:
+        """تعليم المرحلة الجارية في هذا الخيط بأنها حُسبت فعلاً (فقد الكاش)"""
+        self._missed().add(stage)
+
+    def record(self, stage: str, seconds: float, cache: str = None, run: int = None) -> None:
+        with self._lock:
+            self._samples.append((time.time(), stage, seconds * 1000, cache, run))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+    def samples(self) -> pd.DataFrame:
+        with self._lock:
+            rows = list(self._samples)
+        return pd.DataFrame(rows, columns=SAMPLE_COLUMNS)
+
+    def summary(self) -> pd.DataFrame:
+        """لكل مرحلة: عدد القياسات، p50 و p95 والأقصى بالميلي ثانية، وعدد إصابات وفقد الكاش"""
+        samples = self.samples()
+        rows = []
+        for stage, group in samples.groupby('stage', sort=False):
+            ms = group['ms'].to_numpy()
+            p50, p95 = np.percentile(ms, [50, 95])
+            rows.append((stage, len(ms), round(p50, 1), round(p95, 1), round(ms.max(), 1),
+                         int((group['cache'] == HIT).sum()), int((group['cache'] == MISS).sum())))
+        return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+    def to_json(self) -> str:
+        samples = self.samples()
+        return json.dumps({
+            'summary': self.summary().to_dict('records'),
+            'samples': samples.astype(object).where(samples.notna(), None).to_dict('records'),
+        }, ensure_ascii=False, indent=2)
+
+    def to_csv(self) -> bytes:
+        buffer = io.BytesIO()
+        self.samples().to_csv(buffer, index=False, encoding='utf-8-sig')
+        return buffer.getvalue()
@@ -0,0 +1,94 @@
+"""
+كاش عرض سجلات المقارنة مع تحضير مسبق في الخلفية
+قيم الطرفين وجدول المقارنة لكل زوج تُبنى مرة واحدة وتُحفظ في LRU محدود
+مفتاحه (النوع، معرف الزوج، بصمة محتواه)، وخيط خلفي يحضّر السجلات التالية في القائمة
+فيكون الانتقال للسجل التالي قراءة من الكاش
+"""
+import threading
+from collections import OrderedDict, deque
+
+from comparison import comparison_table_html, record_values
+
+CACHE_SIZE = 256
+PREFETCH_AHEAD = 5
+# طلبات التحضير المعلقة (الأحدث أولاً؛ القديمة تسقط إذا تجاوزها المراجعون)
+PENDING_SIZE = 64
+
+
+def build_payload(qis_df, diwan_df, pairs, diffs, pair_row: int) -> dict:
+    """ما يلزم لعرض زوج واحد: قيم الطرفين (لأزرار الاختيار والنموذج) وجدول المقارنة"""
+    qis_pos, diwan_pos = pairs.pair(pair_row)
+    rows = diffs.row(pair_row)
+    return {
+        'qistas_data': record_values(qis_df, qis_pos),
+        'diwan_data': record_values(diwan_df, diwan_pos),
+        'table_html': comparison_table_html(rows) if rows else '',
+    }
+
+
+class RenderCache:
+    """LRU محدود لحمولات العرض مشترك بين الجلسات، مع خيط عامل واحد للتحضير المسبق.
+    الحمولة المعادة مشتركة فلا يجوز تعديلها.
+    """
+
+    def __init__(self, capacity: int = CACHE_SIZE):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self._items = OrderedDict()
+        self._pending = deque(maxlen=PENDING_SIZE)
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, name='render-prefetch', daemon=True)
+        self._thread.start()
+
+    def get(self, key, build) -> dict:
+        """الحمولة من الكاش، أو بناؤها الآن بـ build() وحفظها"""
+        with self._lock:
+            payload = self._items.get(key)
+            if payload is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return payload
+            self.misses += 1
+        payload = build()
+        self._store(key, payload)
+        return payload
+
+    def prefetch(self, jobs) -> None:
+        """جدولة [(key, build), ...] للتحضير في الخلفية بالترتيب (ما هو في الكاش يُتخطى)"""
+        with self._wake:
+            for key, build in reversed(list(jobs)):
+                if key not in self._items:
+                    self._pending.appendleft((key, build))
+            self._wake.notify()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'size': len(self._items), 'hits': self.hits, 'misses': self.misses,
+                    'prefetched': self.prefetched, 'pending': len(self._pending)}
+
+    def _store(self, key, payload) -> None:
+        with self._lock:
+            self._items[key] = payload
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def _run(self) -> None:
+        while True:
+            with self._wake:
+                while not self._pending:
+                    self._wake.wait()
+                key, build = self._pending.popleft()
+                if key in self._items:
+                    continue
+            try:
+                payload = build()
+            except Exception:
+                # التحضير المسبق اختياري: الخطأ سيظهر عند العرض الفعلي إن تكرر
+                continue
+            self._store(key, payload)
+            with self._lock:
+                self.prefetched += 1
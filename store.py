@@ -0,0 +1,479 @@
+"""
+مخزن قرارات المقارنة
+قاعدة SQLite بوضع WAL: كل قرار كتابة واحدة O(1) داخل معاملة ذرية،
+بدل إعادة كتابة ملف JSON كامل مع كل نقرة. القرارات مفهرسة بـ (النوع، الزوج) فإعادة القرار
+تستبدل السابق ولا يكبر السجل بعدد النقرات. ملف التقدم مدمج في نفس القاعدة.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+DB_FILE = os.environ.get('LEG_DB_FILE', 'comparison_data.db')
+
+# الملفات القديمة (تُستورد مرة واحدة عند إنشاء القاعدة لأول مرة)
+LEGACY_DATA_FILE = 'comparison_data.json'
+LEGACY_PROGRESS_FILE = 'progress_data.json'
+
+DATE_KEY = 'تاريخ الإدخال'
+SOURCE_KEY = 'المصدر الصحيح'
+
+SCHEMA_VERSION = 1
+COMPACT_EVERY = 500
+
+# الأعمدة المسموح الترتيب والتصفية بها في عرض البيانات المحفوظة (كلها مفهرسة)
+SORTABLE_COLUMNS = ('id', 'created_at', 'source', 'kind', 'reviewer')
+FILTER_COLUMNS = ('source', 'kind', 'reviewer')
+
+# توزيع العمل بين المراجعين: كل مراجع يحجز نطاقاً من السجلات لمدة محددة
+LEASE_SIZE = 50
+LEASE_TTL = 30 * 60
+
+
+def _json_default(value):
+    """قيم numpy/pandas (int64، Timestamp...) إلى قيم JSON عادية"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=_json_default)
+
+
+class DecisionStore:
+    """سجل القرارات مع مؤشر التقدم.
+    اتصال لكل خيط (Streamlit يشغّل كل جلسة في خيط مستقل)، وSQLite يتولى القفل.
+    readonly يفتح قاعدة موجودة للقراءة فقط (لسطر الأوامر): لا تُنشأ ولا يُعدّل مخططها ولا تُستورد ملفات قديمة.
+    """
+
+    def __init__(self, path: str = DB_FILE, legacy_data_file: str = LEGACY_DATA_FILE,
+                 legacy_progress_file: str = LEGACY_PROGRESS_FILE, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        # كاش القراءة المشترك بين الجلسات (صالح لجيل محتوى واحد) ومستمعو التغييرات
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._listeners = []
+        if readonly:
+            self._check_schema()
+        else:
+            self._init_schema(legacy_data_file, legacy_progress_file)
+
+    # ==================== الاتصال والمخطط ====================
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.readonly:
+                uri = f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro"
+                conn = sqlite3.connect(uri, uri=True, timeout=30, isolation_level=None)
+            else:
+                conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=FULL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """معاملة كتابة حصرية (BEGIN IMMEDIATE) حتى لا يتداخل مراجعان في نفس التعديل"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _init_schema(self, legacy_data_file: str, legacy_progress_file: str) -> None:
+        """إنشاء المخطط الأولي (مع استيراد ملفات JSON القديمة مرة واحدة)؛
+        أي تغيير لاحق في المخطط يُضاف كترحيل بإصدار جديد من user_version"""
+        with self._transaction() as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version < 1:
+                self._create_schema(conn)
+                self._migrate_legacy(conn, legacy_data_file, legacy_progress_file)
+            if version < SCHEMA_VERSION:
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _check_schema(self) -> None:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"قاعدة القرارات غير موجودة: {self.path}")
+        version = self._conn().execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            raise ValueError(f"مخطط قاعدة القرارات غير متوافق ({version}، المتوقع {SCHEMA_VERSION}): {self.path}")
+
+    @staticmethod
+    def _create_schema(conn) -> None:
+        # kind و reviewer قيم فارغة بدل NULL حتى تعمل المقارنات والترتيب عبر الفهارس؛
+        # content_hash بصمة محتوى الزوج وقت القرار لمعرفة ما تغيّر عند وصول نسخة جديدة من الملفات
+        conn.execute("""
+            CREATE TABLE decisions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL,
+                source TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                kind TEXT NOT NULL DEFAULT '',
+                reviewer TEXT NOT NULL DEFAULT '',
+                pair_id TEXT,
+                content_hash TEXT
+            )""")
+        # قرار واحد لكل (النوع، الزوج)
+        conn.execute('CREATE UNIQUE INDEX idx_decisions_kind_pair ON decisions (kind, pair_id)')
+        for col in ('created_at', 'source', 'kind', 'reviewer'):
+            conn.execute(f'CREATE INDEX idx_decisions_{col} ON decisions ({col}, id)')
+        conn.execute("""
+            CREATE TABLE progress (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )""")
+        conn.execute("""
+            CREATE TABLE leases (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                queue TEXT NOT NULL,
+                start INTEGER NOT NULL,
+                end INTEGER NOT NULL,
+                reviewer TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (kind, queue, start)
+            )""")
+        # عدادات داخل القاعدة تزيدها triggers مع كل تغيير من أي اتصال، فيعرف كل اتصال (وكل خيط جديد)
+        # أن الكاش قديم دون الاعتماد على ما رآه سابقاً.
+        # 'deletions' لا يتغير إلا بالحذف الصريح (المسح)، لأن استبدال القرار عبر INSERT OR REPLACE
+        # لا يشغّل trigger الحذف، وبه يعرف البناء التزايدي متى يبدأ من الصفر
+        conn.execute('CREATE TABLE counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        conn.execute("INSERT INTO counters (key, value) VALUES ('decisions', 0), ('deletions', 0)")
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f"""
+                CREATE TRIGGER decisions_{event.lower()}_counter AFTER {event} ON decisions
+                BEGIN UPDATE counters SET value = value + 1 WHERE key = 'decisions'; END""")
+        conn.execute("""
+            CREATE TRIGGER decisions_deletions_counter AFTER DELETE ON decisions
+            BEGIN UPDATE counters SET value = value + 1 WHERE key = 'deletions'; END""")
+
+    @staticmethod
+    def _migrate_legacy(conn, data_file: str, progress_file: str) -> None:
+        """استيراد comparison_data.json و progress_data.json القديمين (مرة واحدة فقط)"""
+        if data_file and os.path.exists(data_file):
+            with open(data_file, 'r', encoding='utf-8') as f:
+                records = json.load(f) or []
+            conn.executemany(
+                'INSERT INTO decisions (created_at, source, payload) VALUES (?, ?, ?)',
+                [(str(r.get(DATE_KEY, '')), str(r.get(SOURCE_KEY, '')), _dumps(r)) for r in records],
+            )
+        if progress_file and os.path.exists(progress_file):
+            with open(progress_file, 'r', encoding='utf-8') as f:
+                current_index = json.load(f)
+            conn.execute(
+                'INSERT OR REPLACE INTO progress (key, value) VALUES (?, ?)',
+                ('current_index', _dumps(current_index or 0)),
+            )
+
+    # ==================== القرارات ====================
+    @staticmethod
+    def _row(record: dict, kind, reviewer, pair_id, content_hash=None) -> tuple:
+        return (str(record.get(DATE_KEY, '')), str(record.get(SOURCE_KEY, '')), _dumps(record),
+                kind or '', reviewer or '', pair_id, content_hash)
+
+    # القرار الجديد لزوج له قرار سابق في نفس النوع يحل محله (الفهرس الفريد على (kind, pair_id))،
+    # ويأخذ معرفاً جديداً حتى تتغير نسخة المخزن ويظهر في آخر ترتيب الإدخال.
+    # القرارات دون pair_id (المستوردة من JSON القديم) تُضاف دائماً.
+    _INSERT = ('INSERT OR REPLACE INTO decisions (created_at, source, payload, kind, reviewer, pair_id, content_hash) '
+               'VALUES (?, ?, ?, ?, ?, ?, ?)')
+    # للقرارات الآلية (الاعتماد التلقائي): لا تحل أبداً محل قرار موجود لنفس الزوج
+    _INSERT_NEW = _INSERT.replace('OR REPLACE', 'OR IGNORE')
+
+    def append(self, record: dict, kind: str = None, reviewer: str = None, pair_id: str = None,
+               content_hash: str = None) -> int:
+        """حفظ قرار واحد (معاملة ذرية واحدة)، مستبدلاً قرار الزوج السابق إن وُجد"""
+        cur = self._conn().execute(self._INSERT, self._row(record, kind, reviewer, pair_id, content_hash))
+        self._after_write()
+        self._changed('save', kind, reviewer, [pair_id] if pair_id is not None else [])
+        return cur.lastrowid
+
+    def append_many(self, records, kind: str = None, reviewer: str = None, replace: bool = True) -> int:
+        """حفظ دفعة قرارات [(record, pair_id, content_hash), ...] في معاملة واحدة (بنفس الاستبدال).
+        replace=False يتخطى الأزواج التي لها قرار سابق بدل استبداله. يعيد عدد القرارات المحفوظة فعلاً."""
+        with self._transaction() as conn:
+            # rowcount لا يحسب تعديلات triggers العدادات (بخلاف total_changes)
+            saved = conn.executemany(self._INSERT if replace else self._INSERT_NEW,
+                                     [self._row(record, kind, reviewer, *rest) for record, *rest in records]).rowcount
+        self._after_write()
+        self._changed('save', kind, reviewer, [pair_id for _, pair_id, *_ in records if pair_id is not None])
+        return saved
+
+    def decision(self, kind: str, pair_id: str):
+        """قرار الزوج الحالي: {'id', 'created_at', 'source', 'reviewer', 'record'} أو None"""
+        row = self._conn().execute(
+            'SELECT id, created_at, source, reviewer, payload FROM decisions WHERE kind = ? AND pair_id = ?',
+            (kind or '', pair_id),
+        ).fetchone()
+        if row is None:
+            return None
+        decision_id, created_at, source, reviewer, payload = row
+        return {'id': decision_id, 'created_at': created_at, 'source': source, 'reviewer': reviewer,
+                'record': json.loads(payload)}
+
+    def decided_pairs(self, kind: str, source: str = None) -> frozenset:
+        """معرفات الأزواج التي لها قرار محفوظ لهذا النوع (ولمصدر محدد اختيارياً)"""
+        sql = 'SELECT pair_id FROM decisions WHERE kind = ? AND pair_id IS NOT NULL'
+        params = [kind]
+        if source is not None:
+            sql += ' AND source = ?'
+            params.append(source)
+        return self._cached(('decided_pairs', kind, source),
+                            lambda: frozenset(pair_id for (pair_id,) in self._conn().execute(sql, params)))
+
+    def counts(self, kind: str = None) -> dict:
+        """عدد القرارات لكل مصدر صحيح {source: n} (لنوع محدد أو للكل)"""
+        sql = 'SELECT source, COUNT(*) FROM decisions'
+        params = []
+        if kind is not None:
+            sql += ' WHERE kind = ?'
+            params.append(kind)
+        return self._cached(('counts', kind),
+                            lambda: dict(self._conn().execute(sql + ' GROUP BY source', params).fetchall()))
+
+    def decision_hashes(self, kind: str, upto_id: int = None) -> dict:
+        """بصمة المحتوى لقرار كل زوج: {pair_id: content_hash أو None}.
+        upto_id يقصر النتيجة على القرارات حتى معرف محدد (لقطة ثابتة أثناء المراجعة).
+        """
+        sql = 'SELECT pair_id, content_hash FROM decisions WHERE kind = ? AND pair_id IS NOT NULL'
+        params = [kind]
+        if upto_id is not None:
+            sql += ' AND id <= ?'
+            params.append(upto_id)
+        return dict(self._conn().execute(sql, params).fetchall())
+
+    def decisions_after(self, kind: str, after_id: int = 0) -> list:
+        """قرارات أزواج النوع ذات المعرف الأكبر من after_id بترتيب الإدخال (للبناء التزايدي):
+        [(id, pair_id, source, reviewer, created_at, payload), ...] و payload نص JSON كما حُفظ
+        """
+        return self._conn().execute(
+            'SELECT id, pair_id, source, reviewer, created_at, payload FROM decisions '
+            'WHERE kind = ? AND pair_id IS NOT NULL AND id > ? ORDER BY id',
+            (kind, after_id),
+        ).fetchall()
+
+    def records(self) -> list:
+        rows = self._conn().execute('SELECT payload FROM decisions ORDER BY id').fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def count(self) -> int:
+        return self._conn().execute('SELECT COUNT(*) FROM decisions').fetchone()[0]
+
+    @staticmethod
+    def _where(filters: dict):
+        """شروط التصفية: المصدر/النوع/المراجع بالتساوي، والتاريخ كنطاق [date_from, date_to)"""
+        clauses, params = [], []
+        for col in FILTER_COLUMNS:
+            if filters.get(col) is not None:
+                clauses.append(f'{col} = ?')
+                params.append(filters[col])
+        if filters.get('date_from'):
+            clauses.append('created_at >= ?')
+            params.append(str(filters['date_from']))
+        if filters.get('date_to'):
+            clauses.append('created_at < ?')
+            params.append(str(filters['date_to']))
+        return clauses, params
+
+    def page(self, filters: dict = None, sort: str = 'id', descending: bool = False,
+             limit: int = 50, after: tuple = None):
+        """صفحة من القرارات بترقيم keyset: (قيمة عمود الترتيب، المعرف) لآخر سجل في الصفحة السابقة.
+        كل صفحة تقرأ limit + 1 صفاً فقط عبر الفهرس بدل المرور على السجل كاملاً.
+        يعيد (السجلات، مؤشر الصفحة التالية أو None).
+        """
+        if sort not in SORTABLE_COLUMNS:
+            raise ValueError(f"عمود ترتيب غير مدعوم: {sort}")
+        clauses, params = self._where(filters or {})
+        op, order = ('<', 'DESC') if descending else ('>', 'ASC')
+        if after is not None:
+            if sort == 'id':
+                clauses.append(f'id {op} ?')
+                params.append(after[1])
+            else:
+                clauses.append(f'({sort}, id) {op} (?, ?)')
+                params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._conn().execute(
+            f'SELECT id, {sort}, payload FROM decisions {where} ORDER BY {sort} {order}, id {order} LIMIT ?',
+            params + [limit + 1],
+        ).fetchall()
+        cursor = (rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+        return [json.loads(payload) for _, _, payload in rows[:limit]], cursor
+
+    def count_where(self, filters: dict = None) -> int:
+        clauses, params = self._where(filters or {})
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self._conn().execute(f'SELECT COUNT(*) FROM decisions {where}', params).fetchone()[0]
+
+    def distinct(self, column: str) -> list:
+        """القيم المختلفة لعمود تصفية (لقوائم الاختيار)"""
+        if column not in FILTER_COLUMNS:
+            raise ValueError(f"عمود غير مدعوم: {column}")
+        sql = f'SELECT DISTINCT {column} FROM decisions ORDER BY {column}'
+        return self._cached(('distinct', column), lambda: [v for (v,) in self._conn().execute(sql)])
+
+    def version(self) -> tuple:
+        """نسخة المحتوى (العدد، آخر معرف): تتغير مع كل إضافة أو حذف، وتصلح مفتاحاً للكاش"""
+        sql = 'SELECT COUNT(*), COALESCE(MAX(id), 0) FROM decisions'
+        return self._cached(('version',), lambda: tuple(self._conn().execute(sql).fetchone()))
+
+    def source_version(self, kind: str, source: str) -> tuple:
+        """نسخة قرارات مصدر واحد للنوع (العدد، آخر معرف)، مفتاح كاش لما يُشتق من decided_pairs(kind, source)"""
+        sql = 'SELECT COUNT(*), COALESCE(MAX(id), 0) FROM decisions WHERE kind = ? AND source = ?'
+        return self._cached(('source_version', kind, source),
+                            lambda: tuple(self._conn().execute(sql, (kind, source)).fetchone()))
+
+    # ==================== التقدم ====================
+    def get_progress(self, key: str = 'current_index', default=0):
+        row = self._conn().execute('SELECT value FROM progress WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_progress(self, value, key: str = 'current_index') -> None:
+        self._conn().execute(
+            'INSERT OR REPLACE INTO progress (key, value) VALUES (?, ?)', (key, _dumps(value))
+        )
+        self._after_write()
+
+    # ==================== توزيع العمل (الحجوزات) ====================
+    def acquire_lease(self, kind: str, queue: str, total: int, reviewer: str,
+                      size: int = LEASE_SIZE, ttl: float = LEASE_TTL):
+        """حجز نطاق سجلات [start, end) للمراجع داخل معاملة حصرية.
+        يعيد حجز المراجع الحالي إن وُجد (مع تجديده)، وإلا أول نطاق غير محجوز وغير منجز،
+        بما في ذلك النطاقات التي انتهت مدة حجزها عند مراجع آخر. يعيد None إذا لم يبق شيء.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                'SELECT id, start, end, reviewer, expires_at, done FROM leases WHERE kind = ? AND queue = ?',
+                (kind, queue),
+            ).fetchall()
+            by_start = {row[1]: row for row in rows}
+
+            for lease_id, start, end, owner, expires_at, done in rows:
+                if owner == reviewer and not done and expires_at > now:
+                    if expires_at - now < ttl / 2:
+                        conn.execute('UPDATE leases SET expires_at = ? WHERE id = ?', (now + ttl, lease_id))
+                    return {'id': lease_id, 'start': start, 'end': end}
+
+            for start in range(0, total, size):
+                end = min(start + size, total)
+                row = by_start.get(start)
+                if row is None:
+                    cur = conn.execute(
+                        'INSERT INTO leases (kind, queue, start, end, reviewer, expires_at) VALUES (?, ?, ?, ?, ?, ?)',
+                        (kind, queue, start, end, reviewer, now + ttl),
+                    )
+                    return {'id': cur.lastrowid, 'start': start, 'end': end}
+                lease_id, _, _, _, expires_at, done = row
+                if not done and expires_at <= now:
+                    conn.execute(
+                        'UPDATE leases SET reviewer = ?, expires_at = ? WHERE id = ?',
+                        (reviewer, now + ttl, lease_id),
+                    )
+                    return {'id': lease_id, 'start': start, 'end': end}
+        return None
+
+    def complete_lease(self, lease_id: int) -> None:
+        self._conn().execute('UPDATE leases SET done = 1 WHERE id = ?', (lease_id,))
+
+    def release_lease(self, lease_id: int) -> None:
+        """إرجاع النطاق غير المنجز ليتسلمه مراجع آخر فوراً"""
+        self._conn().execute('UPDATE leases SET expires_at = 0 WHERE id = ? AND done = 0', (lease_id,))
+
+    def lease_summary(self, kind: str, queue: str) -> dict:
+        """عدد النطاقات المنجزة والمحجوزة حالياً لكل قائمة"""
+        now = time.time()
+        done, active = self._conn().execute(
+            'SELECT COALESCE(SUM(done), 0), COALESCE(SUM(done = 0 AND expires_at > ?), 0) '
+            'FROM leases WHERE kind = ? AND queue = ?',
+            (now, kind, queue),
+        ).fetchone()
+        return {'done': done, 'active': active}
+
+    # ==================== الكاش المشترك والإشعارات ====================
+    @property
+    def generation(self) -> int:
+        """جيل محتوى القرارات: عداد التغييرات المحفوظ في القاعدة نفسها (قراءة مفتاح واحد).
+        يتغير مع كل كتابة من أي اتصال أو عملية، فلا تُقرأ نتيجة مخزنة قديمة من أي خيط"""
+        return self._conn().execute("SELECT value FROM counters WHERE key = 'decisions'").fetchone()[0]
+
+    @property
+    def deletions(self) -> int:
+        """عدد القرارات المحذوفة فعلاً منذ إنشاء القاعدة (لا يتأثر بالإضافة أو الاستبدال)"""
+        return self._conn().execute("SELECT value FROM counters WHERE key = 'deletions'").fetchone()[0]
+
+    def _cached(self, key, compute):
+        """قراءة عبر الكاش المشترك: تُحسب مرة واحدة لكل جيل محتوى مهما كان عدد الجلسات.
+        القيم المعادة مشتركة فلا يجوز تعديلها."""
+        generation = self.generation
+        with self._lock:
+            hit = self._cache.get(key)
+        if hit is not None and hit[0] == generation:
+            return hit[1]
+        value = compute()
+        with self._lock:
+            self._cache[key] = (generation, value)
+        return value
+
+    def subscribe(self, listener):
+        """تسجيل listener(event) ليُستدعى بعد كل تغيير في القرارات من هذه العملية، ويعيد دالة إلغاء التسجيل.
+        event: {'op': 'save' أو 'clear'، 'kind'، 'reviewer'، 'pair_ids'، 'generation'، 'at'}"""
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe():
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+        return unsubscribe
+
+    def _changed(self, op: str, kind: str = None, reviewer: str = None, pair_ids=()) -> None:
+        generation = self.generation
+        with self._lock:
+            self._cache.clear()
+            event = {'op': op, 'kind': kind or '', 'reviewer': reviewer or '', 'pair_ids': list(pair_ids),
+                     'generation': generation, 'at': time.time()}
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception:
+                # مستمع معطوب لا يمنع الحفظ ولا بقية المستمعين
+                continue
+
+    # ==================== الصيانة ====================
+    def clear(self) -> None:
+        """حذف جميع القرارات والتقدم والحجوزات نهائياً"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM decisions')
+            conn.execute('DELETE FROM progress')
+            conn.execute('DELETE FROM leases')
+        self._changed('clear')
+        self.compact(vacuum=True)
+
+    def compact(self, vacuum: bool = False) -> None:
+        """دمج ملف WAL في القاعدة (وVACUUM اختيارياً لاسترجاع المساحة)"""
+        conn = self._conn()
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        if vacuum:
+            conn.execute('VACUUM')
+
+    def _after_write(self) -> None:
+        # دمج دوري حتى لا يكبر ملف WAL بلا حدود في جلسة مراجعة طويلة
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % COMPACT_EVERY == 0
+        if due:
+            self.compact()
@@ -0,0 +1,15 @@
+from benchmark import find_regressions
+
+
+def _run(calibration, seconds):
+    return {'calibration': calibration, 'results': {'1000': {'align': seconds}}}
+
+
+def test_regressions_are_measured_against_calibrated_baseline():
+    baseline = _run(0.1, 1.0)
+    # جهاز أبطأ بمرتين: نفس الكود يستغرق ضعف الزمن ولا يُعد تراجعاً
+    assert find_regressions(_run(0.2, 2.0), baseline).empty
+    # نفس سرعة الجهاز وزمن أكبر من ×1.5
+    assert find_regressions(_run(0.1, 2.0), baseline)['stage'].tolist() == ['align']
+    # خط أساس قديم دون معايرة: مقارنة مباشرة
+    assert not find_regressions(_run(0.2, 2.0), {'results': baseline['results']}).empty
@@ -0,0 +1,132 @@
+import pandas as pd
+
+import numpy as np
+
+from comparison import (add_normalized_columns, alignment_keys, build_alignment, compute_diff_matrix,
+                        norm_column, normalize_dates, normalize_numbers, normalize_status)
+
+KIND = 'نظام'
+
+
+def _frames():
+    qis = pd.DataFrame({
+        'LegName': ['أ', 'ب', 'ب مكرر', 'بلا رقم'],
+        'LegNumber': [1, 2, 2, None],
+        'Year': [2000, 2001, 2001, None],
+    })
+    diwan = pd.DataFrame({
+        'ByLawName': ['ب1', 'أ1', 'ب1 مكرر', 'ديوان فقط'],
+        'ByLawNumber': [2, 1, 2, 5],
+        'Year': [2001, 2000, 2001, 2005],
+    })
+    return qis, diwan
+
+
+def _pairs_by_id(pairs):
+    return {pid: (int(q), int(d)) for pid, q, d in zip(pairs.pair_ids, pairs.qis_pos, pairs.diwan_pos)}
+
+
+def test_group_key_is_formatted_as_ints():
+    df = pd.DataFrame({'GroupKey': ['(12.0, 2001.0)', '(3,1999)', '', None], 'LegNumber': [0] * 4})
+    assert list(alignment_keys(df, 'LegNumber')) == ['(12,2001)', '(3,1999)', None, None]
+
+
+def test_alignment_pairs_keys_in_order_of_appearance():
+    qis, diwan = _frames()
+    pairs = build_alignment(qis, diwan, KIND)
+    by_id = _pairs_by_id(pairs)
+    assert by_id['(1,2000)'] == (0, 1)
+    assert by_id['(5,2005)'] == (-1, 3)
+    duplicates = sorted(v for k, v in by_id.items() if k.startswith('(2,2001)#'))
+    assert duplicates == [(1, 0), (2, 2)]
+    assert [v for k, v in by_id.items() if k.startswith('Q:')] == [(3, -1)]
+    assert len(set(pairs.pair_ids)) == len(pairs)
+
+
+def test_pair_ids_survive_inserted_and_reordered_rows():
+    qis, diwan = _frames()
+    before = build_alignment(qis, diwan, KIND)
+    before_pairs = {pid: (qis.iloc[q]['LegName'] if q >= 0 else None, diwan.iloc[d]['ByLawName'] if d >= 0 else None)
+                    for pid, (q, d) in _pairs_by_id(before).items()}
+
+    new_row = pd.DataFrame({'LegName': ['جديد'], 'LegNumber': [9], 'Year': [2009]})
+    qis2 = pd.concat([new_row, qis.iloc[::-1]], ignore_index=True)
+    diwan2 = diwan.iloc[[3, 0, 2, 1]].reset_index(drop=True)
+    after = build_alignment(qis2, diwan2, KIND)
+    after_pairs = {pid: (qis2.iloc[q]['LegName'] if q >= 0 else None, diwan2.iloc[d]['ByLawName'] if d >= 0 else None)
+                   for pid, (q, d) in _pairs_by_id(after).items()}
+
+    # معرفات المفاتيح غير المكررة باقية وتشير إلى نفس السجلات؛ المكررات المعكوسة تتبادل المقابل
+    # فتأخذ معرفات جديدة، والسجل الجديد يضيف معرفاً واحداً
+    stable = {pid for pid in before_pairs if not pid.startswith('(2,2001)#')}
+    for pid in stable:
+        assert after_pairs[pid] == before_pairs[pid]
+    assert '(9,2009)' in after_pairs
+
+
+def test_duplicate_ids_survive_inserted_rows():
+    qis, diwan = _frames()
+    before = set(build_alignment(qis, diwan, KIND).pair_ids)
+    new_row = pd.DataFrame({'LegName': ['جديد'], 'LegNumber': [2], 'Year': [1990]})
+    after = set(build_alignment(pd.concat([new_row, qis], ignore_index=True), diwan, KIND).pair_ids)
+    assert before < after and len(after - before) == 1
+
+
+def _diff_frames():
+    qis = pd.DataFrame({
+        'LegName': ['أ', 'ب', 'ج', 'د'],
+        'LegNumber': [1, 2, 3, 4],
+        'Year': [2000, 2001, 2002, 2003],
+        'Status': ['ساري', 'ساري', 'غير ساري', 'ساري'],
+        'EndDate': [None, None, '01-01-2010', '01-01-2010'],
+    })
+    diwan = pd.DataFrame({
+        'ByLawName': ['أ', 'ب ', 'ج', 'د'],
+        'ByLawNumber': [1, 2, 3, 4],
+        'Year': [2000, 2001, 2002, 2003],
+        'Status': [1, 2, 2, 1],
+        'EndDate': [None, None, '01-02-2010', '02-01-2010'],
+    })
+    return add_normalized_columns(qis, KIND, 'qis'), add_normalized_columns(diwan, KIND, 'diwan')
+
+
+def test_diff_matrix_flags_fields_and_identical_pairs():
+    qis, diwan = _diff_frames()
+    pairs = build_alignment(qis, diwan, KIND)
+    diffs = compute_diff_matrix(qis, diwan, pairs, KIND)
+    rows = np.arange(len(pairs))
+    by_name = dict(zip(diffs.q_text['اسم التشريع'], rows))
+
+    # أ: متطابق تماماً؛ ب: الحالة والاسم مختلفان؛ ج: تاريخ الانتهاء مختلف (غير ساري)؛
+    # د: تاريخ الانتهاء مختلف لكنه مخفي لأن السجل ساري فلا يُعد فرقاً
+    assert list(diffs.identical_rows(rows)) == [by_name['أ'], by_name['د']]
+    assert set(diffs.differing(rows)) == {by_name['ب'], by_name['ج']}
+    assert list(diffs.with_field(rows, 'الحالة')) == [by_name['ب']]
+    assert list(diffs.with_field(rows, 'تاريخ الانتهاء')) == [by_name['ج']]
+    assert diffs.field_counts()['اسم التشريع'] == 1
+    assert list(diffs.by_severity(rows))[0] == by_name['ب']
+    assert [label for label, *_ in diffs.row(by_name['ج'])][-1] == 'تاريخ الانتهاء'
+    assert 'تاريخ الانتهاء' not in [label for label, *_ in diffs.row(by_name['د'])]
+
+
+def test_normalize_status_numbers_and_dates():
+    status = normalize_status(pd.Series(['ساري', 'غير ساري', ' 2 ', 1.0, '', None]))
+    assert status.tolist() == [1, 2, 2, 1, pd.NA, pd.NA]
+
+    numbers = normalize_numbers(pd.Series(['12', 12.0, ' 12 ', '12.5', 'abc', None]))
+    assert numbers.tolist() == [12, 12, 12, pd.NA, pd.NA, pd.NA]
+
+    qis_dates = normalize_dates(pd.Series(['05-03-2001', '5/3/2001 00:00', 'غير معروف', None]), 'qis')
+    diwan_dates = normalize_dates(pd.Series(['03/05/2001', '2001-03-05']), 'diwan')
+    march_5 = pd.Timestamp(2001, 3, 5)
+    assert qis_dates[:2].tolist() == [march_5, march_5] and qis_dates[2:].isna().all()
+    assert diwan_dates.tolist() == [march_5, march_5]
+
+
+def test_add_normalized_columns_keeps_source_frame():
+    df = pd.DataFrame({'LegNumber': ['7'], 'Year': [2001.0], 'Status': ['ساري'], 'Magazine_Date': ['05-03-2001']})
+    out = add_normalized_columns(df, KIND, 'qis')
+    assert list(df.columns) == ['LegNumber', 'Year', 'Status', 'Magazine_Date']
+    assert out[norm_column('LegNumber')].iloc[0] == 7
+    assert out[norm_column('Status')].iloc[0] == 1
+    assert out[norm_column('Magazine_Date')].iloc[0] == pd.Timestamp(2001, 3, 5)
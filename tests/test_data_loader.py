@@ -0,0 +1,19 @@
+import pandas as pd
+
+import data_loader
+from data_loader import compact_frame, dropped_columns, read_workbook
+
+
+def test_new_workbook_columns_are_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, 'CACHE_DIR', str(tmp_path / 'cache'))
+    path = tmp_path / 'Qis.xlsx'
+    pd.DataFrame({'LegName': ['أ'], 'LegNumber': [1], 'Year': [2000], 'عمود جديد': ['قيمة']}).to_excel(path, index=False)
+    df = read_workbook(str(path), drop=dropped_columns('نظام', 'qis'))
+    assert list(df.columns) == ['LegName', 'LegNumber', 'Year', 'عمود جديد']
+
+
+def test_drop_list_never_removes_compared_columns(monkeypatch):
+    monkeypatch.setitem(data_loader.DROP_COLUMNS, 'qis', ['LegName', 'Status', 'ملاحظات داخلية'])
+    assert dropped_columns('نظام', 'qis') == ('ملاحظات داخلية',)
+    frame = pd.DataFrame({'LegName': ['أ'], 'ملاحظات داخلية': ['x']})
+    assert list(compact_frame(frame, dropped_columns('نظام', 'qis')).columns) == ['LegName']
@@ -0,0 +1,42 @@
+import pandas as pd
+from openpyxl import load_workbook
+
+import cli
+from dedup import EXACT, KEY, NEAR, deduplicate, duplicate_groups
+
+KIND = 'نظام'
+
+
+def _frame():
+    return pd.DataFrame({
+        'LegName': ['نظام الخدمة المدنية', 'نظام الخدمة  المدنيه', 'المدنية الخدمة نظام رقم 5',
+                    'نظام رسوم المياه', 'نظام آخر بنفس الرقم'],
+        'LegNumber': [5, 5, 5, 6, 6],
+        'Year': [2001, 2001, 2001, 2002, 2002],
+    })
+
+
+def test_levels_widen_from_exact_to_key():
+    groups = duplicate_groups(_frame(), KIND, 'qis')
+    # exact: الفرق في الفراغ والتاء المربوطة فقط
+    assert groups[EXACT].tolist() == [0, 0, 2, 3, 4]
+    # near: نفس الكلمات المميِّزة بأي ترتيب (رقم و5 محذوفان)
+    assert groups[NEAR].tolist() == [0, 0, 0, 3, 4]
+    # key: نفس الرقم والسنة مهما كان الاسم
+    assert groups[KEY].tolist() == [0, 0, 0, 3, 3]
+
+
+def test_deduplicate_keeps_first_of_each_group():
+    unique, report = deduplicate(_frame(), KIND, 'qis', KEY)
+    assert unique['LegName'].tolist() == ['نظام الخدمة المدنية', 'نظام رسوم المياه']
+    key_rows = report[report['المستوى'] == 'نفس المفتاح']
+    assert key_rows['مُبقى'].sum() == 2 and len(key_rows) == 5
+
+
+def test_unique_workbook_keeps_source_sheet_name(tmp_path):
+    source = tmp_path / 'Qis_Bylaws.xlsx'
+    _frame().to_excel(source, sheet_name='الأنظمة', index=False)
+    assert cli.main(['dedup', '--kind', KIND, '--side', 'qis', '--input', str(source), '--no-cache']) == 0
+    wb = load_workbook(tmp_path / 'Qis_Bylaws_Unique.xlsx', read_only=True)
+    assert wb.sheetnames == ['الأنظمة']
+    wb.close()
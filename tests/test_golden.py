@@ -0,0 +1,39 @@
+import pandas as pd
+
+from comparison import build_alignment
+from golden import CUSTOM_SOURCE, DIWAN_SOURCE, QIS_SOURCE, SOURCE_COLUMN, GoldenDataset
+from store import DecisionStore
+
+KIND = 'نظام'
+
+
+def _golden():
+    qis = pd.DataFrame({'LegName': ['أ', 'ب'], 'LegNumber': [1, 2], 'Year': [2000, 2001]})
+    diwan = pd.DataFrame({'ByLawName': ['أ1', 'ب1'], 'ByLawNumber': [1, 2], 'Year': [2000, 2001]})
+    pairs = build_alignment(qis, diwan, KIND)
+    return GoldenDataset(qis, diwan, pairs, KIND), pairs
+
+
+def test_refresh_is_incremental_and_rebuilds_only_after_deletes(tmp_path):
+    store = DecisionStore(str(tmp_path / 'decisions.db'), None, None)
+    golden, pairs = _golden()
+    first, second = pairs.pair_ids
+    store.append({'المصدر الصحيح': QIS_SOURCE}, kind=KIND, pair_id=first)
+    # قرار لزوج من نسخة سابقة من الملفات لا يوجد في الأزواج الحالية
+    store.append({'المصدر الصحيح': QIS_SOURCE}, kind=KIND, pair_id='(9,1990)')
+    assert golden.refresh(store) == 1
+
+    assert golden.refresh(store) == 0
+    assert golden.refresh(store) == 0
+
+    store.append({'المصدر الصحيح': DIWAN_SOURCE}, kind=KIND, pair_id=first)
+    store.append({'المصدر الصحيح': CUSTOM_SOURCE, 'LegName': 'ج', 'Year': 2001}, kind=KIND, pair_id=second)
+    assert golden.refresh(store) == 2
+    frame = golden.frame().set_index('معرف الزوج')
+    assert frame.loc[first, 'اسم التشريع'] == 'أ1'
+    assert frame.loc[second, SOURCE_COLUMN] == CUSTOM_SOURCE
+    assert frame.loc[second, 'اسم التشريع'] == 'ج'
+
+    store.clear()
+    assert golden.refresh(store) == 0
+    assert golden.frame().empty
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from comparison import add_normalized_columns
+from links import ACTIVE_REPLACED, ASYMMETRIC, BROKEN, CYCLE, _strongly_connected, build_link_graph, extract_references
+
+KIND = 'نظام'
+
+
+def _frame():
+    df = pd.DataFrame({
+        'LegNumber': [1, 2, 3, 4, 5, 7],
+        'Year': [2000, 2001, 2002, 2003, 2004, 2007],
+        'Status': ['غير ساري', 'ساري', 'غير ساري', 'غير ساري', 'غير ساري', 'ساري'],
+        'Replaced By': ['نظام رقم (2) لسنة 2001', None, '4/2003', '5/2004', '3/2002', None],
+        'Replaced For': [None, 'نظام رقم (1) لسنة 2000', None, None, None, 'رقم (99) لسنة 1990'],
+        'Canceled By': [None, None, None, None, None, 'قانون رقم (1) لسنة 1999'],
+    })
+    return add_normalized_columns(df, KIND, 'qis')
+
+
+def test_extract_references_formats():
+    refs = extract_references(pd.Series(['نظام الخدمة رقم (12) لسنة 2001', '4/2003', 'غير معروف', None]))
+    assert refs['num'].tolist()[:2] == [12, 4] and refs['year'].tolist()[:2] == [2001, 2003]
+    assert refs['kind'].iat[0] == 'نظام' and pd.isna(refs['kind'].iat[1])
+    assert refs['text'].tolist()[2:] == ['', '']
+
+
+def test_strongly_connected_finds_cycles_and_self_loops():
+    components = {frozenset(c) for c in _strongly_connected([[1], [2], [0, 3], [3], []])}
+    assert frozenset({0, 1, 2}) in components
+    assert frozenset({3}) in components and frozenset({4}) in components
+
+
+def test_link_checks():
+    graph = build_link_graph(_frame(), KIND, 'qis')
+    assert (0, 1) in graph.edges
+    assert list(graph.positions(CYCLE)) == [2, 3, 4]
+    assert list(graph.positions(BROKEN)) == [5]
+    # 0 ↔ 1 متبادلان؛ حلقة 2 ← 3 ← 4 دون "يحل محل" مقابل
+    assert list(graph.positions(ASYMMETRIC)) == [2, 3, 4]
+    # 5 ساري مع إلغاء من نوع آخر (ليس رابطاً مكسوراً لهذا النوع)
+    assert list(graph.positions(ACTIVE_REPLACED)) == [5]
+    assert graph.counts()[CYCLE] == 3
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from comparison import build_alignment
+from matching import NameIndex, build_search_index, normalize_arabic, suggest_candidates
+
+KIND = 'نظام'
+
+
+def test_normalize_arabic_unifies_spelling():
+    assert normalize_arabic('نِظامُ  الأحوال-الشخصية ٢٠٠١') == 'نظام الاحوال الشخصيه 2001'
+    assert normalize_arabic('إدارة') == normalize_arabic('ادارة') == 'اداره'
+    assert normalize_arabic(None) == ''
+
+
+def test_name_index_prefers_same_year_and_number():
+    index = NameIndex(
+        ['نظام الخدمة المدنية', 'نظام الخدمة المدنيه', 'نظام رسوم المياه', 'نظام الخدمة العسكرية'],
+        years=[2001, 2005, 2001, 2001],
+        numbers=[10, 10, 11, 12],
+    )
+    top = index.query('نظام الخدمه المدنية', year=2001, number=10)
+    assert top[0][0] == 0 and top[0][3] is True
+    # السجل من سنة أخرى خارج كتلة السنة
+    assert 1 not in [pos for pos, *_ in top]
+    assert index.query('نظام الخدمة المدنية', year=2005, number=10)[0][0] == 1
+    assert index.query('') == []
+
+
+def test_suggest_candidates_for_unpaired_records():
+    qis = pd.DataFrame({'LegName': ['نظام الخدمة المدنية', 'نظام رسوم المياه'], 'LegNumber': [10, 11],
+                        'Year': [2001, 2001]})
+    diwan = pd.DataFrame({'ByLawName': ['نظام رسوم المياه', 'نظام الخدمه المدنيه'], 'ByLawNumber': [11, 30],
+                          'Year': [2001, 2001]})
+    pairs = build_alignment(qis, diwan, KIND)
+    found = suggest_candidates(qis, diwan, pairs, KIND, k=1)
+    qis_only = found[found['queue'] == 'qis_only'].iloc[0]
+    assert qis_only['candidate_name'] == 'نظام الخدمه المدنيه'
+    assert bool(qis_only['candidate_unpaired'])
+
+
+def test_search_index_matches_prefixes_and_exact_numbers():
+    qis = pd.DataFrame({'LegName': ['نظام الخدمة المدنية', 'نظام رسوم المياه'], 'LegNumber': [10, 1],
+                        'Year': [2001, 2010]})
+    diwan = pd.DataFrame({'ByLawName': ['نظام الخدمه المدنيه', 'نظام رسوم المياه'], 'ByLawNumber': [10, 1],
+                          'Year': [2001, 2010]})
+    pairs = build_alignment(qis, diwan, KIND)
+    index = build_search_index(qis, diwan, pairs, KIND)
+    civil = pairs.row_of['(10,2001)']
+    water = pairs.row_of['(1,2010)']
+    assert list(index.search('الخد المدن')) == [civil]
+    assert list(index.search('رسوم 2010')) == [water]
+    # الأرقام تطابق تماماً: 1 لا يطابق 10
+    assert list(index.search('1')) == [water]
+    assert list(index.search('نظام', limit=1)) == [min(civil, water)]
+    assert len(index.search('غير موجود')) == 0
@@ -0,0 +1,121 @@
+import json
+import sqlite3
+import threading
+
+import pytest
+
+import cli
+from store import DecisionStore
+
+
+def _store(path):
+    return DecisionStore(str(path), None, None)
+
+
+def _in_new_thread(func):
+    out = []
+    thread = threading.Thread(target=lambda: out.append(func()))
+    thread.start()
+    thread.join()
+    return out[0]
+
+
+def test_cached_reads_see_writes_from_another_store(tmp_path):
+    db = tmp_path / 'decisions.db'
+    first, second = _store(db), _store(db)
+    assert first.counts('نظام') == {}
+    assert first.decided_pairs('نظام') == frozenset()
+
+    second.append({'المصدر الصحيح': 'قسطاس'}, kind='نظام', pair_id='(1,2000)')
+
+    # نفس الخيط، وخيط جديد (كما في كل إعادة تشغيل لـ Streamlit) يريان الكتابة الخارجية
+    assert first.counts('نظام') == {'قسطاس': 1}
+    assert _in_new_thread(lambda: first.decided_pairs('نظام')) == frozenset({'(1,2000)'})
+
+    second.clear()
+    assert _in_new_thread(lambda: first.counts('نظام')) == {}
+
+
+def test_generation_changes_on_every_write(tmp_path):
+    store = _store(tmp_path / 'decisions.db')
+    before = store.generation
+    store.append({'المصدر الصحيح': 'الديوان'}, kind='قانون', pair_id='(3,1999)')
+    after_insert = store.generation
+    store.append({'المصدر الصحيح': 'قسطاس'}, kind='قانون', pair_id='(3,1999)')
+    assert before < after_insert < store.generation
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    data, progress = tmp_path / 'comparison_data.json', tmp_path / 'progress_data.json'
+    data.write_text(json.dumps([{'المصدر الصحيح': 'قسطاس', 'تاريخ الإدخال': '2024-01-01'}] * 2), encoding='utf-8')
+    progress.write_text('7', encoding='utf-8')
+    db = str(tmp_path / 'decisions.db')
+    store = DecisionStore(db, str(data), str(progress))
+    assert store.counts() == {'قسطاس': 2}
+    assert store.get_progress() == 7
+
+    # إعادة فتح القاعدة لا تستورد الملفات مرة أخرى
+    assert DecisionStore(db, str(data), str(progress)).count() == 2
+
+
+def test_leases_are_exclusive_until_completed_expired_or_released(tmp_path):
+    store = _store(tmp_path / 'decisions.db')
+    first = store.acquire_lease('نظام', 'matched', 120, 'a', size=50)
+    second = store.acquire_lease('نظام', 'matched', 120, 'b', size=50)
+    assert (first['start'], first['end']) == (0, 50)
+    assert (second['start'], second['end']) == (50, 100)
+    # نفس المراجع يستعيد حجزه نفسه
+    assert store.acquire_lease('نظام', 'matched', 120, 'a', size=50)['id'] == first['id']
+
+    store.complete_lease(first['id'])
+    assert store.acquire_lease('نظام', 'matched', 120, 'a', size=50)['start'] == 100
+    assert store.lease_summary('نظام', 'matched') == {'done': 1, 'active': 2}
+    assert store.acquire_lease('نظام', 'matched', 120, 'c', size=50) is None
+
+    store.release_lease(second['id'])
+    assert store.acquire_lease('نظام', 'matched', 120, 'c', size=50)['id'] == second['id']
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    store = _store(tmp_path / 'decisions.db')
+    stale = store.acquire_lease('قانون', 'qis_only', 10, 'a', ttl=-1)
+    taken = store.acquire_lease('قانون', 'qis_only', 10, 'b')
+    assert taken['id'] == stale['id']
+    assert store.acquire_lease('قانون', 'qis_only', 10, 'a') is None
+
+
+def test_append_many_without_replace_keeps_existing_decisions(tmp_path):
+    store = _store(tmp_path / 'decisions.db')
+    store.append({'المصدر الصحيح': 'الديوان'}, kind='نظام', reviewer='a', pair_id='(1,2000)')
+    auto = {'المصدر الصحيح': 'تطابق تلقائي'}
+    saved = store.append_many([(auto, '(1,2000)', None), (auto, '(2,2001)', None)], kind='نظام', replace=False)
+    assert saved == 1
+    assert store.decision('نظام', '(1,2000)')['source'] == 'الديوان'
+    assert store.decided_pairs('نظام', 'تطابق تلقائي') == frozenset({'(2,2001)'})
+    assert store.source_version('نظام', 'تطابق تلقائي')[0] == 1
+
+    # قرار المراجع يحل محل القرار التلقائي فتتغير نسخة المصدر
+    store.append({'المصدر الصحيح': 'قسطاس'}, kind='نظام', pair_id='(2,2001)')
+    assert store.source_version('نظام', 'تطابق تلقائي') == (0, 0)
+
+
+def test_readonly_store_never_creates_or_writes(tmp_path):
+    missing = tmp_path / 'missing.db'
+    with pytest.raises(FileNotFoundError):
+        DecisionStore(str(missing), None, None, readonly=True)
+    assert not missing.exists()
+
+    db = tmp_path / 'decisions.db'
+    _store(db).append({'المصدر الصحيح': 'قسطاس'}, kind='نظام', pair_id='(1,2000)')
+    reader = DecisionStore(str(db), None, None, readonly=True)
+    assert reader.decision_hashes('نظام') == {'(1,2000)': None}
+    with pytest.raises(sqlite3.OperationalError):
+        reader.append({'المصدر الصحيح': 'الديوان'}, kind='نظام', pair_id='(2,2001)')
+
+
+def test_cli_reports_missing_database(tmp_path, capsys):
+    missing = tmp_path / 'missing.db'
+    for command in ('delta', 'golden'):
+        assert cli.main([command, '--kind', 'نظام', '--db', str(missing)]) == 2
+    assert not missing.exists()
+    assert 'قاعدة القرارات غير موجودة' in capsys.readouterr().err